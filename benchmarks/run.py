@@ -0,0 +1,212 @@
+"""
+Stage-level benchmarks of the pipeline and dashboard on synthetic data:
+wall time (best and median of several runs) and peak traced allocation of
+each stage, written as JSON so runs on different commits can be compared.
+
+    python benchmarks/run.py [--tracts N] [--hail N [N ...]] [--repeats N]
+                             [--stages NAME [NAME ...]] [--json OUT] [--compare BASELINE]
+
+Inputs come from benchmarks/synthetic.py and are fully determined by --seed,
+so nothing is downloaded. Peak memory is measured with tracemalloc in a
+separate, untimed run; it covers Python and NumPy allocations, not memory
+held inside GEOS or GDAL.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = [
+    "load_all_tracts",
+    "merge_data",
+    "calculate_densities_and_ownership",
+    "tract_index",
+    "calculate_hail_risk",
+    "calculate_kernel_hail_risk",
+    "generate_radar_image",
+    "render_reflectivity_pyramid",
+    "dashboard_style",
+]
+
+def measure(func, repeats):
+    """Times func() `repeats` times, then runs it once more under tracemalloc."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {"min_s": min(times), "median_s": statistics.median(times), "peak_mb": peak / 1e6}
+
+def _radar_renderer():
+    """
+    generate_radar_image when radar_utils imports (Py-ART, boto3); else the
+    raster renderer it wraps. Returns (renderer name, render function); the
+    name is recorded with the stage so --compare can tell the two apart.
+    """
+    try:
+        from radar_utils import generate_radar_image
+        return "radar_utils.generate_radar_image", lambda radar, path: generate_radar_image(None, path, radar=radar)
+    except ImportError as e:
+        print(f"radar_utils unavailable ({e}); timing radar_raster.render_reflectivity for generate_radar_image")
+        from radar_raster import render_reflectivity
+        return "radar_raster.render_reflectivity", lambda radar, path: render_reflectivity(radar, path)[1]
+
+def run(args, workdir):
+    import load_data
+    from config import TRACT_INDEX_CELL_DEG
+    from dashboard_data import style_features
+    from process_data import calculate_densities_and_ownership, calculate_hail_risk, calculate_kernel_hail_risk, merge_data
+    from tract_index import TractIndex
+    import synthetic
+
+    wanted = set(args.stages)
+    results = {}
+
+    def record(name, func, **meta):
+        value, stats = measure(func, args.repeats)
+        results[name] = {**stats, **meta}
+        print(f"{name:<45}{stats['min_s']:>10.3f}{stats['median_s']:>10.3f}{stats['peak_mb']:>10.1f}")
+        return value
+
+    print(f"Generating {args.tracts} synthetic tracts (seed {args.seed})...")
+    tracts = synthetic.synthetic_tracts(args.tracts, seed=args.seed)
+    vehicles = synthetic.synthetic_vehicles(tracts, seed=args.seed)
+    income = synthetic.synthetic_income(tracts, seed=args.seed)
+
+    print(f"{'stage':<45}{'min s':>10}{'median s':>10}{'peak MB':>10}")
+    if "load_all_tracts" in wanted:
+        states = synthetic.write_state_inputs(tracts, vehicles, workdir)
+        original_states = load_data.STATES
+        load_data.STATES = states
+        try:
+            record("load_all_tracts", load_data.load_all_tracts)
+        finally:
+            load_data.STATES = original_states
+
+    # Later stages mutate their inputs, so each run gets fresh copies
+    merged = merge_data(tracts.copy(), vehicles.copy(), income.copy())
+    if "merge_data" in wanted:
+        merged = record("merge_data", lambda: merge_data(tracts.copy(), vehicles.copy(), income.copy()))
+
+    dense = calculate_densities_and_ownership(merged.copy())
+    if "calculate_densities_and_ownership" in wanted:
+        dense = record("calculate_densities_and_ownership", lambda: calculate_densities_and_ownership(merged.copy()))
+
+    if "tract_index" in wanted:
+        tract_index = record("tract_index", lambda: TractIndex.from_geodataframe(dense, TRACT_INDEX_CELL_DEG))
+    else:
+        tract_index = TractIndex.from_geodataframe(dense, TRACT_INDEX_CELL_DEG)
+
+    final = None
+    if "calculate_hail_risk" in wanted:
+        for n in args.hail:
+            hail = synthetic.synthetic_hail_gdf(n, seed=args.seed)
+            final = record(f"calculate_hail_risk[hail={n}]", lambda: calculate_hail_risk(dense, hail, tract_index))
+
+    if "calculate_kernel_hail_risk" in wanted:
+        # The stage adds its columns in place; each run overwrites them
+        kernel_input = dense.copy()
+        for n in args.hail:
+            hail = synthetic.synthetic_hail_gdf(n, seed=args.seed)
+            record(f"calculate_kernel_hail_risk[hail={n}]", lambda: calculate_kernel_hail_risk(kernel_input, hail))
+
+    if "generate_radar_image" in wanted:
+        renderer, render = _radar_renderer()
+        radar = synthetic.SyntheticRadar(seed=args.seed)
+        image_path = os.path.join(workdir, "radar.png")
+        record("generate_radar_image", lambda: render(radar, image_path), renderer=renderer)
+
+    if "render_reflectivity_pyramid" in wanted:
+        # What generate_radar.py runs per scan. A fresh directory per call times
+        # the file writes as well, not just the content-hash lookups that skip them
+        from radar_raster import render_reflectivity_pyramid
+        radar = synthetic.SyntheticRadar(seed=args.seed)
+        calls = iter(range(10 ** 6))
+        record("render_reflectivity_pyramid",
+               lambda: render_reflectivity_pyramid(radar, os.path.join(workdir, "frames", str(next(calls)))))
+
+    if "dashboard_style" in wanted:
+        if final is None:
+            final = dense.assign(hail_risk_score=0.0)
+        tracts_geojson = json.loads(final.to_json())
+        record("dashboard_style", lambda: style_features(final, tracts_geojson, "car_ownership_density", "Vehicle Ownership Density"))
+
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    """Prints each stage's time and peak memory relative to a previous run's JSON."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline['meta'].get('git_revision')} ({baseline_path}); < 1.00 is an improvement")
+    print(f"{'stage':<45}{'time x':>10}{'peak x':>10}")
+    for name, stats in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<45}{'new':>10}")
+            continue
+        time_ratio = stats["min_s"] / base["min_s"] if base["min_s"] else float("nan")
+        peak_ratio = stats["peak_mb"] / base["peak_mb"] if base["peak_mb"] else float("nan")
+        note = ""
+        if stats.get("renderer") != base.get("renderer"):
+            note = f"  (renderer differs: {base.get('renderer')} -> {stats.get('renderer')})"
+        print(f"{name:<45}{time_ratio:>10.2f}{peak_ratio:>10.2f}{note}")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark pipeline and dashboard stages on synthetic data.")
+    arg_parser.add_argument("--tracts", type=int, default=8000, help="Number of synthetic tracts (about four states).")
+    arg_parser.add_argument("--hail", type=int, nargs="+", default=[1_000, 100_000, 1_000_000],
+                            help="Hail report counts to run the hail join with (up to 10,000,000).")
+    arg_parser.add_argument("--repeats", type=int, default=3)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    arg_parser.add_argument("--json", help="Write results to this JSON file.")
+    arg_parser.add_argument("--compare", help="Results JSON of an earlier run to compare against.")
+    args = arg_parser.parse_args()
+
+    # Configured before the pipeline modules are imported, so their setup_logging() keeps this level
+    # and per-call progress messages stay out of the timings and the table
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args, workdir)
+
+    output = {
+        "meta": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {"tracts": args.tracts, "hail": args.hail, "repeats": args.repeats, "seed": args.seed},
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compares processed-tract storage formats: on-disk size, write time, read time
+and peak memory of a fresh reader process.
+
+    python benchmarks/storage_formats.py [--input PATH] [--json OUT]
+
+Without --input, every processed per-state file in PROCESSED_DATA_DIR is used.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FORMATS = {"geojson": ".geojson", "parquet": ".parquet"}
+
+def _status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def _reset_peak_rss():
+    """Resets the kernel's high-water mark so import-time peaks do not mask the read (Linux)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_mb():
+    if os.path.exists("/proc/self/status"):
+        return _status_mb("VmHWM:")
+    # ru_maxrss is reported in KiB on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 ** 2)
+
+def _measure_read(path, to_json):
+    """Runs in a fresh process so peak RSS reflects this read alone."""
+    from utils import load_geodata
+    import pyarrow.parquet, pyogrio  # noqa: F401  (keep reader imports out of the measurement)
+    baseline = _status_mb("VmRSS:") if _reset_peak_rss() else _peak_rss_mb()
+    start = time.perf_counter()
+    gdf = load_geodata(path)
+    if to_json:
+        # The dashboard serializes the frame for pydeck after reading it
+        json.loads(gdf.to_json())
+    elapsed = time.perf_counter() - start
+    return {"read_s": elapsed, "peak_rss_mb": _peak_rss_mb() - baseline}
+
+def _in_fresh_process(func, *args):
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(func, args)
+
+def benchmark(gdf, workdir, repeats=3):
+    from utils import save_geodata
+    results = {}
+    for fmt, ext in FORMATS.items():
+        path = os.path.join(workdir, f"bench{ext}")
+        start = time.perf_counter()
+        save_geodata(gdf, path, fmt=fmt)
+        write_s = time.perf_counter() - start
+
+        reads = [_in_fresh_process(_measure_read, path, False) for _ in range(repeats)]
+        dashboard = _in_fresh_process(_measure_read, path, True)
+        results[fmt] = {
+            "size_mb": os.path.getsize(path) / 1e6,
+            "write_s": write_s,
+            "read_s": min(r["read_s"] for r in reads),
+            "read_peak_rss_mb": max(r["peak_rss_mb"] for r in reads),
+            "read_to_json_s": dashboard["read_s"],
+        }
+    return results
+
+def main():
+    import pandas as pd
+    import geopandas as gpd
+    from config import PROCESSED_DATA_DIR
+    from utils import load_geodata
+
+    arg_parser = argparse.ArgumentParser(description="Benchmark processed-tract storage formats.")
+    arg_parser.add_argument("--input", help="GeoJSON or GeoParquet file to benchmark with.")
+    arg_parser.add_argument("--repeats", type=int, default=3)
+    arg_parser.add_argument("--json", help="Write results to this JSON file.")
+    args = arg_parser.parse_args()
+
+    inputs = [args.input] if args.input else sorted(
+        glob.glob(os.path.join(PROCESSED_DATA_DIR, "gdf_*_with_hail_risk.parquet"))
+        or glob.glob(os.path.join(PROCESSED_DATA_DIR, "gdf_*_with_hail_risk.geojson"))
+    )
+    if not inputs:
+        sys.exit("No processed tract files found; run main_data.py first or pass --input.")
+    gdf = gpd.GeoDataFrame(pd.concat([load_geodata(p) for p in inputs], ignore_index=True))
+    print(f"Benchmarking {len(gdf)} tracts from {len(inputs)} file(s)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = benchmark(gdf, workdir, repeats=args.repeats)
+
+    print(f"{'format':<10}{'size MB':>10}{'write s':>10}{'read s':>10}{'peak MB':>10}{'+to_json s':>12}")
+    for fmt, r in results.items():
+        print(f"{fmt:<10}{r['size_mb']:>10.2f}{r['write_s']:>10.3f}{r['read_s']:>10.3f}"
+              f"{r['read_peak_rss_mb']:>10.1f}{r['read_to_json_s']:>12.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"rows": len(gdf), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Deterministic synthetic inputs for the benchmarks: census tracts (with the
+vehicle and income tables that go with them), hail reports and Level II-like
+radar volumes. Everything is generated from a seed, so runs on different
+commits see identical data, and nothing touches the network.
+"""
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+# State abbreviation -> (FIPS, map centre (lat, lon)); tracts are laid out around each centre
+SYNTHETIC_STATES = {
+    "MO": ("29", (38.5, -92.5)),
+    "KS": ("20", (38.5, -98.0)),
+    "IA": ("19", (42.0, -93.0)),
+    "NE": ("31", (41.5, -99.5)),
+}
+# Half-size (degrees) of the box each state's tracts are spread over
+STATE_HALF_SPAN = (2.0, 3.0)  # (lat, lon)
+
+VEHICLE_COLUMNS = [
+    "households_with_1_vehicle", "households_with_2_vehicles",
+    "households_with_3_vehicles", "households_with_4_vehicles",
+    "households_with_5_vehicles", "households_with_6_vehicles",
+    "households_with_7_vehicles", "households_with_8_or_more_vehicles",
+]
+
+
+def synthetic_tracts(n_tracts, seed=0, vertices=200, states=SYNTHETIC_STATES):
+    """
+    Tract polygons shaped like TIGER/Line tracts: a jittered grid of cells
+    per state, each outlined by roughly `vertices` points, with the TIGER
+    columns the pipeline reads (GEOID, ALAND, AWATER, INTPTLAT/LON).
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    per_state = max(1, n_tracts // len(states))
+    for k, (abbr, (fips, (lat0, lon0))) in enumerate(states.items()):
+        count = per_state if k < len(states) - 1 else n_tracts - per_state * (len(states) - 1)
+        ny = max(1, int(np.sqrt(count * STATE_HALF_SPAN[0] / STATE_HALF_SPAN[1])))
+        nx = int(np.ceil(count / ny))
+        dy, dx = 2 * STATE_HALF_SPAN[0] / ny, 2 * STATE_HALF_SPAN[1] / nx
+        cell = np.arange(count)
+        x0 = lon0 - STATE_HALF_SPAN[1] + (cell % nx) * dx
+        y0 = lat0 - STATE_HALF_SPAN[0] + (cell // nx) * dy
+        # Walk each cell's outline with `vertices` points, nudged slightly so edges are not straight lines
+        side = np.linspace(0.0, 1.0, max(1, vertices // 4), endpoint=False)
+        unit = np.concatenate([
+            np.column_stack([side, np.zeros_like(side)]),
+            np.column_stack([np.ones_like(side), side]),
+            np.column_stack([1.0 - side, np.ones_like(side)]),
+            np.column_stack([np.zeros_like(side), 1.0 - side]),
+        ])
+        coords = unit[None, :, :] * [dx, dy] + np.column_stack([x0, y0])[:, None, :]
+        coords += rng.normal(0.0, 0.01 * min(dx, dy), coords.shape)
+        polygons = shapely.make_valid(shapely.polygons(coords))
+
+        area_m2 = (dx * 111_195 * np.cos(np.radians(y0 + dy / 2))) * (dy * 111_195)
+        water = rng.random(count) < 0.2
+        county = rng.integers(1, 200, count) * 2 - 1
+        tract_code = np.arange(count) + 100
+        frames.append(gpd.GeoDataFrame({
+            "STATEFP": fips,
+            "COUNTYFP": [f"{c:03d}" for c in county],
+            "TRACTCE": [f"{t:06d}" for t in tract_code],
+            "GEOID": [f"{fips}{c:03d}{t:06d}" for c, t in zip(county, tract_code)],
+            "ALAND": (area_m2 * np.where(water, 0.9, 1.0)).astype(np.int64),
+            "AWATER": (area_m2 * np.where(water, 0.1, 0.0)).astype(np.int64),
+            "INTPTLAT": [f"{v:+.7f}" for v in y0 + dy / 2],
+            "INTPTLON": [f"{v:+.7f}" for v in x0 + dx / 2],
+            "state_abbr": abbr,
+        }, geometry=polygons, crs="EPSG:4269"))
+    return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs="EPSG:4269")
+
+
+def synthetic_vehicles(tracts, seed=0):
+    """Vehicle ownership table (one row per tract) in the layout of the per-state CSVs."""
+    rng = np.random.default_rng(seed + 1)
+    n = len(tracts)
+    households = rng.integers(200, 4000, n)
+    shares = rng.dirichlet(np.ones(len(VEHICLE_COLUMNS) + 1), n)
+    df = pd.DataFrame({"total_households": households.astype(float)})
+    df["households_with_0_vehicles"] = np.round(households * shares[:, 0])
+    for i, col in enumerate(VEHICLE_COLUMNS, start=1):
+        df[col] = np.round(households * shares[:, i])
+    df["tract_geoid"] = tracts["GEOID"].to_numpy()
+    df["state_abbr"] = tracts["state_abbr"].to_numpy()
+    return df
+
+
+def synthetic_income(tracts, seed=0):
+    """Income/population table (one row per tract) in the layout of income_by_tract.csv."""
+    rng = np.random.default_rng(seed + 2)
+    n = len(tracts)
+    return pd.DataFrame({
+        "median_income": np.round(rng.lognormal(11.0, 0.4, n)),
+        "per_capita_income": np.round(rng.lognormal(10.3, 0.4, n)),
+        "total_population": rng.integers(500, 9000, n).astype(float),
+        "tract_geoid": tracts["GEOID"].to_numpy(),
+        "state_abbr": tracts["state_abbr"].to_numpy(),
+    })
+
+
+def write_state_inputs(tracts, vehicles, workdir):
+    """
+    Writes per-state shapefiles and vehicle CSVs under workdir and returns a
+    STATES-style dict pointing at them, for benchmarking the real loaders.
+    """
+    states = {}
+    for abbr, (fips, center) in SYNTHETIC_STATES.items():
+        state_tracts = tracts[tracts["state_abbr"] == abbr]
+        if state_tracts.empty:
+            continue
+        shapefile = os.path.join(workdir, f"tl_synthetic_{fips}_tract.shp")
+        vehicle_csv = os.path.join(workdir, f"vehicle_ownership_by_tract_{abbr}.csv")
+        state_tracts.drop(columns=["state_abbr"]).to_file(shapefile)
+        vehicles[vehicles["state_abbr"] == abbr].drop(columns=["state_abbr"]).to_csv(vehicle_csv, index=False)
+        states[abbr] = {"fips": fips, "center": center, "shapefile": shapefile, "vehicle_csv": vehicle_csv}
+    return states
+
+
+def synthetic_hail(n_reports, seed=0, states=SYNTHETIC_STATES):
+    """
+    Hail reports in the SPC CSV layout. Most reports fall along short storm
+    tracks (as real reports do); the rest are scattered over the region.
+    """
+    rng = np.random.default_rng(seed + 3)
+    centres = np.array([center for _, center in states.values()])
+    lat_lo, lon_lo = centres.min(axis=0) - STATE_HALF_SPAN
+    lat_hi, lon_hi = centres.max(axis=0) + STATE_HALF_SPAN
+
+    n_tracked = int(n_reports * 0.8)
+    n_tracks = max(1, n_tracked // 50)
+    track = rng.integers(0, n_tracks, n_tracked)
+    start_lat = rng.uniform(lat_lo, lat_hi, n_tracks)
+    start_lon = rng.uniform(lon_lo, lon_hi, n_tracks)
+    heading = rng.uniform(0, 2 * np.pi, n_tracks)
+    along = rng.uniform(0, 0.8, n_tracked)
+    lats = np.concatenate([start_lat[track] + along * np.cos(heading[track]) + rng.normal(0, 0.02, n_tracked),
+                           rng.uniform(lat_lo, lat_hi, n_reports - n_tracked)])
+    lons = np.concatenate([start_lon[track] + along * np.sin(heading[track]) + rng.normal(0, 0.02, n_tracked),
+                           rng.uniform(lon_lo, lon_hi, n_reports - n_tracked)])
+
+    abbrs = np.array(list(states))
+    return pd.DataFrame({
+        "Time": rng.integers(0, 24, n_reports) * 100 + rng.integers(0, 60, n_reports),
+        "Size": rng.choice([75, 100, 125, 175, 200, 250, 275, 300, 400], n_reports,
+                           p=[0.3, 0.3, 0.12, 0.12, 0.06, 0.04, 0.03, 0.02, 0.01]),
+        "Location": "SYNTHETIC",
+        "County": "SYNTHETIC",
+        "State": abbrs[rng.integers(0, len(abbrs), n_reports)],
+        "Lat": np.round(lats, 2),
+        "Lon": np.round(lons, 2),
+        "Comments": "",
+    })
+
+
+def synthetic_hail_gdf(n_reports, seed=0):
+    """synthetic_hail() as the point GeoDataFrame load_hail_data returns."""
+    df = synthetic_hail(n_reports, seed)
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.Lon, df.Lat), crs="EPSG:4326")
+
+
+class SyntheticRadar:
+    """
+    Minimal stand-in for a Py-ART Radar volume with the attributes the
+    renderer and the tract statistics read: super-resolution sweeps (0.5
+    degree rays, 250 m gates) holding a few storm cells over a field of
+    scattered clear-air echo.
+    """
+
+    def __init__(self, seed=0, nsweeps=4, nrays=720, ngates=1832, lat=41.32, lon=-96.37):
+        rng = np.random.default_rng(seed + 4)
+        self.latitude = {"data": np.array([lat])}
+        self.longitude = {"data": np.array([lon])}
+        self.nsweeps = nsweeps
+        self.fixed_angle = {"data": np.array([0.5, 0.9, 1.3, 1.8, 2.4, 3.1, 4.0, 5.1, 6.4][:nsweeps])}
+        self.sweep_start_ray_index = {"data": np.arange(nsweeps) * nrays}
+        self.sweep_end_ray_index = {"data": np.arange(nsweeps) * nrays + nrays - 1}
+        self.azimuth = {"data": np.tile((np.arange(nrays) * 0.5 + 0.25) % 360, nsweeps)}
+        self.elevation = {"data": np.repeat(self.fixed_angle["data"], nrays)}
+        self.range = {"data": 2125.0 + 250.0 * np.arange(ngates)}
+        self.metadata = {"vcp_pattern": 212}
+
+        az, rng_m = np.meshgrid(np.radians(self.azimuth["data"]), self.range["data"], indexing="ij")
+        x, y = rng_m * np.sin(az), rng_m * np.cos(az)
+        dbz = np.full(x.shape, np.nan, dtype=np.float32)
+        clutter = rng.random(x.shape) < 0.15
+        dbz[clutter] = rng.normal(8.0, 6.0, int(clutter.sum()))
+        for _ in range(6):
+            cx, cy = rng.uniform(-150_000, 150_000, 2)
+            peak, size = rng.uniform(45, 70), rng.uniform(5_000, 25_000)
+            cell = peak - 40.0 * np.hypot(x - cx, y - cy) / size
+            dbz = np.where(cell > np.nan_to_num(dbz, nan=-99.0), cell, dbz).astype(np.float32)
+        dbz[dbz < -10] = np.nan
+        self.fields = {"reflectivity": {"data": np.ma.masked_invalid(dbz)}}
@@ -4,13 +4,32 @@ import os
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "census_data")
 HAIL_REPORTS_DIR = os.path.join(BASE_DIR, "hail_reports")
+# Historical reports, stored as Parquet partitioned by date=YYYY-MM-DD/state=XX
+HAIL_ARCHIVE_DIR = os.path.join(BASE_DIR, "hail_archive")
 PROCESSED_DATA_DIR = os.path.join(DATA_DIR, "processed_data")
+STAGE_CACHE_DIR = os.path.join(PROCESSED_DATA_DIR, "stage_cache")
+# Persisted per-tract daily hail counts and rolling aggregates
+HAIL_ROLLUP_DIR = os.path.join(PROCESSED_DATA_DIR, "hail_rollup")
+# Span events and Chrome traces written by --profile runs
+TRACE_DIR = os.path.join(BASE_DIR, "traces")
 
 # --- File Paths ---
 INCOME_CSV_PATH = os.path.join(DATA_DIR, "income_by_tract.csv")
+# Rendered radar frames and per-scan tract statistics, written by generate_radar.py
+RADAR_INDEX_DB_PATH = os.path.join(BASE_DIR, "radar_images", "radar_index.sqlite")
+# Scans are fetched this many hours either side of each hail report
+RADAR_EVENT_WINDOW_HOURS = 2
+# Processed per-state outputs; the extension selects the storage format.
+PROCESSED_FILENAME_TEMPLATE = "gdf_{state}_with_hail_risk{ext}"
+PROCESSED_FORMAT_EXT = ".parquet"
+# All states' tracts with geometry at every LOD_TOLERANCES_DEG level, for the dashboard
+PROCESSED_LOD_FILENAME = "gdf_all_states_lod.parquet"
 
 # --- Data Source URLs ---
 HAIL_DATA_URL = "https://www.spc.noaa.gov/climo/reports/today_filtered_hail.csv"
+# Past days' reports; also accepted as a local path template (or a mirror
+# directory holding files with the same names) for backfills.
+HAIL_ARCHIVE_URL_TEMPLATE = "https://www.spc.noaa.gov/climo/reports/{date:%y%m%d}_rpts_filtered_hail.csv"
 
 # --- State Information ---
 # This dictionary centralizes all state-specific information.
@@ -45,6 +64,41 @@ STATES = {
     },
 }
 
+# --- Vector Tiles ---
+# Per-state MVT pyramids ({state}/{z}/{x}/{y}.pbf) written by the pipeline for the dashboard
+TILES_DIR = os.path.join(PROCESSED_DATA_DIR, "tiles")
+TILE_MIN_ZOOM = 4
+TILE_MAX_ZOOM = 12
+# Port of tile_server.py, a small HTTP server for TILES_DIR
+TILE_SERVER_PORT = 8765
+# URL at which viewers' browsers can fetch TILES_DIR (e.g. "http://localhost:8765"
+# for tile_server.py on a single machine). While None, the dashboard sends
+# GeoJSON instead of vector tiles.
+TILES_BASE_URL = None
+
+# --- Dashboard Settings ---
+# Upper bound on file-backed objects (tract frames, radar index, hail windows)
+# kept in memory between Streamlit reruns.
+DASHBOARD_CACHE_MAX_ENTRIES = 32
+# Radar frame images are cached apart from the tract data, bounded by size:
+# each animation loop holds megabytes of base64 PNGs
+DASHBOARD_IMAGE_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# Delay between radar frames when the loop plays in the browser
+RADAR_ANIMATION_INTERVAL_MS = 200
+# Default length of the animated loop, starting at the selected radar time
+RADAR_ANIMATION_WINDOW_HOURS = 3
+# Option in the state selector showing every state at once
+ALL_STATES_OPTION = "All states"
+# Initial map zoom of the single-state and all-states views
+STATE_VIEW_ZOOM = 6
+REGION_VIEW_ZOOM = 5
+# Geometry simplification levels (degrees) precomputed by the pipeline; level 0 is
+# the full geometry. Without vector tiles the dashboard shows the coarsest level
+# that is invisible at the view's zoom, or a coarser one to keep the GeoJSON
+# sent to the browser under DASHBOARD_PAYLOAD_BUDGET_MB.
+LOD_TOLERANCES_DEG = (0.0, 0.001, 0.003, 0.01)
+DASHBOARD_PAYLOAD_BUDGET_MB = 20
+
 # --- Map and Visualization Settings ---
 LAYER_OPTIONS = {
     "Vehicle Ownership Density": "car_ownership_density",
@@ -52,9 +106,57 @@ LAYER_OPTIONS = {
     "Median Income": "median_income",
     "Per Capita Income": "per_capita_income",
     "Hail Risk Score": "hail_risk_score",
+    "Hail Risk Score (size-weighted)": "hail_risk_score_kernel",
+    "Radar Max Reflectivity (dBZ)": "radar_max_dbz",
+    "Radar Hail Risk Score": "radar_hail_risk_score",
 }
 
+# Rolling hail aggregates: window lengths in days, and the half-life of the
+# exponentially decayed report count.
+ROLLUP_WINDOWS = (7, 30, 365)
+ROLLUP_HALF_LIFE_DAYS = 30
+
+# Size-weighted hail footprint kernel. Each report spreads over a radius of
+# BASE + PER_INCH * size (capped at MAX) and contributes size_inch * (1 - (d/r)^2)
+# to every tract within it, with d measured to the tract's equal-area disc.
+# Reports with no size count as DEFAULT_SIZE.
+HAIL_KERNEL_BASE_RADIUS_KM = 3.0
+HAIL_KERNEL_RADIUS_PER_INCH_KM = 4.0
+HAIL_KERNEL_MAX_RADIUS_KM = 20.0
+HAIL_KERNEL_DEFAULT_SIZE_INCH = 1.0
+
+# Cell size (degrees) of the tract lookup grid used for point-in-tract assignment.
+# Smaller cells mean fewer exact polygon tests at the cost of a larger index.
+TRACT_INDEX_CELL_DEG = 0.01
+
 # A special value for a specific data filter in the original pipeline.
 # This is preserved to maintain the original logic.
 # This longitude is a proxy for highway 63, where everything west of the highway is in the business area.
 MISSOURI_LONGITUDE_FILTER = -92.3
+
+# --- Tract Loading ---
+# TIGER attributes the pipeline uses (GEOID key, areas, internal point); nothing else is read
+TRACT_COLUMNS = ["GEOID", "ALAND", "AWATER", "INTPTLAT", "INTPTLON"]
+# Per-state OGR SQL filters applied while reading, so excluded tracts are never loaded
+TRACT_READ_FILTERS = {
+    "MO": f"CAST(INTPTLON AS FLOAT) < {MISSOURI_LONGITUDE_FILTER}",
+}
+# States' shapefiles are read concurrently (the reads release the GIL)
+TRACT_LOAD_WORKERS = 4
+
+# --- Tract Schema ---
+# Columns (and dtypes) read from the vehicle and income CSVs; nothing else is loaded.
+# GEOIDs are int64 keys for the merges; counts and incomes fit float32 exactly.
+VEHICLE_COUNT_COLUMNS = [
+    "households_with_1_vehicle", "households_with_2_vehicles",
+    "households_with_3_vehicles", "households_with_4_vehicles",
+    "households_with_5_vehicles", "households_with_6_vehicles",
+    "households_with_7_vehicles", "households_with_8_or_more_vehicles",
+]
+VEHICLE_CSV_DTYPES = {"tract_geoid": "int64", **{col: "float32" for col in VEHICLE_COUNT_COLUMNS}}
+INCOME_CSV_DTYPES = {
+    "tract_geoid": "int64",
+    "median_income": "float32",
+    "per_capita_income": "float32",
+    "total_population": "float32",
+}
@@ -0,0 +1,257 @@
+import base64
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import geopandas as gpd
+import pandas as pd
+
+from config import DASHBOARD_CACHE_MAX_ENTRIES, DASHBOARD_IMAGE_CACHE_MAX_BYTES
+from map_style import colorize, format_tooltips
+from radar_catalog import RadarCatalog
+from tract_lod import lod_geometry_column
+from utils import load_geodata, setup_logging
+
+logger = setup_logging()
+
+class FileCache:
+    """
+    Bounded LRU cache for file-backed loaders.
+
+    Entries are keyed by loader name, absolute path(s) and each file's
+    (mtime_ns, size), so an edited file is reloaded on the next access while
+    untouched files are served from memory. The cache lives at module level,
+    which Streamlit keeps alive across script reruns.
+
+    Loads run outside the lock, so one session's slow load never blocks
+    other sessions' hits; sessions asking for a key that is already being
+    loaded wait for that load instead of repeating it. With `sizeof`, the
+    cache is also bounded by the total approximate size of its entries.
+    """
+
+    def __init__(self, max_entries=DASHBOARD_CACHE_MAX_ENTRIES, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, load):
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another session is loading this key; take its result (or retry if it failed)
+            loading.wait()
+
+        try:
+            value = load()
+            size = self.sizeof(value) if self.sizeof else 0
+            with self._lock:
+                self._entries[key] = value
+                self._sizes[key] = size
+                self.total_bytes += size
+                self._evict()
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def _evict(self):
+        # The newest entry is kept even if it alone exceeds max_bytes
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            key, _ = self._entries.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(key)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+cache = FileCache()
+# Data URIs of radar frames, bounded by their total length
+image_cache = FileCache(max_entries=DASHBOARD_CACHE_MAX_ENTRIES, max_bytes=DASHBOARD_IMAGE_CACHE_MAX_BYTES,
+                        sizeof=lambda images: sum(len(image) for image in images if image))
+
+def file_signature(path):
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def cached_loader(func=None, store=None):
+    """
+    Memoizes a loader whose first argument is a path (or a tuple of paths).
+    Remaining arguments must be hashable and become part of the key.
+    Entries go to the shared `cache` unless another FileCache is given as `store`.
+    """
+    if func is None:
+        return functools.partial(cached_loader, store=store)
+    store = store or cache
+
+    @functools.wraps(func)
+    def wrapper(paths, *args):
+        path_list = (paths,) if isinstance(paths, str) else tuple(paths)
+        key = (func.__name__,) + tuple(
+            (os.path.abspath(p), file_signature(p)) for p in path_list
+        ) + args
+        return store.get_or_load(key, lambda: func(paths, *args))
+    return wrapper
+
+@cached_loader
+def load_tracts(path):
+    """
+    Loads a processed tract file and its GeoJSON FeatureCollection for pydeck.
+    Callers must treat the returned objects as read-only.
+    """
+    gdf = load_geodata(path)
+    return gdf, json.loads(gdf.to_json())
+
+def style_features(gdf, tracts_geojson, field, label):
+    """
+    Returns the tract FeatureCollection with fill_color and tooltip_text for
+    one layer. Colours and tooltips are computed column-wise.
+    """
+    values = gdf[field] if field in gdf.columns else pd.Series(float("nan"), index=gdf.index)
+    colors = colorize(values, field).tolist()
+    tooltips = format_tooltips(values, label).tolist()
+
+    # New feature dicts share the cached geometry instead of mutating it
+    features = [
+        {
+            "type": "Feature",
+            "geometry": feature["geometry"],
+            "properties": {**feature["properties"], "fill_color": color, "tooltip_text": tooltip},
+        }
+        for feature, color, tooltip in zip(tracts_geojson["features"], colors, tooltips)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+@cached_loader
+def load_styled_tracts(path, field, label):
+    """
+    Styled FeatureCollection of a processed tract file, cached per (file
+    version, layer) so switching layers back and forth is free.
+    """
+    gdf, tracts_geojson = load_tracts(path)
+    return style_features(gdf, tracts_geojson, field, label)
+
+@cached_loader
+def load_lod_tracts(path):
+    """
+    Loads the all-states level-of-detail file. Every state and detail level
+    is derived from this one frame, so switching views never re-reads it.
+    """
+    return load_geodata(path)
+
+@cached_loader
+def load_region_tracts(path, states, level):
+    """Tracts of `states` at one detail level, and their GeoJSON FeatureCollection."""
+    lod_gdf = load_lod_tracts(path)
+    geometry_columns = [c for c in lod_gdf.columns if c.startswith("geometry")]
+    property_columns = [c for c in lod_gdf.columns if c not in geometry_columns and not c.startswith("geojson_bytes")]
+    subset = lod_gdf.loc[lod_gdf["state_abbr"].isin(states), property_columns]
+    gdf = gpd.GeoDataFrame(subset, geometry=lod_gdf.loc[subset.index, lod_geometry_column(level)].values,
+                           crs=lod_gdf.crs)
+    return gdf, json.loads(gdf.to_json())
+
+@cached_loader
+def load_styled_region(path, states, level, field, label):
+    """Styled FeatureCollection of `states` at one detail level, cached per layer."""
+    gdf, tracts_geojson = load_region_tracts(path, states, level)
+    return style_features(gdf, tracts_geojson, field, label)
+
+@cached_loader
+def load_tile_metadata(path):
+    """Loads a vector tile pyramid's metadata.json."""
+    with open(path, "r") as f:
+        return json.load(f)
+
+@cached_loader
+def load_radar_catalog(paths):
+    """
+    Loads the radar frame catalog from the first of `paths`: the SQLite radar
+    index, or a legacy radar_index.json. For SQLite, pass the -wal file as a
+    second path; frames committed since the last checkpoint only live there,
+    so it has to be part of the cache key.
+    """
+    path = paths[0]
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            return RadarCatalog.from_entries(json.load(f))
+    return RadarCatalog.from_index(path)
+
+@cached_loader(store=image_cache)
+def load_radar_frame_images(paths):
+    """
+    Radar PNGs as data URIs, so an animation page can carry every frame with
+    it. Missing images come back as None.
+    """
+    images = []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                images.append("data:image/png;base64," + base64.b64encode(f.read()).decode("ascii"))
+        except FileNotFoundError:
+            logger.warning(f"Radar image not found: {path}")
+            images.append(None)
+    return images
+
+@cached_loader
+def load_hail_reports(paths, dates):
+    """
+    Loads and concatenates daily hail CSVs (missing days are skipped), tagging
+    each row with its report date. Callers must treat the result as read-only.
+    """
+    hail_dfs = []
+    for file_path, date_str in zip(paths, dates):
+        if not os.path.exists(file_path):
+            continue
+        try:
+            daily_df = pd.read_csv(file_path)
+            daily_df["Date"] = date_str
+            hail_dfs.append(daily_df)
+        except Exception as e:
+            logger.error(f"Error reading hail data for {date_str}: {e}")
+
+    if not hail_dfs:
+        return pd.DataFrame()
+    hail_df = pd.concat(hail_dfs, ignore_index=True)
+    hail_df["Size_Inch"] = hail_df["Size"] / 100
+    return hail_df.sort_values(by=["Date", "Time"], ascending=[False, False])
@@ -1,6 +1,9 @@
+import argparse
 import os
+import shutil
 import pandas as pd
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
 import requests
 import io
 
@@ -8,11 +11,28 @@ import io
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import HAIL_DATA_URL, HAIL_REPORTS_DIR, STATES
+from config import HAIL_DATA_URL, HAIL_REPORTS_DIR, HAIL_ARCHIVE_DIR, HAIL_ARCHIVE_URL_TEMPLATE, STATES
 from utils import setup_logging, ensure_dir_exists
+from tracing import traced
 
 logger = setup_logging()
 
+def filter_to_states(df):
+    """
+    Keeps only reports from the states in the STATES config.
+    """
+    allowed_states = list(STATES.keys())
+
+    # NOAA reports usually use 'State' or 'St' as the column header
+    if 'State' in df.columns:
+        return df[df['State'].isin(allowed_states)]
+    elif 'St' in df.columns:
+        return df[df['St'].isin(allowed_states)]
+    # Fallback if column names change unexpectedly
+    logger.warning("Could not find 'State' column. Saving all data.")
+    return df
+
+@traced()
 def download_hail_report():
     """
     Downloads the daily hail report from the NOAA website, filters it for 
@@ -36,17 +56,7 @@ def download_hail_report():
             df = pd.read_csv(io.StringIO(response.text))
 
             # 2. Filter based on the keys in your STATES config (e.g., 'MO', 'KS')
-            allowed_states = list(STATES.keys())
-            
-            # NOAA reports usually use 'State' or 'St' as the column header
-            if 'State' in df.columns:
-                df_filtered = df[df['State'].isin(allowed_states)]
-            elif 'St' in df.columns:
-                df_filtered = df[df['St'].isin(allowed_states)]
-            else:
-                # Fallback if column names change unexpectedly
-                logger.warning("Could not find 'State' column. Saving all data.")
-                df_filtered = df
+            df_filtered = filter_to_states(df)
 
             # 3. Save the filtered DataFrame to CSV
             df_filtered.to_csv(filepath, index=False)
@@ -62,4 +72,145 @@ def download_hail_report():
     else:
         logger.info(f"Using existing hail report: {filepath}")
 
-    return filepath
\ No newline at end of file
+    return filepath
+
+# --- Historical archive backfill ---
+
+def _archive_day_dir(day):
+    return os.path.join(HAIL_ARCHIVE_DIR, f"date={day.isoformat()}")
+
+def _archive_day_complete(day):
+    return os.path.exists(os.path.join(_archive_day_dir(day), "_SUCCESS"))
+
+def _resolve_source(source, day):
+    """
+    Expands a source for one day: a URL/path template, or a mirror directory
+    holding files named like the SPC archive.
+    """
+    if "{" not in source:
+        source = os.path.join(source, os.path.basename(HAIL_ARCHIVE_URL_TEMPLATE))
+    return source.format(date=day)
+
+@traced()
+def fetch_daily_hail_reports(day, source=HAIL_ARCHIVE_URL_TEMPLATE):
+    """
+    Fetches and parses one day's SPC hail CSV, filtered to the configured states.
+
+    Returns:
+        pd.DataFrame: the day's reports, or None if the source has no file for that day.
+    """
+    location = _resolve_source(source, day)
+    if location.startswith(("http://", "https://")):
+        response = requests.get(location, timeout=30)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        df = pd.read_csv(io.StringIO(response.text))
+    else:
+        if not os.path.exists(location):
+            return None
+        df = pd.read_csv(location)
+
+    df = filter_to_states(df).copy()
+    if 'St' in df.columns and 'State' not in df.columns:
+        df = df.rename(columns={'St': 'State'})
+
+    # Fix column types so every partition shares one schema
+    for col in ("Time", "Size"):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int32")
+    for col in ("Lat", "Lon"):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in ("Location", "County", "State", "Comments"):
+        if col in df.columns:
+            df[col] = df[col].astype("string")
+    return df
+
+@traced()
+def write_archive_day(day, df, overwrite=False):
+    """
+    Writes one day's reports as date=/state= Parquet partitions.
+
+    The partition is assembled in a temporary directory and renamed into place,
+    then marked with _SUCCESS, so readers never see a half-written day.
+    """
+    final_dir = _archive_day_dir(day)
+    # A leading underscore keeps dataset readers from picking up the temp directory
+    tmp_dir = os.path.join(HAIL_ARCHIVE_DIR, f"_tmp-{os.path.basename(final_dir)}-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for state_abbr, state_df in df.groupby("State"):
+        state_dir = os.path.join(tmp_dir, f"state={state_abbr}")
+        os.makedirs(state_dir)
+        state_df.drop(columns=["State"]).to_parquet(os.path.join(state_dir, "part-0.parquet"), index=False)
+    # Days without reports still get a marker so they are not fetched again
+    open(os.path.join(tmp_dir, "_SUCCESS"), "w").close()
+
+    if os.path.exists(final_dir):
+        if not overwrite:
+            shutil.rmtree(tmp_dir)
+            return final_dir
+        shutil.rmtree(final_dir)
+    os.replace(tmp_dir, final_dir)
+    return final_dir
+
+def _backfill_day(day, source, overwrite):
+    df = fetch_daily_hail_reports(day, source)
+    if df is None:
+        return day, None
+    write_archive_day(day, df, overwrite=overwrite)
+    return day, len(df)
+
+@traced()
+def backfill_hail_archive(start_date, end_date, source=HAIL_ARCHIVE_URL_TEMPLATE, max_workers=8, overwrite=False):
+    """
+    Ingests SPC daily hail reports for [start_date, end_date] into HAIL_ARCHIVE_DIR.
+
+    Days that are already archived are skipped unless overwrite is set, so the
+    backfill can be re-run incrementally. Fetching and parsing run in a thread pool.
+
+    Returns:
+        dict: counts of days written, skipped and missing, and rows ingested.
+    """
+    ensure_dir_exists(HAIL_ARCHIVE_DIR, logger)
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    pending = [d for d in days if overwrite or not _archive_day_complete(d)]
+    summary = {"written": 0, "skipped": len(days) - len(pending), "missing": 0, "failed": 0, "rows": 0}
+    logger.info(f"Backfilling {len(pending)} of {len(days)} days from {source}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_backfill_day, d, source, overwrite): d for d in pending}
+        for future in as_completed(futures):
+            try:
+                day, rows = future.result()
+            except Exception as e:
+                logger.error(f"Failed to backfill {futures[future]}: {e}")
+                summary["failed"] += 1
+                continue
+            if rows is None:
+                logger.warning(f"No hail report available for {day}")
+                summary["missing"] += 1
+            else:
+                summary["written"] += 1
+                summary["rows"] += rows
+
+    logger.info(f"Backfill finished: {summary}")
+    return summary
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Download today's hail report or backfill the archive.")
+    arg_parser.add_argument("--backfill", nargs=2, metavar=("START", "END"),
+                            help="Backfill the Parquet archive for an inclusive YYYY-MM-DD date range.")
+    arg_parser.add_argument("--source", default=HAIL_ARCHIVE_URL_TEMPLATE,
+                            help="URL/path template with {date:...} or a local mirror directory.")
+    arg_parser.add_argument("--workers", type=int, default=8)
+    arg_parser.add_argument("--overwrite", action="store_true", help="Re-ingest days that are already archived.")
+    args = arg_parser.parse_args()
+
+    if args.backfill:
+        start, end = (date.fromisoformat(d) for d in args.backfill)
+        backfill_hail_archive(start, end, source=args.source, max_workers=args.workers, overwrite=args.overwrite)
+    else:
+        download_hail_report()
@@ -0,0 +1,86 @@
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from radar_composite import gate_lonlat
+from radar_raster import ground_range, sweep_rays
+
+# Azimuth bin width of the lookup tables. NEXRAD super-resolution rays sit at
+# the centres of 0.5 degree bins, so they map onto the table exactly.
+LOOKUP_AZIMUTH_RESOLUTION = 0.5
+
+
+class GateLookup:
+    """
+    Persisted (azimuth bin, gate) -> tract position tables, one per radar site
+    and sweep geometry.
+
+    A site's gate geometry only depends on the sweep's elevation and range
+    gates, so each table is built once by geolocating every bin centre and
+    running it through the tract index, then saved as .npy and memory-mapped
+    on later use. Tables live under a directory named after the tract index
+    fingerprint, so new tract boundaries get fresh tables and the old ones
+    are removed.
+    """
+
+    def __init__(self, tract_index, root, az_resolution=LOOKUP_AZIMUTH_RESOLUTION):
+        self.tract_index = tract_index
+        self.az_resolution = float(az_resolution)
+        self.n_bins = int(round(360.0 / self.az_resolution))
+        self.root = root
+        self.dir = os.path.join(root, tract_index.fingerprint())
+        self._tables = {}
+
+    def prune_stale(self):
+        """Removes tables built against other tract vintages."""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if path != self.dir and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def table_name(self, site, radar, sweep):
+        """File name identifying a site's sweep geometry (VCP, elevation, gate layout)."""
+        rays = sweep_rays(radar, sweep)
+        elevation = float(np.mean(radar.elevation['data'][rays]))
+        ranges = np.asarray(radar.range['data'], dtype=np.float64)
+        spacing = ranges[1] - ranges[0] if len(ranges) > 1 else 0.0
+        vcp = (getattr(radar, "metadata", None) or {}).get("vcp_pattern", "na")
+        return (f"{site}_vcp{vcp}_el{elevation:.1f}_r{ranges[0]:.0f}"
+                f"_dr{spacing:.0f}_n{len(ranges)}_az{self.az_resolution:g}.npy")
+
+    def build_table(self, radar, sweep):
+        """Tract position (-1 outside all tracts) of every bin-centre gate in a sweep."""
+        rays = sweep_rays(radar, sweep)
+        elevation = float(np.mean(radar.elevation['data'][rays]))
+        distances = ground_range(radar.range['data'], elevation)
+        centres = (np.arange(self.n_bins) + 0.5) * self.az_resolution
+        lons, lats = gate_lonlat(float(radar.longitude['data'][0]), float(radar.latitude['data'][0]),
+                                 centres[:, None], distances[None, :])
+        return self.tract_index.locate(lons.ravel(), lats.ravel()).astype(np.int32).reshape(lons.shape)
+
+    def table(self, site, radar, sweep):
+        """Returns the (memory-mapped) table for a sweep, building it on first use."""
+        name = self.table_name(site, radar, sweep)
+        if name in self._tables:
+            return self._tables[name]
+        path = os.path.join(self.dir, name)
+        if not os.path.exists(path):
+            os.makedirs(self.dir, exist_ok=True)
+            # Unique temp name: several render workers may build the same table at once
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.npy"
+            np.save(tmp_path, self.build_table(radar, sweep))
+            os.replace(tmp_path, path)
+        table = np.load(path, mmap_mode="r")
+        self._tables[name] = table
+        return table
+
+    def positions(self, site, radar, sweep, ray_idx, gate_idx):
+        """Tract positions for gates given as (ray within sweep, gate) indices."""
+        rays = sweep_rays(radar, sweep)
+        azimuths = np.asarray(radar.azimuth['data'][rays], dtype=np.float64)[ray_idx] % 360.0
+        bins = np.minimum((azimuths / self.az_resolution).astype(np.int64), self.n_bins - 1)
+        return self.table(site, radar, sweep)[bins, gate_idx]
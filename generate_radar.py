@@ -1,71 +1,266 @@
+import argparse
 import glob
 import os
-import json
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from radar_utils import get_closest_nexrad, download_scans_window, generate_radar_image
+from functools import lru_cache
+from config import RADAR_EVENT_WINDOW_HOURS, RADAR_INDEX_DB_PATH
+from gate_lookup import GateLookup
+from radar_composite import scan_tract_max
+from radar_index import RadarIndex
+from radar_utils import get_closest_nexrad_batch, download_scans_window, generate_radar_frames, read_radar
+from stage_cache import latest_tract_index_path
+from tract_index import TractIndex
+from tracing import finish_profile, start_profile, summarize, traced
 
 # Settings
 HAIL_REPORTS_DIR = "hail_reports" 
 CACHE_DIR = "radar_images"
 INDEX_PATH = os.path.join(CACHE_DIR, "radar_index.json")
-os.makedirs(os.path.join(CACHE_DIR, "plots"), exist_ok=True)
+INDEX_DB_PATH = RADAR_INDEX_DB_PATH
+# Content-addressed frame images, one subdirectory per pyramid width
+FRAMES_DIR = os.path.join(CACHE_DIR, "frames")
+# "lowest" uses the lowest sweep for tract statistics; "column" takes the max over all sweeps
+COMPOSITE_MODE = "lowest"
+# Per-site gate -> tract tables, memory-mapped by the render workers
+GATE_LOOKUP_DIR = os.path.join(CACHE_DIR, "gate_lookup")
+os.makedirs(FRAMES_DIR, exist_ok=True)
 
-def main():
-    existing_metadata = []
-    processed_keys = set() 
+@lru_cache(maxsize=1)
+def load_worker_lookup(tract_index_path):
+    """Loads the tract index and its gate lookup tables once per worker process."""
+    return GateLookup(TractIndex.load(tract_index_path), GATE_LOOKUP_DIR)
 
-    if os.path.exists(INDEX_PATH):
-        with open(INDEX_PATH, "r") as f:
-            existing_metadata = json.load(f)
-            processed_keys = {(m['radar'], m['timestamp']) for m in existing_metadata}
+def remove_raw(raw_file):
+    """Deletes a downloaded scan once it is rendered (or given up on) to save local space."""
+    if os.path.exists(raw_file):
+        os.remove(raw_file)
+
+@traced("generate_radar.render_scan")
+def render_scan(job, index_path=INDEX_DB_PATH, tract_index_path=None):
+    """
+    Renders a single raw scan as an image pyramid, records its per-tract
+    maximum reflectivity (when a tract index is available), commits it to the
+    index and returns its entry (None on failure). Runs inside worker
+    processes, so every error is contained here.
+    """
+    raw_file, radar_id, ts_iso = job
+    echo = None
+    try:
+        radar = read_radar(raw_file)
+        rendered = generate_radar_frames(raw_file, FRAMES_DIR, radar=radar) if radar is not None else None
+        bounds, variants = rendered if rendered else (None, [])
+        if bounds and tract_index_path:
+            try:
+                lookup = load_worker_lookup(tract_index_path)
+                positions, max_dbz = scan_tract_max(radar, lookup.tract_index, mode=COMPOSITE_MODE,
+                                                    lookup=lookup, site=radar_id)
+                echo = (lookup.tract_index.geoids[positions], max_dbz)
+            except Exception as e:
+                print(f"Failed to compute tract statistics for {raw_file}: {e}")
+    except Exception as e:
+        print(f"Failed to render {raw_file}: {e}")
+        bounds = None
+    finally:
+        remove_raw(raw_file)
+
+    if not bounds:
+        return None
+    entry = {
+        "image_path": variants[0]["image_path"],
+        "variants": variants,
+        "bounds": bounds,
+        "timestamp": ts_iso,
+        "radar": radar_id
+    }
+    # Checkpoint immediately so a crash later in the run keeps this frame
+    index = RadarIndex(index_path)
+    if echo is not None:
+        index.add_tract_echo(radar_id, ts_iso, *echo)
+    index.add(entry)
+    return entry
+
+class RenderPool:
+    """
+    Runs render_scan jobs in worker processes.
+
+    A worker that dies outright (e.g. a segfault in the decoder on a corrupt
+    file) breaks a ProcessPoolExecutor: every pending job fails and later
+    submits raise. When that happens the pool is rebuilt and the unfinished
+    scans are resubmitted together. Only if the pool breaks again are the
+    scans it lost split in halves and rerun, down to the single scan that
+    crashes, which is dropped; everything else still renders concurrently.
+    """
+
+    def __init__(self, workers, *render_args):
+        self.workers = workers
+        self.render_args = render_args
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.futures = {}
+        self.rendered = 0
+
+    def _restart(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def _result(self, future, job, lost):
+        try:
+            self.rendered += future.result() is not None
+        except BrokenProcessPool:
+            lost.append(job)
+        except Exception as e:
+            print(f"Worker failed on {job[0]}: {e}")
+
+    def _run_batch(self, jobs):
+        """Runs jobs on a fresh pool and returns those lost to a crashed worker."""
+        self._restart()
+        futures = {self.pool.submit(render_scan, job, *self.render_args): job for job in jobs}
+        lost = []
+        for future in as_completed(futures):
+            self._result(future, futures[future], lost)
+        return lost
+
+    def _recover(self, jobs):
+        """Reruns the scans lost to a broken pool, bisecting only while the pool keeps breaking."""
+        print(f"A render worker crashed; resubmitting {len(jobs)} unfinished scans.")
+        lost = self._run_batch(jobs)
+        batches = [lost] if lost else []
+        while batches:
+            batch = batches.pop()
+            if len(batch) == 1:
+                print(f"Worker crashed on {batch[0][0]}; skipping it.")
+                # The crashed worker never reached render_scan's own cleanup
+                remove_raw(batch[0][0])
+                continue
+            half = len(batch) // 2
+            for part in (batch[:half], batch[half:]):
+                lost = self._run_batch(part)
+                if lost:
+                    batches.append(lost)
+        self._restart()
+
+    def _collect(self):
+        """Collects every submitted future; returns the jobs lost to a broken pool."""
+        lost = []
+        futures, self.futures = self.futures, {}
+        for future in as_completed(futures):
+            self._result(future, futures[future], lost)
+        return lost
+
+    def submit(self, job):
+        try:
+            self.futures[self.pool.submit(render_scan, job, *self.render_args)] = job
+        except BrokenProcessPool:
+            # Every pending future has already failed
+            self._recover(self._collect() + [job])
+
+    def finish(self):
+        """Waits for every submitted scan and returns the number of frames rendered."""
+        lost = self._collect()
+        if lost:
+            self._recover(lost)
+        return self.rendered
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+def main(workers=1, export_json=False):
+    migrate = not os.path.exists(INDEX_DB_PATH)
+    index = RadarIndex(INDEX_DB_PATH)
+    if migrate and os.path.exists(INDEX_PATH):
+        # First run against the SQLite index: carry over the frames already published
+        print(f"Imported {index.import_json(INDEX_PATH)} frames from {INDEX_PATH}")
+    # Anything committed by an earlier (possibly interrupted) run is skipped
+    processed_keys = index.keys()
+    tract_index_path = latest_tract_index_path()
+    if tract_index_path is None:
+        print("No tract index found (run main_data.py first); skipping per-tract radar statistics.")
+    else:
+        # Lookup tables from an older tract vintage can no longer be used
+        GateLookup(TractIndex.load(tract_index_path), GATE_LOOKUP_DIR).prune_stale()
     
-    report_files = glob.glob(os.path.join(HAIL_REPORTS_DIR, "*.csv"))
-    metadata_list = existing_metadata 
+    report_files = sorted(glob.glob(os.path.join(HAIL_REPORTS_DIR, "*.csv")))
+    rendered = 0
 
-    for report_path in report_files:
-        print(f"--- Processing: {os.path.basename(report_path)} ---")
-        df = pd.read_csv(report_path)
-        unique_events = df.drop_duplicates(subset=['Lat', 'Lon']).head(5) 
+    # Scans are rendered as soon as their event window is downloaded, so
+    # downloads for the next event overlap with rendering of the previous one.
+    pool = RenderPool(workers, INDEX_DB_PATH, tract_index_path) if workers > 1 else None
+    queued_files = set()
 
-        for idx, row in unique_events.iterrows():
-            try:
-                event_date_str = os.path.basename(report_path).replace(".csv", "")
-                time_str = str(row['Time']).zfill(4) 
-                event_dt = datetime.strptime(f"{event_date_str} {time_str}", "%Y-%m-%d %H%M")
-            except: continue
-
-            radar_id = get_closest_nexrad(row['Lat'], row['Lon'])
-            raw_output = f"{CACHE_DIR}/raw/{event_date_str}"
-            files = download_scans_window(radar_id, event_dt, window_hours=2, output_dir=raw_output)
-            
-            for raw_file in files:
-                fname = os.path.basename(raw_file)
-                ts_part = fname.split('_')[1]
-                ts_iso = datetime.strptime(f"{event_date_str} {ts_part}", "%Y-%m-%d %H%M%S").isoformat()
-
-                if (radar_id, ts_iso) in processed_keys:
-                    if os.path.exists(raw_file): os.remove(raw_file)
-                    continue 
-
-                img_path = os.path.join(CACHE_DIR, "plots", f"{fname}.png")
-                bounds = generate_radar_image(raw_file, img_path)
-
-                if bounds:
-                    metadata_list.append({
-                        "image_path": img_path,
-                        "bounds": bounds,
-                        "timestamp": ts_iso,
-                        "radar": radar_id
-                    })
+    def submit(job):
+        nonlocal rendered
+        if pool is None:
+            rendered += render_scan(job, INDEX_DB_PATH, tract_index_path) is not None
+        else:
+            pool.submit(job)
+        queued_files.add(job[0])
+
+    try:
+        for report_path in report_files:
+            print(f"--- Processing: {os.path.basename(report_path)} ---")
+            df = pd.read_csv(report_path)
+            # Resolve the nearest radar for the whole report frame in one vectorized pass
+            df['radar_id'], df['radar_dist_km'] = get_closest_nexrad_batch(df['Lat'], df['Lon'])
+            unique_events = df.drop_duplicates(subset=['Lat', 'Lon']).head(5) 
+
+            for idx, row in unique_events.iterrows():
+                try:
+                    event_date_str = os.path.basename(report_path).replace(".csv", "")
+                    time_str = str(row['Time']).zfill(4) 
+                    event_dt = datetime.strptime(f"{event_date_str} {time_str}", "%Y-%m-%d %H%M")
+                except: continue
+
+                radar_id = row['radar_id']
+                if radar_id is None: continue
+                raw_output = f"{CACHE_DIR}/raw/{event_date_str}"
+                files = download_scans_window(radar_id, event_dt, window_hours=RADAR_EVENT_WINDOW_HOURS, output_dir=raw_output)
+                
+                for raw_file in files:
+                    fname = os.path.basename(raw_file)
+                    ts_part = fname.split('_')[1]
+                    ts_iso = datetime.strptime(f"{event_date_str} {ts_part}", "%Y-%m-%d %H%M%S").isoformat()
+
+                    # Overlapping event windows yield the same scan more than once
+                    if (radar_id, ts_iso) in processed_keys:
+                        if raw_file not in queued_files:
+                            remove_raw(raw_file)
+                        continue 
                     processed_keys.add((radar_id, ts_iso))
 
-                if os.path.exists(raw_file):
-                    os.remove(raw_file) # Clean up raw data to save local space
+                    submit((raw_file, radar_id, ts_iso))
 
-    with open(INDEX_PATH, "w") as f:
-        json.dump(metadata_list, f, indent=2)
+        if pool is not None:
+            rendered += pool.finish()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        # The dashboard reads the SQLite index; the JSON copy is only for
+        # consumers that need a flat file. It includes frames committed before
+        # a failure, and is ordered by timestamp and radar, so it is
+        # reproducible regardless of the order in which workers finished.
+        if export_json:
+            index.export_json(INDEX_PATH)
+    print(f"Rendered {rendered} new frames.")
     print("Static assets ready for GitHub.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="Render NEXRAD scans around recent hail reports.")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Number of rendering processes (1 renders serially in-process).")
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="Record per-stage time, CPU, peak memory and row counts under TRACE_DIR (JSON events + Chrome trace).")
+    arg_parser.add_argument("--export-json", action="store_true",
+                            help=f"Also rewrite {INDEX_PATH} from the SQLite index at the end of the run.")
+    args = arg_parser.parse_args()
+
+    # Worker processes pick the events file up from the environment
+    events_path = start_profile("generate_radar") if args.profile else None
+    try:
+        main(workers=args.workers, export_json=args.export_json)
+    finally:
+        if events_path is not None:
+            trace_path, events = finish_profile(events_path)
+            print("\n".join(summarize(events)))
+            print(f"Profile written to {events_path} and {trace_path}")
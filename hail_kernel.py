@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+# Kilometres per degree of latitude on a spherical earth
+KM_PER_DEG = 111.195
+
+def report_radius_km(size_inch, base_km, per_inch_km, max_km):
+    """Footprint radius of each report: grows linearly with stone size, capped at max_km."""
+    return np.minimum(base_km + per_inch_km * size_inch, max_km)
+
+def tract_centroids(gdf):
+    """
+    Lon/lat of each tract's internal point (TIGER INTPTLON/INTPTLAT), falling
+    back to a representative point when those columns are missing.
+    """
+    if {"INTPTLON", "INTPTLAT"} <= set(gdf.columns):
+        lons = pd.to_numeric(gdf["INTPTLON"], errors="coerce").to_numpy(dtype=np.float64)
+        lats = pd.to_numeric(gdf["INTPTLAT"], errors="coerce").to_numpy(dtype=np.float64)
+        if not (np.isnan(lons).any() or np.isnan(lats).any()):
+            return lons, lats
+    points = gdf.geometry.representative_point()
+    return points.x.to_numpy(), points.y.to_numpy()
+
+def tract_radii_km(gdf):
+    """
+    Radius of the disc with each tract's total area, used to measure distance
+    to a tract's edge rather than its centroid so large rural tracts are not
+    missed by reports that fall inside them.
+    """
+    if {"ALAND", "AWATER"} <= set(gdf.columns):
+        area_m2 = gdf["ALAND"].astype(float) + gdf["AWATER"].astype(float)
+    else:
+        area_m2 = gdf.geometry.to_crs("EPSG:5070").area
+    return np.sqrt(area_m2.to_numpy(dtype=np.float64) / np.pi) / 1000.0
+
+def reach_bounds(bounds, reach_km):
+    """(west, south, east, north) widened by reach_km on every side."""
+    west, south, east, north = bounds
+    lat_margin = reach_km / KM_PER_DEG
+    # Longitude degrees are shortest on the poleward edge, so widen by that edge's scale
+    coslat = max(np.cos(np.radians(max(abs(south), abs(north)) + lat_margin)), 1e-6)
+    lon_margin = reach_km / (KM_PER_DEG * coslat)
+    return west - lon_margin, south - lat_margin, east + lon_margin, north + lat_margin
+
+class CentroidGrid:
+    """
+    Tracts bucketed into square cells for radius queries of up to `reach_km`
+    (the largest report radius).
+
+    Each tract is stored as a disc (its centroid and `radii_km`) in every
+    cell within `reach_km` of that disc, so a query reads only the point's
+    own cell and never sees a tract twice. Cells are sized from the reach
+    alone (`cell_km`, half the reach by default): a large rural tract covers
+    more cells, while a report in a dense metro area only meets the tracts
+    close to it. Cells are laid out on longitude scaled by the cosine of the
+    extent's most poleward latitude, which never overstates east-west
+    distance.
+    """
+
+    def __init__(self, lons, lats, reach_km, radii_km=None, cell_km=None):
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.reach_km = float(reach_km)
+        self.cell_km = float(cell_km) if cell_km else self.reach_km / 2
+        self.radii_km = (np.zeros(len(self.lons)) if radii_km is None
+                         else np.asarray(radii_km, dtype=np.float64))
+        # Distance from a centroid at which a query can still reach the tract
+        spread = self.radii_km + self.reach_km
+        max_spread = float(spread.max()) if len(spread) else self.reach_km
+        # A report that reaches a tract is at most max_spread further poleward
+        poleward = min(90.0, np.max(np.abs(self.lats), initial=0.0) + max_spread / KM_PER_DEG)
+        self.x_scale = KM_PER_DEG * np.cos(np.radians(poleward))
+        self.origin = (float(np.min(self.lons, initial=0.0)) - max_spread / self.x_scale,
+                       float(np.min(self.lats, initial=0.0)) - max_spread / KM_PER_DEG)
+
+        x, y = self._scaled(self.lons, self.lats)
+        x_lo, x_hi = self._cell(x - spread), self._cell(x + spread)
+        y_lo, y_hi = self._cell(y - spread), self._cell(y + spread)
+        self.n_rows = int(y_hi.max(initial=0)) + 1
+
+        # One entry per (tract, covered cell)
+        nx, ny = x_hi - x_lo + 1, y_hi - y_lo + 1
+        tract = np.repeat(np.arange(len(self.lons)), nx * ny)
+        within = np.arange(len(tract)) - np.repeat(np.cumsum(nx * ny) - nx * ny, nx * ny)
+        cx = x_lo[tract] + within // ny[tract]
+        cy = y_lo[tract] + within % ny[tract]
+        keys = self._keys(cx, cy)
+        order = np.argsort(keys, kind="stable")
+        self.entries = tract[order]
+        self.sorted_keys = keys[order]
+
+    def _scaled(self, lons, lats):
+        return (lons - self.origin[0]) * self.x_scale, (lats - self.origin[1]) * KM_PER_DEG
+
+    def _cell(self, km):
+        return np.floor(km / self.cell_km).astype(np.int64)
+
+    def _keys(self, cx, cy):
+        # Unique for 0 <= cy < n_rows; callers mask rows outside that range
+        return cx * self.n_rows + cy
+
+    def _ranges(self, lons, lats):
+        """(start, count) into the sorted entries of each point's cell."""
+        x, y = self._scaled(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))
+        cx, cy = self._cell(x), self._cell(y)
+        keys = self._keys(cx, cy)
+        start = np.searchsorted(self.sorted_keys, keys, side="left")
+        end = np.searchsorted(self.sorted_keys, keys, side="right")
+        return start, np.where((cy >= 0) & (cy < self.n_rows), end - start, 0)
+
+    def candidate_counts(self, lons, lats):
+        """Number of candidate tracts for each point."""
+        return self._ranges(lons, lats)[1]
+
+    def candidate_pairs(self, lons, lats):
+        """
+        (point index, tract position) for every tract whose disc may lie
+        within reach_km of each point. Callers still filter by exact distance.
+        """
+        start, counts = self._ranges(lons, lats)
+        total = int(counts.sum())
+        point_idx = np.repeat(np.arange(len(counts)), counts)
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return point_idx, self.entries[start[point_idx] + within]
+
+def kernel_exposure(grid, lons, lats, weights, radii_km, tract_radii_km=None, max_pairs=4_000_000):
+    """
+    Sums, per tract, weight * (1 - (d / r)^2) over every report whose footprint
+    radius r reaches it (an Epanechnikov kernel peaking at the report). d is
+    the distance to the tract's equivalent disc (centroid distance less
+    tract_radii_km, floored at 0), so a report inside a tract counts in full.
+    Reports are processed in batches of at most ~max_pairs candidate pairs, so
+    memory stays bounded however densely tracts cluster.
+    radii_km must not exceed the grid's reach; tract_radii_km defaults to
+    the radii the grid was built with.
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    radii_km = np.asarray(radii_km, dtype=np.float64)
+    exposure = np.zeros(len(grid.lons), dtype=np.float64)
+    if tract_radii_km is None:
+        tract_radii_km = grid.radii_km
+
+    cumulative = np.cumsum(grid.candidate_counts(lons, lats))
+    if len(cumulative) == 0 or cumulative[-1] == 0:
+        return exposure
+    cuts = np.searchsorted(cumulative, np.arange(max_pairs, cumulative[-1], max_pairs), side="right")
+    bounds = np.unique(np.concatenate([[0], np.maximum(cuts, 1), [len(lons)]]))
+
+    for begin, end in zip(bounds[:-1], bounds[1:]):
+        chunk = slice(begin, end)
+        p_lon, p_lat = lons[chunk], lats[chunk]
+        pt, tract = grid.candidate_pairs(p_lon, p_lat)
+        if len(pt) == 0:
+            continue
+        t_lat = grid.lats[tract]
+        dx = (p_lon[pt] - grid.lons[tract]) * KM_PER_DEG * np.cos(np.radians((p_lat[pt] + t_lat) / 2))
+        dy = (p_lat[pt] - t_lat) * KM_PER_DEG
+        dist = np.maximum(np.sqrt(dx * dx + dy * dy) - tract_radii_km[tract], 0.0)
+        u2 = (dist / radii_km[chunk][pt]) ** 2
+        hit = u2 < 1.0
+        exposure += np.bincount(tract[hit], weights=weights[chunk][pt[hit]] * (1.0 - u2[hit]),
+                                minlength=len(exposure))
+    return exposure
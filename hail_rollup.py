@@ -0,0 +1,170 @@
+import glob
+import json
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Adjusting import paths for modular structure
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import HAIL_ROLLUP_DIR, ROLLUP_WINDOWS, ROLLUP_HALF_LIFE_DAYS
+from utils import setup_logging, ensure_dir_exists
+
+logger = setup_logging()
+
+DECAYED_COLUMN = "hail_reports_decayed"
+
+def window_column(days: int) -> str:
+    return f"hail_reports_{days}d"
+
+class HailRollup:
+    """
+    Per-tract rolling hail counts, maintained incrementally.
+
+    Each day's per-tract counts are persisted under daily/. Applying a new
+    day adds its counts to every window and subtracts the day that just fell
+    out of each window, and the exponentially decayed total is scaled and
+    incremented, so the nightly cost does not grow with history. Days must be
+    applied in order; re-applying the latest day replaces its counts.
+
+    A read_only rollup applies updates in memory only (new daily counts are
+    kept in memory rather than written), so a shard can see the aggregates
+    its tracts will have without touching the shared files.
+    """
+
+    def __init__(self, root=HAIL_ROLLUP_DIR, windows=ROLLUP_WINDOWS, half_life_days=ROLLUP_HALF_LIFE_DAYS, read_only=False):
+        self.root = root
+        self.read_only = read_only
+        self._unsaved_daily = {}
+        self.windows = tuple(sorted(windows))
+        self.half_life_days = float(half_life_days)
+        self.daily_dir = os.path.join(root, "daily")
+        self.state_path = os.path.join(root, "state.parquet")
+        self.columns = [window_column(w) for w in self.windows] + [DECAYED_COLUMN]
+        self.last_date = None
+        self.totals = self._empty_totals()
+        self._load_state()
+
+    def _empty_totals(self):
+        totals = pd.DataFrame({col: pd.Series(dtype="int64") for col in self.columns[:-1]})
+        totals[DECAYED_COLUMN] = pd.Series(dtype="float64")
+        totals.index = pd.Index([], dtype=object, name="GEOID")
+        return totals
+
+    def _config(self):
+        return {"windows": list(self.windows), "half_life_days": self.half_life_days}
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        table = pq.read_table(self.state_path)
+        meta = json.loads(table.schema.metadata[b"hail_rollup"])
+        if meta["config"] != self._config():
+            logger.warning("Rollup windows/half-life changed; rebuilding from daily counts...")
+            self.rebuild()
+            return
+        self.last_date = date.fromisoformat(meta["last_date"])
+        self.totals = table.to_pandas().set_index("GEOID")
+
+    def _save_state(self):
+        if self.read_only:
+            return
+        ensure_dir_exists(self.root, logger)
+        table = pa.Table.from_pandas(self.totals.reset_index(), preserve_index=False)
+        meta = {"last_date": self.last_date.isoformat(), "config": self._config()}
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"hail_rollup": json.dumps(meta).encode()})
+        tmp_path = f"{self.state_path}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, self.state_path)
+
+    def _daily_path(self, day):
+        return os.path.join(self.daily_dir, f"{day.isoformat()}.parquet")
+
+    def daily_counts(self, day) -> pd.Series:
+        """Per-tract counts recorded for one day (empty if none)."""
+        if day in self._unsaved_daily:
+            return self._unsaved_daily[day]
+        path = self._daily_path(day)
+        if not os.path.exists(path):
+            return pd.Series(dtype="int64", index=pd.Index([], dtype=object, name="GEOID"))
+        df = pd.read_parquet(path)
+        return df.set_index("GEOID")["count"]
+
+    def _write_daily(self, day, counts):
+        if self.read_only:
+            self._unsaved_daily[day] = counts[counts != 0].rename("count")
+            return
+        ensure_dir_exists(self.daily_dir, logger)
+        tmp_path = f"{self._daily_path(day)}.tmp"
+        counts[counts != 0].rename("count").rename_axis("GEOID").reset_index().to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self._daily_path(day))
+
+    def _add(self, column, delta):
+        """Adds a sparse per-tract delta into one column, growing the tract set as needed."""
+        if delta.empty:
+            return
+        new_geoids = delta.index.difference(self.totals.index)
+        if len(new_geoids):
+            self.totals = self.totals.reindex(self.totals.index.append(new_geoids), fill_value=0)
+        self.totals.loc[delta.index, column] += delta.to_numpy()
+
+    def _step(self, day, counts):
+        """Advances the rollup by one day."""
+        self.totals[DECAYED_COLUMN] *= 0.5 ** (1.0 / self.half_life_days)
+        self._add(DECAYED_COLUMN, counts.astype("float64"))
+        for w in self.windows:
+            expired = self.daily_counts(day - timedelta(days=w))
+            delta = counts.sub(expired, fill_value=0)
+            self._add(window_column(w), delta[delta != 0].astype("int64"))
+        self.last_date = day
+
+    def update(self, day, counts: pd.Series):
+        """
+        Applies one day's per-tract counts (GEOID-indexed Series) and persists
+        the result. Skipped days between the last applied day and `day` are
+        rolled forward with zero counts.
+        """
+        counts = counts.groupby(level=0).sum().astype("int64")
+        counts.index.name = "GEOID"
+
+        if self.last_date is not None and day < self.last_date:
+            raise ValueError(f"Rollup is already at {self.last_date}; cannot apply {day}")
+
+        if self.last_date is not None and day == self.last_date:
+            # Same-day re-run (the live SPC file keeps growing): swap in the new counts
+            delta = counts.sub(self.daily_counts(day), fill_value=0).astype("int64")
+            self._write_daily(day, counts)
+            for column in self.columns:
+                self._add(column, delta[delta != 0].astype(self.totals[column].dtype))
+        else:
+            self._write_daily(day, counts)
+            start = day if self.last_date is None else self.last_date + timedelta(days=1)
+            empty = counts.iloc[:0]
+            while start <= day:
+                self._step(start, counts if start == day else empty)
+                start += timedelta(days=1)
+
+        self._save_state()
+        logger.info(f"Hail rollup updated through {self.last_date} ({int(counts.sum())} reports on {day})")
+
+    def rebuild(self):
+        """Recomputes all aggregates from the persisted daily counts."""
+        days = sorted(date.fromisoformat(os.path.basename(p)[:-len(".parquet")])
+                      for p in glob.glob(os.path.join(self.daily_dir, "*.parquet")))
+        self.totals = self._empty_totals()
+        self.last_date = None
+        if not days:
+            return
+        day = days[0]
+        while day <= days[-1]:
+            self._step(day, self.daily_counts(day))
+            day += timedelta(days=1)
+        self._save_state()
+
+    def frame(self) -> pd.DataFrame:
+        """Current rolling aggregates with a GEOID column."""
+        return self.totals.reset_index()
@@ -1,59 +1,103 @@
 import pandas as pd
 import geopandas as gpd
 import os
+import pyarrow as pa
+import pyarrow.dataset as ds
+from concurrent.futures import ThreadPoolExecutor
 
 # Adjusting import paths for modular structure
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import STATES, INCOME_CSV_PATH
+from config import STATES, INCOME_CSV_PATH, HAIL_ARCHIVE_DIR, INCOME_CSV_DTYPES, TRACT_COLUMNS, TRACT_LOAD_WORKERS, TRACT_READ_FILTERS, VEHICLE_CSV_DTYPES
 from utils import load_csv, load_geojson, setup_logging
+from tracing import traced
 
 logger = setup_logging()
 
-def load_all_tracts() -> gpd.GeoDataFrame:
+def load_state_tracts(state_abbr, shapefile) -> gpd.GeoDataFrame:
+    """
+    Reads one state's tract shapefile through pyogrio's Arrow path, keeping
+    only TRACT_COLUMNS and applying the state's TRACT_READ_FILTERS in the read.
+    """
+    logger.info(f"Loading tract data for {state_abbr}...")
+    gdf = gpd.read_file(shapefile, engine="pyogrio", use_arrow=True,
+                        columns=TRACT_COLUMNS, where=TRACT_READ_FILTERS.get(state_abbr))
+    gdf['state_abbr'] = state_abbr  # Add state abbreviation for reference
+    return gdf
+
+@traced()
+def load_all_tracts(max_workers: int = TRACT_LOAD_WORKERS) -> gpd.GeoDataFrame:
     """
     Loads and concatenates census tract shapefiles for all states defined in the config.
+    States are read concurrently; the result keeps the STATES order.
     """
-    gdfs = []
-    for state_abbr, state_info in STATES.items():
-        logger.info(f"Loading tract data for {state_abbr}...")
-        gdf = gpd.read_file(state_info["shapefile"])
-        gdf['state_abbr'] = state_abbr  # Add state abbreviation for reference
-        gdfs.append(gdf)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(STATES)))) as pool:
+        gdfs = list(pool.map(lambda item: load_state_tracts(item[0], item[1]["shapefile"]), STATES.items()))
 
     logger.info("Concatenating all tract data...")
     all_tracts_gdf = gpd.GeoDataFrame(pd.concat(gdfs, ignore_index=True))
     return all_tracts_gdf
 
+def load_vehicle_ownership(state_abbr, vehicle_csv) -> pd.DataFrame:
+    """
+    Loads one state's vehicle ownership CSV (VEHICLE_CSV_DTYPES columns only).
+    """
+    logger.info(f"Loading vehicle ownership data for {state_abbr}...")
+    return load_csv(vehicle_csv, dtype=VEHICLE_CSV_DTYPES, logger=logger,
+                    usecols=list(VEHICLE_CSV_DTYPES), engine="pyarrow")
+
+@traced()
 def load_all_vehicle_ownership() -> pd.DataFrame:
     """
     Loads and concatenates vehicle ownership CSVs for all states.
     """
-    dfs = []
-    for state_abbr, state_info in STATES.items():
-        logger.info(f"Loading vehicle ownership data for {state_abbr}...")
-        df = load_csv(state_info["vehicle_csv"], dtype={'tract_geoid': str}, logger=logger)
-        df['state_abbr'] = state_abbr
-        dfs.append(df)
+    dfs = [load_vehicle_ownership(state_abbr, state_info["vehicle_csv"]) for state_abbr, state_info in STATES.items()]
 
     logger.info("Concatenating all vehicle ownership data...")
     all_vehicles_df = pd.concat(dfs, ignore_index=True)
     return all_vehicles_df
 
+@traced()
 def load_income_data() -> pd.DataFrame:
     """
-    Loads the per capita and median income data from the CSV file.
+    Loads the per capita and median income data from the CSV file (INCOME_CSV_DTYPES columns only).
     """
     logger.info(f"Loading income data from {INCOME_CSV_PATH}...")
-    return load_csv(INCOME_CSV_PATH, dtype={'tract_geoid': str}, logger=logger)
+    return load_csv(INCOME_CSV_PATH, dtype=INCOME_CSV_DTYPES, logger=logger,
+                    usecols=list(INCOME_CSV_DTYPES), engine="pyarrow")
 
-def load_hail_data(hail_csv_path: str) -> gpd.GeoDataFrame:
+@traced()
+def load_hail_archive(start_date, end_date, states=None) -> pd.DataFrame:
     """
-    Loads the hail report CSV and converts it to a GeoDataFrame.
+    Reads archived hail reports for an inclusive date range from the
+    date/state-partitioned Parquet store. The date and state filters are
+    pushed down, so only matching partitions are opened.
+    """
+    partitioning = ds.partitioning(pa.schema([("date", pa.string()), ("state", pa.string())]), flavor="hive")
+    dataset = ds.dataset(HAIL_ARCHIVE_DIR, format="parquet", partitioning=partitioning)
+
+    predicate = (ds.field("date") >= str(start_date)) & (ds.field("date") <= str(end_date))
+    if states is not None:
+        predicate = predicate & ds.field("state").isin(list(states))
+
+    df = dataset.to_table(filter=predicate).to_pandas()
+    return df.rename(columns={"state": "State", "date": "Date"})
+
+@traced()
+def load_hail_data(hail_csv_path: str = None, start_date=None, end_date=None, states=None) -> gpd.GeoDataFrame:
+    """
+    Loads hail reports and converts them to a GeoDataFrame.
+
+    Reads a single report CSV when hail_csv_path is given; otherwise reads the
+    [start_date, end_date] range (ISO dates) from the hail archive.
     """
-    logger.info(f"Loading hail data from {hail_csv_path}...")
-    df = load_csv(hail_csv_path, logger=logger)
+    if hail_csv_path is not None:
+        logger.info(f"Loading hail data from {hail_csv_path}...")
+        df = load_csv(hail_csv_path, logger=logger)
+    else:
+        logger.info(f"Loading archived hail data from {start_date} to {end_date}...")
+        df = load_hail_archive(start_date, end_date, states=states)
     df = df.dropna(subset=["Lat", "Lon"])
 
     hail_gdf = gpd.GeoDataFrame(
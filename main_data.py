@@ -1,43 +1,281 @@
+import argparse
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+import pyogrio
 
 # Adjusting import paths to find project-level modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from download_hail_report import download_hail_report
-from load_data import (
-    load_all_tracts,
-    load_all_vehicle_ownership,
-    load_income_data,
-    load_hail_data,
-)
-from process_data import process_all_data
-from config import PROCESSED_DATA_DIR, STATES
-from utils import setup_logging, save_geojson, ensure_dir_exists
+from load_data import load_hail_data
+from hail_rollup import HailRollup
+from radar_composite import tract_composite
+from radar_index import RadarIndex, timestamp_to_epoch
+from hail_kernel import reach_bounds
+from process_data import add_radar_composite, add_rolling_hail_risk, assign_hail_to_tracts, calculate_hail_risk, calculate_kernel_hail_risk
+from stage_cache import load_state_static_tracts, load_static_tracts, load_tract_index, static_stage_key, tract_index_path
+from config import HAIL_KERNEL_MAX_RADIUS_KM, LAYER_OPTIONS, LOD_TOLERANCES_DEG, PROCESSED_DATA_DIR, PROCESSED_FILENAME_TEMPLATE, PROCESSED_FORMAT_EXT, PROCESSED_LOD_FILENAME, RADAR_EVENT_WINDOW_HOURS, RADAR_INDEX_DB_PATH, STATES, TILES_DIR, TILE_MIN_ZOOM, TILE_MAX_ZOOM
+from tract_lod import build_lod_frame
+from tracing import finish_profile, span, start_profile, summarize
+from utils import setup_logging, save_geodata, ensure_dir_exists, concat_geoparquet
+from vector_tiles import write_tile_pyramid
 
 # Setup logger
 logger = setup_logging()
 
-def main():
+def daily_tract_counts(hail_gdf, geoids, default_day):
+    """
+    Report counts per (Date, GEOID) from each report's tract (NaN/None when
+    outside every tract). Reports without a Date count on default_day.
+    """
+    if "Date" in hail_gdf.columns:
+        days = hail_gdf["Date"].astype(str).to_numpy()
+    else:
+        days = pd.Series(default_day.isoformat(), index=hail_gdf.index).to_numpy()
+    assigned = pd.DataFrame({"Date": days, "GEOID": geoids}).dropna()
+    return assigned.groupby(["Date", "GEOID"]).size()
+
+def apply_daily_counts(rollup, counts_by_day, start_day, end_day):
+    """
+    Applies each day's per-tract hail counts in [start_day, end_day] to the rollup.
+    Days the rollup has moved past are skipped.
+    """
+    day = start_day
+    while day <= end_day:
+        if rollup.last_date is not None and day < rollup.last_date:
+            logger.info(f"Hail rollup already covers {day}; skipping")
+        else:
+            key = day.isoformat()
+            if key in counts_by_day.index.get_level_values(0):
+                counts = counts_by_day.xs(key, level="Date")
+            else:
+                counts = pd.Series(dtype="int64", index=pd.Index([], dtype=object, name="GEOID"))
+            rollup.update(day, counts)
+        day += timedelta(days=1)
+
+def load_radar_composite(start_day, end_day):
+    """
+    Per-tract radar statistics for this run's hail days: only the scans from
+    RADAR_EVENT_WINDOW_HOURS before start_day to the same margin after
+    end_day, the window generate_radar.py fetches around each report.
+    None when generate_radar.py has not indexed any scan in that window.
+    """
+    if not os.path.exists(RADAR_INDEX_DB_PATH):
+        return None
+    margin = timedelta(hours=RADAR_EVENT_WINDOW_HOURS)
+    start = datetime.combine(start_day, time()) - margin
+    end = datetime.combine(end_day + timedelta(days=1), time()) + margin
+    window = (timestamp_to_epoch(start.isoformat()), timestamp_to_epoch(end.isoformat()))
+    index = RadarIndex(RADAR_INDEX_DB_PATH)
+    scans = index.scan_epochs(*window)
+    if not scans:
+        return None
+    return tract_composite(index.tract_echo(*window), scans)
+
+def save_state_outputs(state_abbr, state_gdf, output_exts, write_tiles):
+    """Writes one state's processed file(s) and, unless write_tiles is False, its vector tiles."""
+    for ext in output_exts:
+        output_path = os.path.join(PROCESSED_DATA_DIR, PROCESSED_FILENAME_TEMPLATE.format(state=state_abbr, ext=ext))
+        try:
+            with span("main_data.save_state", state=state_abbr, format=ext, rows=len(state_gdf)):
+                save_geodata(state_gdf, output_path, logger=logger)
+            logger.info(f"Successfully saved processed data for {state_abbr} to {output_path}")
+        except Exception as e:
+            logger.error(f"Could not save data for {state_abbr}. Reason: {e}")
+
+    if write_tiles:
+        tiles_dir = os.path.join(TILES_DIR, state_abbr)
+        try:
+            with span("main_data.write_tiles", state=state_abbr, rows=len(state_gdf)) as s:
+                tile_count = write_tile_pyramid(state_gdf, tiles_dir, list(LAYER_OPTIONS.values()),
+                                                min_zoom=TILE_MIN_ZOOM, max_zoom=TILE_MAX_ZOOM)
+                s.set(tiles=tile_count)
+            logger.info(f"Wrote {tile_count} vector tiles for {state_abbr} to {tiles_dir}")
+        except Exception as e:
+            logger.error(f"Could not write vector tiles for {state_abbr}. Reason: {e}")
+
+def lod_properties():
+    return ["GEOID", "state_abbr"] + list(LAYER_OPTIONS.values())
+
+def state_hail_bounds(shapefile):
+    """
+    Lon/lat box around a state's tracts holding every hail report that can
+    affect them: the shapefile's extent, widened by the largest kernel radius
+    plus the radius of its largest tract. Read from the shapefile's header
+    and area columns only.
+    """
+    bounds = pyogrio.read_info(shapefile)["total_bounds"]
+    areas = pyogrio.read_dataframe(shapefile, columns=["ALAND", "AWATER"], read_geometry=False)
+    max_tract_radius_km = np.sqrt((areas["ALAND"] + areas["AWATER"]).max() / np.pi) / 1000.0
+    return reach_bounds(bounds, HAIL_KERNEL_MAX_RADIUS_KM + max_tract_radius_km)
+
+def process_state_shard(job):
+    """
+    Runs the whole pipeline for one state in a worker process: its static
+    stage (cached per state), hail join, kernel exposure, a read-only preview
+    of the hail rollup, radar statistics, then writes the state's outputs
+    straight away.
+
+    Returns:
+        tuple: (state, per-(Date, GEOID) report counts for the shared rollup,
+        path of the state's level-of-detail part or None, tract count)
+    """
+    state_abbr, hail_gdf, radar_composite, start_day, end_day, refresh_cache, output_exts, write_tiles, lod_dir = job
+    with span("main_data.state_shard", state=state_abbr) as s:
+        static_gdf = load_state_static_tracts(state_abbr, refresh=refresh_cache)
+        geoids = assign_hail_to_tracts(static_gdf, hail_gdf)
+        final_gdf = calculate_hail_risk(static_gdf, hail_gdf, geoids=geoids)
+        final_gdf = calculate_kernel_hail_risk(final_gdf, hail_gdf)
+
+        # The shared rollup is only updated by the parent once every shard has
+        # reported; a read-only copy gives this state's post-update aggregates now
+        counts_by_day = daily_tract_counts(hail_gdf, geoids, start_day)
+        rollup = HailRollup(read_only=True)
+        apply_daily_counts(rollup, counts_by_day, start_day, end_day)
+        final_gdf = add_rolling_hail_risk(final_gdf, rollup.frame())
+
+        if radar_composite is not None:
+            final_gdf = add_radar_composite(final_gdf, radar_composite)
+        s.set(rows=len(final_gdf))
+
+        if final_gdf.empty:
+            logger.warning(f"No data to save for state: {state_abbr}")
+            return state_abbr, counts_by_day, None, 0
+        save_state_outputs(state_abbr, final_gdf, output_exts, write_tiles)
+
+        lod_part = os.path.join(lod_dir, f"{state_abbr}.parquet")
+        lod_gdf = build_lod_frame(final_gdf, LOD_TOLERANCES_DEG, lod_properties())
+        # Plain strings, so every part has the same column type
+        lod_gdf["state_abbr"] = lod_gdf["state_abbr"].astype(str)
+        save_geodata(lod_gdf, lod_part)
+    return state_abbr, counts_by_day, lod_part, len(final_gdf)
+
+def run_sharded(hail_gdf, start_day, end_day, refresh_cache, output_exts, write_tiles, workers):
+    """
+    Processes each state as an independent shard in a process pool, so peak
+    memory follows the largest state rather than all of them. Each shard only
+    receives the hail reports within reach of its tracts (reports near a
+    border go to both neighbours) and writes its files as soon as it is done.
+    The shared hail rollup and the all-states level-of-detail file are
+    updated from the shards' results at the end.
+    """
+    lod_dir = os.path.join(PROCESSED_DATA_DIR, "lod_parts")
+    ensure_dir_exists(lod_dir, logger)
+    try:
+        return _run_shards(hail_gdf, start_day, end_day, refresh_cache, output_exts, write_tiles, workers, lod_dir)
+    finally:
+        # Every file, not just this run's parts: a crashed run may have left some behind
+        for name in os.listdir(lod_dir):
+            os.remove(os.path.join(lod_dir, name))
+        os.rmdir(lod_dir)
+
+def _run_shards(hail_gdf, start_day, end_day, refresh_cache, output_exts, write_tiles, workers, lod_dir):
+    """run_sharded without the cleanup of the level-of-detail parts."""
+    lons, lats = hail_gdf.geometry.x.to_numpy(), hail_gdf.geometry.y.to_numpy()
+    radar_composite = load_radar_composite(start_day, end_day)
+
+    jobs = []
+    for state_abbr, state_info in STATES.items():
+        west, south, east, north = state_hail_bounds(state_info["shapefile"])
+        nearby = hail_gdf[(lons >= west) & (lons <= east) & (lats >= south) & (lats <= north)]
+        jobs.append((state_abbr, nearby, radar_composite, start_day, end_day, refresh_cache, output_exts,
+                     write_tiles, lod_dir))
+
+    results, lod_parts = [], {}
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        futures = {pool.submit(process_state_shard, job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                state_abbr, counts_by_day, lod_part, rows = future.result()
+            except Exception as e:
+                logger.error(f"Shard {futures[future]} failed. Reason: {e}")
+                continue
+            logger.info(f"Shard {state_abbr} finished ({rows} tracts)")
+            results.append(counts_by_day)
+            if lod_part is not None:
+                lod_parts[state_abbr] = lod_part
+
+    if len(results) < len(jobs):
+        # Applying a partial day would leave the failed states' tracts behind in the rollup
+        logger.error("Not every shard finished; the hail rollup and all-states file were left unchanged.")
+        return False
+
+    rollup = HailRollup()
+    with span("main_data.update_hail_rollup", rows_in=len(hail_gdf)):
+        counts_by_day = pd.concat(results) if results else pd.Series(dtype="int64")
+        apply_daily_counts(rollup, counts_by_day, start_day, end_day)
+
+    lod_path = os.path.join(PROCESSED_DATA_DIR, PROCESSED_LOD_FILENAME)
+    try:
+        with span("main_data.save_lod"):
+            concat_geoparquet([lod_parts[s] for s in STATES if s in lod_parts], lod_path, logger=logger)
+        logger.info(f"Saved {len(LOD_TOLERANCES_DEG)}-level geometry for all states to {lod_path}")
+    except Exception as e:
+        logger.error(f"Could not save the all-states level-of-detail file. Reason: {e}")
+
+    # generate_radar.py assigns gates with the all-states index, so keep it in step
+    # with the tracts; the shards' cached static frames together are the all-states stage
+    stage_key = static_stage_key()
+    if refresh_cache or not os.path.exists(tract_index_path(stage_key)):
+        try:
+            static_gdf = pd.concat([load_state_static_tracts(s) for s in STATES], ignore_index=True)
+            load_tract_index(static_gdf, refresh=True, key=stage_key)
+        except Exception as e:
+            logger.error(f"Could not save the tract index. Reason: {e}")
+    return True
+
+def main(refresh_cache=False, export_geojson=False, hail_start=None, hail_end=None, write_tiles=True, workers=None):
     """
     Main function to run the entire data processing pipeline.
+
+    The hail-independent tract stage (merge, densities, filters) is cached and
+    only rebuilt when its inputs change, so a daily run only redoes the hail join.
+    Outputs are written as GeoParquet; export_geojson additionally writes GeoJSON copies.
+    With hail_start/hail_end the reports come from the hail archive instead of today's download.
+    Unless write_tiles is False, each state also gets a vector tile pyramid for the dashboard.
+    All states are also saved together with simplified geometries for the dashboard's combined view.
+    With `workers`, each state is processed as a separate shard in a pool of that many processes.
     """
     logger.info("--- Starting Hail Risk Data Pipeline ---")
 
     # --- 1. Download Data ---
-    try:
-        hail_csv_path = download_hail_report()
-    except Exception as e:
-        logger.error(f"Pipeline stopped: Could not download hail report. Reason: {e}")
-        return
+    hail_csv_path = None
+    if hail_start is None:
+        try:
+            hail_csv_path = download_hail_report()
+        except Exception as e:
+            logger.error(f"Pipeline stopped: Could not download hail report. Reason: {e}")
+            return
+
+    if hail_csv_path is not None:
+        start_day = end_day = date.fromisoformat(os.path.splitext(os.path.basename(hail_csv_path))[0])
+    else:
+        start_day = date.fromisoformat(hail_start)
+        end_day = date.fromisoformat(hail_end or hail_start)
+    output_exts = [PROCESSED_FORMAT_EXT] + ([".geojson"] if export_geojson else [])
 
     # --- 2. Load Data ---
     logger.info("--- Loading all data sources ---")
     try:
-        tracts_gdf = load_all_tracts()
-        vehicles_df = load_all_vehicle_ownership()
-        income_df = load_income_data()
-        hail_gdf = load_hail_data(hail_csv_path)
+        if hail_csv_path is not None:
+            hail_gdf = load_hail_data(hail_csv_path)
+        else:
+            hail_gdf = load_hail_data(start_date=hail_start, end_date=hail_end or hail_start)
+        if workers:
+            logger.info(f"--- Processing {len(STATES)} states as shards ({workers} workers) ---")
+            ensure_dir_exists(PROCESSED_DATA_DIR, logger)
+            if run_sharded(hail_gdf, start_day, end_day, refresh_cache, output_exts, write_tiles, workers):
+                logger.info("--- Hail Risk Data Pipeline Finished Successfully ---")
+            return
+        # Hashing every input is not free, so the key is computed once per run
+        stage_key = static_stage_key()
+        static_gdf = load_static_tracts(refresh=refresh_cache, key=stage_key)
+        tract_index = load_tract_index(static_gdf, refresh=refresh_cache, key=stage_key)
     except Exception as e:
         logger.error(f"Pipeline stopped: Failed to load data. Reason: {e}")
         return
@@ -45,7 +283,21 @@ def main():
     # --- 3. Process Data ---
     logger.info("--- Processing and analyzing data ---")
     try:
-        final_gdf = process_all_data(tracts_gdf, vehicles_df, income_df, hail_gdf)
+        # Each report is assigned to its tract once, for both the counts and the rollup
+        geoids = assign_hail_to_tracts(static_gdf, hail_gdf, tract_index)
+        final_gdf = calculate_hail_risk(static_gdf, hail_gdf, geoids=geoids)
+        final_gdf = calculate_kernel_hail_risk(final_gdf, hail_gdf)
+
+        # Roll the day's (or range's) counts into the persisted 7/30/365-day aggregates
+        rollup = HailRollup()
+        with span("main_data.update_hail_rollup", rows_in=len(hail_gdf)):
+            apply_daily_counts(rollup, daily_tract_counts(hail_gdf, geoids, start_day), start_day, end_day)
+        final_gdf = add_rolling_hail_risk(final_gdf, rollup.frame())
+
+        # Radar statistics are optional: they exist once generate_radar.py has covered these days
+        radar_composite = load_radar_composite(start_day, end_day)
+        if radar_composite is not None:
+            final_gdf = add_radar_composite(final_gdf, radar_composite)
     except Exception as e:
         logger.error(f"Pipeline stopped: Failed during data processing. Reason: {e}")
         return
@@ -56,18 +308,51 @@ def main():
 
     for state_abbr in STATES.keys():
         state_gdf = final_gdf[final_gdf['state_abbr'] == state_abbr]
-        output_path = os.path.join(PROCESSED_DATA_DIR, f"gdf_{state_abbr}_with_hail_risk.geojson")
 
         if not state_gdf.empty:
-            try:
-                save_geojson(state_gdf, output_path, logger)
-                logger.info(f"Successfully saved processed data for {state_abbr} to {output_path}")
-            except Exception as e:
-                logger.error(f"Could not save data for {state_abbr}. Reason: {e}")
+            save_state_outputs(state_abbr, state_gdf, output_exts, write_tiles)
         else:
             logger.warning(f"No data to save for state: {state_abbr}")
 
+    # One file with every state at several levels of detail for the dashboard's combined view
+    lod_path = os.path.join(PROCESSED_DATA_DIR, PROCESSED_LOD_FILENAME)
+    try:
+        with span("main_data.save_lod", rows=len(final_gdf)):
+            lod_gdf = build_lod_frame(final_gdf, LOD_TOLERANCES_DEG, lod_properties())
+            save_geodata(lod_gdf, lod_path, logger=logger)
+        logger.info(f"Saved {len(LOD_TOLERANCES_DEG)}-level geometry for all states to {lod_path}")
+    except Exception as e:
+        logger.error(f"Could not save the all-states level-of-detail file. Reason: {e}")
+
     logger.info("--- Hail Risk Data Pipeline Finished Successfully ---")
 
 if __name__ == "__main__":
-    main()
+    arg_parser = argparse.ArgumentParser(description="Run the hail risk data pipeline.")
+    arg_parser.add_argument("--refresh-cache", action="store_true",
+                            help="Rebuild the cached tract stage even if its inputs are unchanged.")
+    arg_parser.add_argument("--export-geojson", action="store_true",
+                            help="Also write GeoJSON copies of the processed per-state files.")
+    arg_parser.add_argument("--hail-start", help="First day (YYYY-MM-DD) of archived hail reports to score.")
+    arg_parser.add_argument("--hail-end", help="Last day (YYYY-MM-DD) of archived hail reports; defaults to --hail-start.")
+    arg_parser.add_argument("--skip-tiles", action="store_true",
+                            help="Do not rebuild the per-state vector tile pyramids.")
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="Record per-stage time, CPU, peak memory and row counts under TRACE_DIR (JSON events + Chrome trace).")
+    arg_parser.add_argument("--sharded", action="store_true",
+                            help="Process each state as a separate shard in a process pool (peak memory of one state).")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Number of shard processes with --sharded.")
+    args = arg_parser.parse_args()
+
+    events_path = start_profile("main_data") if args.profile else None
+    try:
+        with span("main_data.main"):
+            main(refresh_cache=args.refresh_cache, export_geojson=args.export_geojson,
+                 hail_start=args.hail_start, hail_end=args.hail_end, write_tiles=not args.skip_tiles,
+                 workers=args.workers if args.sharded else None)
+    finally:
+        if events_path is not None:
+            trace_path, events = finish_profile(events_path)
+            for line in summarize(events):
+                logger.info(line)
+            logger.info(f"Profile written to {events_path} and {trace_path}")
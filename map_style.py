@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+# --- Choropleth colour ramps ---
+# Each layer field maps to (cap, colour at 0, colour at cap). Values are scaled
+# by the cap, clipped to [0, 1] and looked up in a RAMP_STEPS-entry RGBA table.
+COLOR_RAMPS = {
+    "car_ownership_density": (150, (0, 255, 0, 150), (255, 0, 0, 150)),
+    "population_density": (1000, (0, 0, 100, 150), (0, 0, 255, 150)),
+    "median_income": (100000, (100, 0, 100, 150), (255, 0, 255, 150)),
+    "per_capita_income": (75000, (100, 0, 100, 150), (255, 0, 255, 150)),
+    "hail_risk_score": (500, (255, 255, 0, 160), (255, 0, 0, 160)),
+    "hail_risk_score_kernel": (500, (255, 255, 0, 160), (255, 0, 0, 160)),
+    "radar_max_dbz": (75, (0, 255, 255, 150), (255, 0, 255, 150)),
+    "radar_hail_risk_score": (5000, (255, 255, 0, 160), (255, 0, 0, 160)),
+}
+NO_DATA_COLOR = (200, 200, 200, 100)
+RAMP_STEPS = 256
+
+def build_ramp_lut(start, end, steps=RAMP_STEPS):
+    """Linear RGBA lookup table from `start` to `end` (inclusive)."""
+    t = np.linspace(0.0, 1.0, steps)[:, None]
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    return np.floor(start + (end - start) * t + 1e-9).astype(np.uint8)
+
+COLOR_LUTS = {field: build_ramp_lut(start, end) for field, (_, start, end) in COLOR_RAMPS.items()}
+
+def ramp_index(values, field):
+    """
+    Maps values to LUT rows for `field`; missing values (and fields without a
+    ramp) map to -1.
+    """
+    values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64)
+    if field not in COLOR_RAMPS:
+        return np.full(values.shape, -1, dtype=np.int16)
+    cap = COLOR_RAMPS[field][0]
+    idx = np.floor(np.clip(values / cap, 0.0, 1.0) * (RAMP_STEPS - 1))
+    return np.where(np.isnan(idx), -1, idx).astype(np.int16)
+
+def colorize(values, field):
+    """Returns an (N, 4) uint8 RGBA array for a whole column at once."""
+    idx = ramp_index(values, field)
+    lut = COLOR_LUTS.get(field)
+    colors = np.empty((len(idx), 4), dtype=np.uint8)
+    colors[:] = NO_DATA_COLOR
+    if lut is not None:
+        valid = idx >= 0
+        colors[valid] = lut[idx[valid]]
+    return colors
+
+def format_tooltips(values, label):
+    """Formats a whole column as '<label>: 1,234.56' (or 'N/A' when missing)."""
+    values = pd.to_numeric(pd.Series(values), errors="coerce")
+    text = values.map("{:,.2f}".format, na_action="ignore").fillna("N/A")
+    return (f"{label}: " + text).to_numpy()
+
+def ramp_expression(field):
+    """
+    deck.gl accessor expression applying the same ramp on the client, for
+    layers whose features carry raw values (e.g. vector tiles).
+    """
+    if field not in COLOR_RAMPS:
+        return list(NO_DATA_COLOR)
+    cap, start, end = COLOR_RAMPS[field]
+    value = f"properties.{field}"
+    t = f"({value} >= {cap} ? 1 : ({value} <= 0 ? 0 : {value} / {cap}))"
+    channels = ", ".join(f"{s} + {e - s} * {t}" for s, e in zip(start, end))
+    no_data = ", ".join(str(c) for c in NO_DATA_COLOR)
+    return f"{value} == null ? [{no_data}] : [{channels}]"
@@ -6,61 +6,54 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import MISSOURI_LONGITUDE_FILTER
+from config import INCOME_CSV_DTYPES, MISSOURI_LONGITUDE_FILTER, TRACT_COLUMNS, VEHICLE_COUNT_COLUMNS, VEHICLE_CSV_DTYPES, HAIL_KERNEL_BASE_RADIUS_KM, HAIL_KERNEL_RADIUS_PER_INCH_KM, HAIL_KERNEL_MAX_RADIUS_KM, HAIL_KERNEL_DEFAULT_SIZE_INCH
+from hail_kernel import CentroidGrid, kernel_exposure, report_radius_km, tract_centroids, tract_radii_km
 from utils import setup_logging
+from tracing import traced
 
 logger = setup_logging()
 
+def with_schema(df, dtypes):
+    """Only the declared columns of a frame, cast to their declared dtypes (no copy if already there)."""
+    return df[list(dtypes)].astype(dtypes, copy=False)
+
+@traced()
 def merge_data(tracts_gdf, vehicles_df, income_df):
     """
     Merges tract, vehicle, and income data into a single GeoDataFrame.
+
+    Only TRACT_COLUMNS and the declared CSV columns are kept. The merges run
+    on int64 GEOID keys, which also makes them insensitive to GEOIDs whose
+    leading zero was lost in a CSV; the tracts keep their string GEOID.
     """
     logger.info("Merging all data sources...")
 
-    # Standardize GEOID columns for merging
+    keep = [c for c in TRACT_COLUMNS + ["state_abbr"] if c in tracts_gdf.columns] + [tracts_gdf.geometry.name]
+    tracts_gdf = tracts_gdf[keep].copy()
     tracts_gdf["GEOID"] = tracts_gdf["GEOID"].astype(str).str.zfill(11)
-    vehicles_df["tract_geoid"] = vehicles_df["tract_geoid"].astype(str).str.zfill(11)
-    income_df["tract_geoid"] = income_df["tract_geoid"].astype(str).str.zfill(11)
-
-    # Merge tracts with vehicle data
-    merged_gdf = tracts_gdf.merge(
-        vehicles_df.drop(columns=['state_abbr']),  # Drop redundant state_abbr
-        left_on="GEOID",
-        right_on="tract_geoid",
-        how="left"
-    )
+    tracts_gdf["state_abbr"] = tracts_gdf["state_abbr"].astype("category")
+    tracts_gdf["tract_geoid"] = tracts_gdf["GEOID"].astype("int64")
 
-    # Merge with income data
-    merged_gdf = merged_gdf.merge(
-        income_df,
-        left_on="GEOID",
-        right_on="tract_geoid",
-        how="left",
-        suffixes=('', '_income') # Add suffix to avoid column name conflicts
-    )
+    merged_gdf = tracts_gdf.merge(with_schema(vehicles_df, VEHICLE_CSV_DTYPES), on="tract_geoid", how="left")
+    merged_gdf = merged_gdf.merge(with_schema(income_df, INCOME_CSV_DTYPES), on="tract_geoid", how="left")
 
     # Clean up columns
-    merged_gdf.drop(columns=['tract_geoid', 'tract_geoid_income'], inplace=True, errors='ignore')
+    merged_gdf.drop(columns=['tract_geoid'], inplace=True)
 
     return merged_gdf
 
+@traced()
 def calculate_densities_and_ownership(gdf):
     """
-    Calculates vehicle ownership, population density, and car ownership density.
+    Calculates vehicle ownership, population density, and car ownership density (float32).
     """
     logger.info("Calculating densities and vehicle ownership...")
 
-    vehicle_cols = [
-        "households_with_1_vehicle", "households_with_2_vehicles",
-        "households_with_3_vehicles", "households_with_4_vehicles",
-        "households_with_5_vehicles", "households_with_6_vehicles",
-        "households_with_7_vehicles", "households_with_8_or_more_vehicles"
-    ]
-    gdf["households_with_vehicles"] = gdf[vehicle_cols].sum(axis=1)
+    gdf["households_with_vehicles"] = gdf[VEHICLE_COUNT_COLUMNS].sum(axis=1).astype("float32")
 
-    gdf["land_area_km2"] = gdf["ALAND"].astype(float) / 1_000_000
-    gdf["population_density"] = gdf["total_population"] / gdf["land_area_km2"]
-    gdf["car_ownership_density"] = gdf["households_with_vehicles"] / gdf["land_area_km2"]
+    gdf["land_area_km2"] = (gdf["ALAND"] / 1_000_000).astype("float32")
+    gdf["population_density"] = (gdf["total_population"] / gdf["land_area_km2"]).astype("float32")
+    gdf["car_ownership_density"] = (gdf["households_with_vehicles"] / gdf["land_area_km2"]).astype("float32")
 
     # Handle potential division by zero or missing data
     gdf.fillna({
@@ -71,18 +64,56 @@ def calculate_densities_and_ownership(gdf):
 
     return gdf
 
-def calculate_hail_risk(merged_gdf, hail_gdf):
+@traced()
+def count_hail_per_tract(merged_gdf, hail_gdf, tract_index=None, geoids=None):
     """
-    Performs spatial join to count hail reports per tract and calculates risk score.
+    Counts hail reports falling within each tract.
+
+    With a prebuilt TractIndex the points are assigned in bulk; otherwise a
+    spatial join is run against the tract polygons. `geoids` reuses an
+    assignment already made by assign_hail_to_tracts.
     """
-    logger.info("Performing spatial join to count hail reports per tract...")
+    if geoids is not None:
+        hail_counts = pd.Series(geoids, dtype=object).dropna().value_counts()
+        return hail_counts.rename_axis("GEOID").reset_index(name="hail_reports")
 
     # Ensure CRSs match before spatial join
     if merged_gdf.crs != hail_gdf.crs:
         hail_gdf = hail_gdf.to_crs(merged_gdf.crs)
 
+    if tract_index is not None:
+        logger.info("Assigning hail reports to tracts with the tract index...")
+        geoids = tract_index.assign_points_to_tracts(hail_gdf.geometry.x.to_numpy(), hail_gdf.geometry.y.to_numpy())
+        hail_counts = pd.Series(geoids, dtype=object).dropna().value_counts()
+        return hail_counts.rename_axis("GEOID").reset_index(name="hail_reports")
+
+    logger.info("Performing spatial join to count hail reports per tract...")
     hail_per_tract = gpd.sjoin(hail_gdf, merged_gdf, how="inner", predicate="within")
-    hail_counts = hail_per_tract.groupby("GEOID").size().reset_index(name="hail_reports")
+    return hail_per_tract.groupby("GEOID").size().reset_index(name="hail_reports")
+
+@traced()
+def assign_hail_to_tracts(merged_gdf, hail_gdf, tract_index=None):
+    """
+    GEOID of the tract containing each hail report (NaN/None outside every
+    tract), in hail_gdf order: in bulk with a prebuilt TractIndex, otherwise
+    via a spatial join.
+    """
+    if merged_gdf.crs != hail_gdf.crs:
+        hail_gdf = hail_gdf.to_crs(merged_gdf.crs)
+    if tract_index is not None:
+        return tract_index.assign_points_to_tracts(hail_gdf.geometry.x.to_numpy(), hail_gdf.geometry.y.to_numpy())
+    joined = gpd.sjoin(hail_gdf[[hail_gdf.geometry.name]], merged_gdf[["GEOID", merged_gdf.geometry.name]],
+                       how="left", predicate="within")
+    # A report on a shared boundary can match two tracts; keep one, like the tract index does
+    joined = joined[~joined.index.duplicated(keep="first")]
+    return joined["GEOID"].reindex(hail_gdf.index).to_numpy(dtype=object)
+
+@traced()
+def calculate_hail_risk(merged_gdf, hail_gdf, tract_index=None, geoids=None):
+    """
+    Counts hail reports per tract and calculates risk score.
+    """
+    hail_counts = count_hail_per_tract(merged_gdf, hail_gdf, tract_index, geoids)
 
     # Merge hail counts back to the main GeoDataFrame
     final_gdf = merged_gdf.merge(hail_counts, on="GEOID", how="left")
@@ -93,28 +124,95 @@ def calculate_hail_risk(merged_gdf, hail_gdf):
 
     return final_gdf
 
+@traced()
+def calculate_kernel_hail_risk(final_gdf, hail_gdf):
+    """
+    Spreads each report over a size-dependent footprint and sums the
+    kernel-weighted exposure of every tract it reaches, so reports just
+    outside a tract still count and larger stones count for more.
+    Adds hail_exposure and hail_risk_score_kernel.
+    """
+    logger.info("Calculating size-weighted kernel hail exposure...")
+    if final_gdf.crs != hail_gdf.crs:
+        hail_gdf = hail_gdf.to_crs(final_gdf.crs)
+
+    size_inch = (pd.to_numeric(hail_gdf["Size"], errors="coerce") / 100).fillna(HAIL_KERNEL_DEFAULT_SIZE_INCH)
+    size_inch = size_inch.to_numpy(dtype=float)
+    radii = report_radius_km(size_inch, HAIL_KERNEL_BASE_RADIUS_KM, HAIL_KERNEL_RADIUS_PER_INCH_KM,
+                             HAIL_KERNEL_MAX_RADIUS_KM)
+
+    tract_radii = tract_radii_km(final_gdf)
+    grid = CentroidGrid(*tract_centroids(final_gdf), reach_km=HAIL_KERNEL_MAX_RADIUS_KM, radii_km=tract_radii)
+    final_gdf["hail_exposure"] = kernel_exposure(
+        grid, hail_gdf.geometry.x.to_numpy(), hail_gdf.geometry.y.to_numpy(), size_inch, radii, tract_radii
+    )
+    final_gdf["hail_risk_score_kernel"] = final_gdf["hail_exposure"] * final_gdf["car_ownership_density"]
+
+    return final_gdf
+
+@traced()
+def add_radar_composite(final_gdf, composite_df):
+    """
+    Joins per-tract radar statistics (radar_max_dbz, radar_minutes_55dbz) and
+    scores time spent under a hail core as radar_hail_risk_score. Tracts the
+    radar never saw echo over keep a missing max dBZ and zero minutes.
+    """
+    logger.info("Adding radar composite statistics...")
+    final_gdf = final_gdf.merge(composite_df, on="GEOID", how="left")
+    final_gdf["radar_minutes_55dbz"] = final_gdf["radar_minutes_55dbz"].fillna(0)
+    final_gdf["radar_hail_risk_score"] = final_gdf["radar_minutes_55dbz"] * final_gdf["car_ownership_density"]
+    return final_gdf
+
+@traced()
+def add_rolling_hail_risk(final_gdf, rolling_df):
+    """
+    Joins rolling/decayed hail counts (hail_reports_* columns keyed by GEOID)
+    and derives a matching hail_risk_score_* for each.
+    """
+    logger.info("Adding rolling hail risk scores...")
+    count_cols = [c for c in rolling_df.columns if c.startswith("hail_reports_")]
+    final_gdf = final_gdf.merge(rolling_df[["GEOID"] + count_cols], on="GEOID", how="left")
+
+    for col in count_cols:
+        final_gdf[col] = final_gdf[col].fillna(0)
+        suffix = col[len("hail_reports_"):]
+        final_gdf[f"hail_risk_score_{suffix}"] = final_gdf[col] * final_gdf["car_ownership_density"]
+
+    return final_gdf
+
+@traced()
 def apply_filters(gdf):
     """
     Applies any specific filters to the data, e.g., for Missouri.
     """
     logger.info("Applying data filters...")
 
-    # Apply Missouri longitude filter
+    # Apply Missouri longitude filter (already pushed into the shapefile read by
+    # load_all_tracts; kept so frames built from other inputs get the same cut)
     mo_filter = (gdf['state_abbr'] == 'MO') & (gdf['INTPTLON'].astype(float) >= MISSOURI_LONGITUDE_FILTER)
     gdf = gdf[~mo_filter] # Keep rows that DON'T meet this condition
 
     return gdf
 
-def process_all_data(tracts_gdf, vehicles_df, income_df, hail_gdf):
+@traced()
+def build_static_tracts(tracts_gdf, vehicles_df, income_df):
     """
-    Main function to orchestrate the entire data processing workflow.
+    Builds the merged, filtered tract frame that does not depend on hail reports.
     """
-    logger.info("Starting data processing workflow...")
-
     merged_gdf = merge_data(tracts_gdf, vehicles_df, income_df)
     merged_gdf = calculate_densities_and_ownership(merged_gdf)
 
     merged_gdf = apply_filters(merged_gdf) # Apply filters before spatial join for efficiency
+    return merged_gdf.reset_index(drop=True)
+
+@traced()
+def process_all_data(tracts_gdf, vehicles_df, income_df, hail_gdf):
+    """
+    Main function to orchestrate the entire data processing workflow.
+    """
+    logger.info("Starting data processing workflow...")
+
+    merged_gdf = build_static_tracts(tracts_gdf, vehicles_df, income_df)
 
     final_gdf = calculate_hail_risk(merged_gdf, hail_gdf)
 
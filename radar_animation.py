@@ -0,0 +1,91 @@
+import json
+
+import pydeck as pdk
+
+# Layer ids of the radar frames; the page script toggles their visibility
+FRAME_LAYER_PREFIX = "radar-frame-"
+
+ANIMATION_CONTROLS = """
+<div id="radar-controls" style="position: absolute; z-index: 2; left: 10px; bottom: 10px; padding: 6px 10px;
+     font-family: sans-serif; font-size: 12px; color: white; background: rgba(51, 51, 51, 0.85); border-radius: 4px;">
+  <button id="radar-play" style="width: 4.5em;">Play</button>
+  <input id="radar-slider" type="range" min="0" value="0" style="width: 220px; vertical-align: middle;" />
+  <span id="radar-label"></span>
+</div>
+"""
+
+ANIMATION_SCRIPT = """
+<script>
+  (function () {
+    const labels = %(labels)s;
+    const intervalMs = %(interval_ms)d;
+    const prefix = %(prefix)s;
+    const button = document.getElementById('radar-play');
+    const slider = document.getElementById('radar-slider');
+    const label = document.getElementById('radar-label');
+    let frame = 0;
+    let timer = null;
+
+    function show(i) {
+      frame = i;
+      // Clones only change `visible`: deck.gl keeps every frame's texture and the base layers as they are
+      const layers = deckInstance.props.layers.map(
+        layer => layer.id.startsWith(prefix) ? layer.clone({visible: layer.id === prefix + i}) : layer
+      );
+      deckInstance.setProps({layers});
+      slider.value = i;
+      label.textContent = labels[i];
+    }
+
+    slider.max = labels.length - 1;
+    slider.oninput = () => show(Number(slider.value));
+    button.onclick = () => {
+      if (timer) {
+        clearInterval(timer);
+        timer = null;
+        button.textContent = 'Play';
+      } else {
+        timer = setInterval(() => show((frame + 1) %% labels.length), intervalMs);
+        button.textContent = 'Pause';
+      }
+    };
+    show(0);
+  })();
+</script>
+"""
+
+def radar_frame_layers(frames, images, opacity=0.6):
+    """
+    One BitmapLayer per radar frame (images as data URIs), all but the first
+    hidden. Hidden layers still load their images, so every frame is on the
+    GPU before playback.
+    """
+    return [
+        pdk.Layer(
+            "BitmapLayer",
+            id=f"{FRAME_LAYER_PREFIX}{i}",
+            image=f"'{image}'",  # quoted: pydeck treats bare strings as expressions
+            bounds=frame['bounds'],
+            opacity=opacity,
+            desaturate=0,
+            transparent_color=[0, 0, 0, 0],
+            visible=i == 0,
+        )
+        for i, (frame, image) in enumerate(zip(frames, images))
+    ]
+
+def animation_html(deck, labels, interval_ms=200):
+    """
+    Standalone page for a deck whose layers include radar_frame_layers().
+    The page is sent once; playback and scrubbing run entirely in the browser
+    by toggling which frame layer is visible.
+    """
+    html = deck.to_html(as_string=True, notebook_display=False)
+    script = ANIMATION_SCRIPT % {
+        "labels": json.dumps(list(labels)),
+        "interval_ms": int(interval_ms),
+        "prefix": json.dumps(FRAME_LAYER_PREFIX),
+    }
+    html = html.replace("<body>", "<body>" + ANIMATION_CONTROLS, 1)
+    head, tail = html.rsplit("</html>", 1)
+    return head + script + "</html>" + tail
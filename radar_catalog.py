@@ -0,0 +1,144 @@
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+import numpy as np
+
+from radar_index import timestamp_to_epoch
+
+# Map tiles are 512 px wide in deck.gl
+MAP_TILE_SIZE_PX = 512
+
+def datetime_to_epoch(dt: datetime) -> int:
+    """Epoch seconds of a naive UTC datetime (as used throughout the radar index)."""
+    return int(dt.replace(tzinfo=timezone.utc).timestamp())
+
+def epoch_to_datetime(epoch: int) -> datetime:
+    """Naive UTC datetime of an epoch, matching the index's timestamps."""
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).replace(tzinfo=None)
+
+def frame_image(frame: dict, zoom: float) -> str:
+    """
+    Image to show for a frame at a map zoom: the narrowest variant that still
+    has a pixel for every screen pixel across the frame, else the widest.
+    Frames rendered before variants existed only have their image_path.
+    """
+    variants = frame.get("variants") or []
+    if not variants:
+        return frame["image_path"]
+    west, _, east, _ = frame["bounds"]
+    needed = (east - west) / 360.0 * MAP_TILE_SIZE_PX * 2 ** zoom
+    for variant in reversed(variants):  # narrowest first
+        if variant["width"] >= needed:
+            return variant["image_path"]
+    return variants[0]["image_path"]
+
+class RadarCatalog:
+    """
+    Read-only, time-sorted view of the rendered radar frames.
+
+    Frames are held as parallel arrays ordered by (epoch, radar), with each
+    station's frames as a sorted slice of positions, so nearest-frame lookups
+    are a binary search and time ranges are a pair of them. Frame dicts are
+    only built for the frames a caller asks for.
+    """
+
+    def __init__(self, radars, timestamps, epochs, image_paths, bounds, variants=None):
+        order = np.lexsort((np.asarray(radars, dtype=str), np.asarray(epochs, dtype=np.int64)))
+        self.radars = np.asarray(radars, dtype=object)[order]
+        self.timestamps = np.asarray(timestamps, dtype=object)[order]
+        self.epochs = np.asarray(epochs, dtype=np.int64)[order]
+        self.image_paths = np.asarray(image_paths, dtype=object)[order]
+        self.bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)[order]
+        # Per frame: image variants, widest first (empty for single-image frames)
+        self.variants = [variants[i] for i in order] if variants is not None else [[] for _ in order]
+        # Station -> (positions of its frames, their epochs), ascending in time
+        self.stations = {}
+        if len(self.radars):
+            uniques, codes = np.unique(self.radars, return_inverse=True)
+            # Stable sort keeps each station's frames in time order
+            by_station = np.argsort(codes, kind="stable")
+            splits = np.cumsum(np.bincount(codes))[:-1]
+            for radar, positions in zip(uniques, np.split(by_station, splits)):
+                self.stations[radar] = (positions, self.epochs[positions])
+
+    @classmethod
+    def from_index(cls, db_path: str):
+        """Loads every frame of a RadarIndex SQLite file."""
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute("SELECT radar, timestamp, epoch, image_path, bounds FROM frames ORDER BY epoch, radar").fetchall()
+            has_variants = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'frame_variants'"
+            ).fetchone() is not None
+            variant_rows = conn.execute(
+                "SELECT radar, timestamp, width, image_path, bytes FROM frame_variants ORDER BY width DESC"
+            ).fetchall() if has_variants else []
+        finally:
+            conn.close()
+        by_frame = {}
+        for radar, timestamp, width, image_path, size in variant_rows:
+            by_frame.setdefault((radar, timestamp), []).append({"width": width, "image_path": image_path, "bytes": size})
+        radars, timestamps, epochs, image_paths, bounds = zip(*rows) if rows else ((),) * 5
+        variants = [by_frame.get(key, []) for key in zip(radars, timestamps)]
+        # One parse for all bounds rather than one per row
+        return cls(radars, timestamps, epochs, image_paths, json.loads("[" + ",".join(bounds) + "]"), variants)
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Builds a catalog from radar_index.json-style entries."""
+        return cls(
+            [e["radar"] for e in entries],
+            [e["timestamp"] for e in entries],
+            [timestamp_to_epoch(e["timestamp"]) for e in entries],
+            [e["image_path"] for e in entries],
+            [e["bounds"] for e in entries],
+            [e.get("variants", []) for e in entries],
+        )
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def time_range(self):
+        """(first, last) frame time as naive UTC datetimes, or None when empty."""
+        if not len(self):
+            return None
+        return epoch_to_datetime(self.epochs[0]), epoch_to_datetime(self.epochs[-1])
+
+    def frame(self, pos: int) -> dict:
+        """Frame at a catalog position as an index dict, plus its epoch and parsed time."""
+        return {
+            "image_path": self.image_paths[pos],
+            "variants": self.variants[pos],
+            "bounds": self.bounds[pos].tolist(),
+            "timestamp": self.timestamps[pos],
+            "radar": self.radars[pos],
+            "epoch": int(self.epochs[pos]),
+            "time": epoch_to_datetime(self.epochs[pos]),
+        }
+
+    def _positions(self, radar=None):
+        if radar is None:
+            return None, self.epochs
+        empty = np.empty(0, dtype=np.int64)
+        return self.stations.get(radar, (empty, empty))
+
+    def nearest(self, when, radar=None):
+        """Frame closest in time to `when` (datetime or epoch), optionally for one station."""
+        epoch = datetime_to_epoch(when) if isinstance(when, datetime) else int(when)
+        positions, epochs = self._positions(radar)
+        if len(epochs) == 0:
+            return None
+        i = int(np.searchsorted(epochs, epoch))
+        if i == len(epochs) or (i > 0 and epoch - epochs[i - 1] <= epochs[i] - epoch):
+            i -= 1
+        return self.frame(i if positions is None else positions[i])
+
+    def between(self, start, end, radar=None) -> list:
+        """Frames with start <= time <= end (datetimes or epochs) in time order."""
+        lo = datetime_to_epoch(start) if isinstance(start, datetime) else int(start)
+        hi = datetime_to_epoch(end) if isinstance(end, datetime) else int(end)
+        positions, epochs = self._positions(radar)
+        i, j = np.searchsorted(epochs, lo, side="left"), np.searchsorted(epochs, hi, side="right")
+        selected = range(i, j) if positions is None else positions[i:j]
+        return [self.frame(p) for p in selected]
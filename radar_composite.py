@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+from radar_raster import EARTH_RADIUS_M, ground_range, lowest_sweep, sweep_rays
+
+# Reflectivity at or above which a tract counts as under a hail core
+HAIL_CORE_DBZ = 55.0
+# Gates below this never set a useful tract maximum and are dropped before lookup
+COMPOSITE_MIN_DBZ = 20.0
+# A scan stands for the time until the next scan from the same radar. Gaps longer
+# than MAX_SCAN_MINUTES (e.g. between event windows) fall back to DEFAULT_SCAN_MINUTES.
+MAX_SCAN_MINUTES = 10.0
+DEFAULT_SCAN_MINUTES = 5.0
+
+
+def gate_lonlat(lon0, lat0, azimuths, distances):
+    """Longitude/latitude of points at the given azimuths (deg) and great-circle distances (m)."""
+    phi0 = np.radians(lat0)
+    theta = np.radians(azimuths)
+    delta = np.asarray(distances, dtype=np.float64) / EARTH_RADIUS_M
+    sin_phi = np.sin(phi0) * np.cos(delta) + np.cos(phi0) * np.sin(delta) * np.cos(theta)
+    phi = np.arcsin(np.clip(sin_phi, -1.0, 1.0))
+    lam = np.arctan2(np.sin(theta) * np.sin(delta) * np.cos(phi0), np.cos(delta) - np.sin(phi0) * sin_phi)
+    return lon0 + np.degrees(lam), np.degrees(phi)
+
+
+def sweep_echo(radar, sweep, field='reflectivity', min_dbz=COMPOSITE_MIN_DBZ):
+    """(ray within sweep, gate, dBZ) of every gate in a sweep at or above min_dbz."""
+    rays = sweep_rays(radar, sweep)
+    dbz = np.ma.filled(np.ma.asarray(radar.fields[field]['data'][rays], dtype=np.float32), np.nan)
+    ray_idx, gate_idx = np.nonzero(dbz >= min_dbz)  # NaN (masked) compares False
+    return ray_idx, gate_idx, dbz[ray_idx, gate_idx]
+
+
+def sweep_gate_lonlat(radar, sweep, ray_idx, gate_idx):
+    """Geolocates selected gates of a sweep (4/3 earth ground range, spherical earth)."""
+    rays = sweep_rays(radar, sweep)
+    elevation = float(np.mean(radar.elevation['data'][rays]))
+    distances = ground_range(radar.range['data'], elevation)
+    azimuths = np.asarray(radar.azimuth['data'][rays], dtype=np.float64)
+    return gate_lonlat(float(radar.longitude['data'][0]), float(radar.latitude['data'][0]),
+                       azimuths[ray_idx], distances[gate_idx])
+
+
+def scan_tract_max(radar, tract_index, mode="lowest", field='reflectivity', min_dbz=COMPOSITE_MIN_DBZ,
+                   lookup=None, site=None):
+    """
+    Per-tract maximum reflectivity for one volume.
+
+    mode="lowest" uses the lowest sweep only; mode="column" takes the maximum
+    over every sweep (each projected to the ground at its own elevation).
+    With a GateLookup (and the radar's site id) echo gates are mapped to tracts
+    by table lookup; otherwise only the echo gates are geolocated and located
+    in the tract index. Gates below min_dbz are dropped before either.
+
+    Returns:
+        tuple: (tract positions, max dBZ) for tracts with any echo >= min_dbz.
+    """
+    sweeps = [lowest_sweep(radar)] if mode == "lowest" else range(radar.nsweeps)
+    tract_max = np.full(len(tract_index.geoids), -np.inf, dtype=np.float32)
+    for sweep in sweeps:
+        ray_idx, gate_idx, dbz = sweep_echo(radar, sweep, field, min_dbz)
+        if len(dbz) == 0:
+            continue
+        if lookup is not None:
+            pos = lookup.positions(site, radar, sweep, ray_idx, gate_idx)
+        else:
+            pos = tract_index.locate(*sweep_gate_lonlat(radar, sweep, ray_idx, gate_idx))
+        inside = pos >= 0
+        np.maximum.at(tract_max, pos[inside], dbz[inside])
+    hit = np.flatnonzero(np.isfinite(tract_max))
+    return hit, tract_max[hit]
+
+
+def scan_minutes(epochs):
+    """Minutes represented by each scan in a sorted array of one radar's scan times (epoch s)."""
+    gaps = np.diff(np.asarray(epochs, dtype=np.float64)) / 60.0
+    gaps = np.append(gaps, np.inf)
+    return np.where(gaps <= MAX_SCAN_MINUTES, gaps, DEFAULT_SCAN_MINUTES)
+
+
+def tract_composite(echo_rows, scan_rows, core_dbz=HAIL_CORE_DBZ):
+    """
+    Folds per-scan tract maxima into per-tract event statistics.
+
+    Args:
+        echo_rows: (radar, epoch, GEOID, max_dbz) per scan and tract with echo.
+        scan_rows: (radar, epoch) for every scan, echo or not, to time the scans.
+
+    Returns:
+        DataFrame with GEOID, radar_max_dbz and radar_minutes_55dbz. Minutes are
+        summed per radar and the largest radar total is kept, so two radars
+        seeing the same storm do not double-count it.
+    """
+    echo = pd.DataFrame(echo_rows, columns=["radar", "epoch", "GEOID", "max_dbz"])
+    if echo.empty:
+        return pd.DataFrame({"GEOID": pd.Series(dtype=object),
+                             "radar_max_dbz": pd.Series(dtype="float32"),
+                             "radar_minutes_55dbz": pd.Series(dtype="float64")})
+
+    scans = pd.DataFrame(scan_rows, columns=["radar", "epoch"])
+    scans = pd.concat([scans, echo[["radar", "epoch"]]]).drop_duplicates().sort_values(["radar", "epoch"])
+    scans["minutes"] = np.concatenate([scan_minutes(g.to_numpy()) for _, g in scans.groupby("radar", sort=False)["epoch"]])
+
+    echo = echo.merge(scans, on=["radar", "epoch"], how="left")
+    echo["core_minutes"] = np.where(echo["max_dbz"] >= core_dbz, echo["minutes"], 0.0)
+
+    max_dbz = echo.groupby("GEOID")["max_dbz"].max().astype("float32")
+    minutes = echo.groupby(["GEOID", "radar"])["core_minutes"].sum().groupby(level="GEOID").max()
+    return pd.DataFrame({"radar_max_dbz": max_dbz, "radar_minutes_55dbz": minutes}).rename_axis("GEOID").reset_index()
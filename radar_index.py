@@ -0,0 +1,213 @@
+import calendar
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+# One row per rendered frame. Every insert is its own transaction, so an
+# interrupted run keeps everything committed up to that point.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    radar      TEXT    NOT NULL,
+    timestamp  TEXT    NOT NULL,
+    epoch      INTEGER NOT NULL,
+    image_path TEXT    NOT NULL,
+    bounds     TEXT    NOT NULL,
+    PRIMARY KEY (radar, timestamp)
+)
+"""
+# Downsized copies of each frame's image (widest first in `entries`). Several
+# frames may point at the same content-addressed file.
+FRAME_VARIANTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frame_variants (
+    radar      TEXT    NOT NULL,
+    timestamp  TEXT    NOT NULL,
+    width      INTEGER NOT NULL,
+    image_path TEXT    NOT NULL,
+    bytes      INTEGER NOT NULL,
+    PRIMARY KEY (radar, timestamp, width)
+)
+"""
+
+# Time-ordered reads (the catalog, the JSON export) scan this instead of sorting
+FRAMES_EPOCH_INDEX = "CREATE INDEX IF NOT EXISTS frames_epoch ON frames (epoch, radar)"
+
+# Per-scan maximum reflectivity for every tract with echo, written before the
+# scan's frame row so a frame in the index implies its tract rows are there too.
+TRACT_ECHO_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tract_echo (
+    radar     TEXT    NOT NULL,
+    timestamp TEXT    NOT NULL,
+    epoch     INTEGER NOT NULL,
+    geoid     TEXT    NOT NULL,
+    max_dbz   REAL    NOT NULL,
+    PRIMARY KEY (radar, timestamp, geoid)
+)
+"""
+# Event-window reads of the tract statistics
+TRACT_ECHO_EPOCH_INDEX = "CREATE INDEX IF NOT EXISTS tract_echo_epoch ON tract_echo (epoch)"
+
+def timestamp_to_epoch(timestamp: str) -> int:
+    """Converts a naive ISO timestamp (UTC, as parsed from scan filenames) to epoch seconds."""
+    return calendar.timegm(datetime.fromisoformat(timestamp).timetuple())
+
+def _epoch_range(start_epoch, end_epoch):
+    """Query bounds for an optional, half-open epoch range (unbounded when None)."""
+    return (-2 ** 63 if start_epoch is None else int(start_epoch),
+            2 ** 63 - 1 if end_epoch is None else int(end_epoch))
+
+class RadarIndex:
+    """
+    Append-only SQLite index of rendered radar frames.
+
+    Connections are opened per operation rather than held, so the same index
+    can be written from several worker processes at once; SQLite's WAL mode
+    serializes the writers and the busy timeout makes them wait their turn.
+    """
+
+    def __init__(self, path: str, timeout: float = 60.0):
+        self.path = path
+        self.timeout = timeout
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+            conn.execute(FRAMES_EPOCH_INDEX)
+            conn.execute(FRAME_VARIANTS_SCHEMA)
+            conn.execute(TRACT_ECHO_SCHEMA)
+            conn.execute(TRACT_ECHO_EPOCH_INDEX)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add(self, entry: dict, replace: bool = True):
+        """Commits a single frame entry (image_path, bounds, timestamp, radar, optional variants)."""
+        self.add_many([entry], replace=replace)
+
+    def add_many(self, entries, replace: bool = True):
+        """Commits several frame entries in one transaction."""
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        rows = [
+            (
+                entry["radar"],
+                entry["timestamp"],
+                timestamp_to_epoch(entry["timestamp"]),
+                entry["image_path"],
+                json.dumps(entry["bounds"]),
+            )
+            for entry in entries
+        ]
+        variant_rows = [
+            (entry["radar"], entry["timestamp"], int(v["width"]), v["image_path"], int(v.get("bytes", 0)))
+            for entry in entries
+            for v in entry.get("variants", ())
+        ]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    f"{verb} INTO frames (radar, timestamp, epoch, image_path, bounds) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.executemany(
+                    f"{verb} INTO frame_variants (radar, timestamp, width, image_path, bytes) VALUES (?, ?, ?, ?, ?)",
+                    variant_rows,
+                )
+        finally:
+            conn.close()
+
+    def add_tract_echo(self, radar: str, timestamp: str, geoids, max_dbz):
+        """Replaces the per-tract maximum reflectivity recorded for one scan."""
+        epoch = timestamp_to_epoch(timestamp)
+        rows = [(radar, timestamp, epoch, str(g), float(v)) for g, v in zip(geoids, max_dbz)]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM tract_echo WHERE radar = ? AND timestamp = ?", (radar, timestamp))
+                conn.executemany(
+                    "INSERT INTO tract_echo (radar, timestamp, epoch, geoid, max_dbz) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+        finally:
+            conn.close()
+
+    def tract_echo(self, start_epoch=None, end_epoch=None) -> list:
+        """Returns the (radar, epoch, geoid, max_dbz) tract echo rows with start_epoch <= epoch < end_epoch."""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT radar, epoch, geoid, max_dbz FROM tract_echo WHERE epoch >= ? AND epoch < ?",
+                _epoch_range(start_epoch, end_epoch),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def scan_epochs(self, start_epoch=None, end_epoch=None) -> list:
+        """Returns (radar, epoch) for every indexed scan with start_epoch <= epoch < end_epoch."""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT radar, epoch FROM frames WHERE epoch >= ?1 AND epoch < ?2 "
+                "UNION SELECT radar, epoch FROM tract_echo WHERE epoch >= ?1 AND epoch < ?2",
+                _epoch_range(start_epoch, end_epoch),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def keys(self) -> set:
+        """Returns the (radar, timestamp) pairs that are already rendered."""
+        conn = self._connect()
+        try:
+            return set(conn.execute("SELECT radar, timestamp FROM frames"))
+        finally:
+            conn.close()
+
+    def variants(self) -> dict:
+        """Returns {(radar, timestamp): [variant dicts, widest first]} for every frame with variants."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT radar, timestamp, width, image_path, bytes FROM frame_variants ORDER BY width DESC"
+            ).fetchall()
+        finally:
+            conn.close()
+        variants = {}
+        for radar, timestamp, width, image_path, size in rows:
+            variants.setdefault((radar, timestamp), []).append({"width": width, "image_path": image_path, "bytes": size})
+        return variants
+
+    def entries(self) -> list:
+        """Returns all frames as index dicts, ordered by timestamp then radar."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT image_path, bounds, timestamp, radar FROM frames ORDER BY epoch, radar"
+            ).fetchall()
+        finally:
+            conn.close()
+        variants = self.variants()
+        entries = []
+        for image_path, bounds, timestamp, radar in rows:
+            entry = {"image_path": image_path, "bounds": json.loads(bounds), "timestamp": timestamp, "radar": radar}
+            if (radar, timestamp) in variants:
+                entry["variants"] = variants[(radar, timestamp)]
+            entries.append(entry)
+        return entries
+
+    def import_json(self, json_path: str) -> int:
+        """Loads entries from a legacy radar_index.json, keeping any rows already indexed."""
+        with open(json_path, "r") as f:
+            entries = json.load(f)
+        self.add_many(entries, replace=False)
+        return len(entries)
+
+    def export_json(self, json_path: str):
+        """Writes the whole index as the flat JSON list the dashboard reads, atomically."""
+        tmp_path = f"{json_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries(), f, indent=2)
+        os.replace(tmp_path, json_path)
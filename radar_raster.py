@@ -0,0 +1,302 @@
+import hashlib
+import io
+import os
+import uuid
+
+import numpy as np
+from PIL import Image
+
+# Spherical earth used for geographic <-> radar coordinates (same radius as Py-ART)
+EARTH_RADIUS_M = 6370997.0
+# Effective earth radius for beam propagation (standard 4/3 refraction model)
+EFFECTIVE_EARTH_RADIUS_M = 4.0 / 3.0 * 6371000.0
+
+# Default output width in pixels; the height follows from the Web Mercator aspect ratio
+RADAR_IMAGE_WIDTH = 1024
+# Widths of the per-frame image pyramid; each level halves the previous one
+RADAR_PYRAMID_WIDTHS = (1024, 512, 256)
+
+# --- NWS reflectivity colormap ---
+# Each entry is (lower dBZ bound, RGB). Values below the first bound are transparent.
+NWS_REFLECTIVITY_COLORS = [
+    (5, (4, 233, 231)),
+    (10, (1, 159, 244)),
+    (15, (3, 0, 244)),
+    (20, (2, 253, 2)),
+    (25, (1, 197, 1)),
+    (30, (0, 142, 0)),
+    (35, (253, 248, 2)),
+    (40, (229, 188, 0)),
+    (45, (253, 149, 0)),
+    (50, (253, 0, 0)),
+    (55, (212, 0, 0)),
+    (60, (188, 0, 0)),
+    (65, (248, 0, 253)),
+    (70, (152, 84, 198)),
+    (75, (253, 253, 253)),
+]
+LUT_MIN_DBZ = -32.0
+LUT_STEP_DBZ = 0.5
+LUT_SIZE = 256  # Index 0 is reserved for "no data"
+
+
+def build_reflectivity_lut():
+    """
+    Builds the RGBA lookup table indexed by quantized reflectivity.
+    Index 0 (and everything below 5 dBZ) is fully transparent.
+    """
+    lut = np.zeros((LUT_SIZE, 4), dtype=np.uint8)
+    bin_dbz = LUT_MIN_DBZ + (np.arange(1, LUT_SIZE) - 1) * LUT_STEP_DBZ
+    for lower, rgb in NWS_REFLECTIVITY_COLORS:
+        lut[1:][bin_dbz >= lower] = (*rgb, 255)
+    return lut
+
+REFLECTIVITY_LUT = build_reflectivity_lut()
+
+
+def build_colour_classes():
+    """
+    Collapses the LUT into its distinct colours: a colour class per LUT index
+    (0 = transparent, then one per NWS colour in ascending dBZ order) and the
+    RGBA palette of the classes. Class order follows reflectivity, so the
+    maximum of two classes is the stronger echo.
+    """
+    bin_dbz = LUT_MIN_DBZ + (np.arange(1, LUT_SIZE) - 1) * LUT_STEP_DBZ
+    classes = np.zeros(LUT_SIZE, dtype=np.uint8)
+    for k, (lower, _) in enumerate(NWS_REFLECTIVITY_COLORS, start=1):
+        classes[1:][bin_dbz >= lower] = k
+    palette = np.zeros((len(NWS_REFLECTIVITY_COLORS) + 1, 4), dtype=np.uint8)
+    palette[1:] = [(*rgb, 255) for _, rgb in NWS_REFLECTIVITY_COLORS]
+    return classes, palette
+
+COLOUR_CLASS, CLASS_PALETTE = build_colour_classes()
+
+
+def quantize_reflectivity(dbz):
+    """Maps a (masked) dBZ array to uint8 LUT indices; masked/NaN gates become 0."""
+    values = np.ma.filled(np.ma.asarray(dbz, dtype=np.float32), np.nan)
+    idx = np.floor((values - LUT_MIN_DBZ) / LUT_STEP_DBZ) + 1
+    idx = np.clip(np.nan_to_num(idx, nan=0.0), 0, LUT_SIZE - 1)
+    return idx.astype(np.uint8)
+
+
+def lowest_sweep(radar):
+    """Returns the index of the lowest-elevation sweep (the first one on ties)."""
+    return int(np.argmin(radar.fixed_angle['data']))
+
+
+def sweep_rays(radar, sweep):
+    """Returns the ray slice belonging to a sweep."""
+    start = int(radar.sweep_start_ray_index['data'][sweep])
+    end = int(radar.sweep_end_ray_index['data'][sweep]) + 1
+    return slice(start, end)
+
+
+def ground_range(slant_range_m, elevation_deg):
+    """Converts slant range along the beam to great-circle distance (4/3 earth model)."""
+    r = np.asarray(slant_range_m, dtype=np.float64)
+    elev = np.radians(elevation_deg)
+    height = np.sqrt(r ** 2 + EFFECTIVE_EARTH_RADIUS_M ** 2
+                     + 2.0 * r * EFFECTIVE_EARTH_RADIUS_M * np.sin(elev)) - EFFECTIVE_EARTH_RADIUS_M
+    return EFFECTIVE_EARTH_RADIUS_M * np.arcsin(r * np.cos(elev) / (EFFECTIVE_EARTH_RADIUS_M + height))
+
+
+def range_circle_bounds(lon0, lat0, radius_m):
+    """Exact [West, South, East, North] box around a circle of radius_m on the sphere."""
+    angle = radius_m / EARTH_RADIUS_M
+    lat0_rad = np.radians(lat0)
+    dlon = np.degrees(np.arcsin(min(1.0, np.sin(angle) / np.cos(lat0_rad))))
+    north = min(85.0, lat0 + np.degrees(angle))
+    south = max(-85.0, lat0 - np.degrees(angle))
+    return [float(lon0 - dlon), float(south), float(lon0 + dlon), float(north)]
+
+
+def _mercator_y(lat_deg):
+    return np.log(np.tan(np.pi / 4 + np.radians(lat_deg) / 2))
+
+
+def snap_bounds_height(bounds, width, multiple):
+    """
+    Extends bounds southwards so an image of `width` over them is a whole
+    multiple of `multiple` pixels tall, letting it be halved repeatedly
+    without changing its extent.
+    """
+    west, south, east, north = bounds
+    pixel = np.radians(east - west) / width
+    y_north = _mercator_y(north)
+    rows = np.ceil((y_north - _mercator_y(south)) / pixel / multiple - 1e-9) * multiple
+    y_south = y_north - rows * pixel
+    return [west, float(np.degrees(2 * np.arctan(np.exp(y_south)) - np.pi / 2)), east, north]
+
+
+def mercator_pixel_grid(bounds, width):
+    """
+    Pixel-centre longitudes (1, W) and latitudes (H, 1) for an image that is
+    linear in Web Mercator over `bounds`, as deck.gl's BitmapLayer draws it.
+    """
+    west, south, east, north = bounds
+    x_span = np.radians(east - west)
+    y_south, y_north = _mercator_y(south), _mercator_y(north)
+    height = max(1, int(round(width * (y_north - y_south) / x_span)))
+
+    lons = west + (np.arange(width) + 0.5) * (east - west) / width
+    ys = y_north - (np.arange(height) + 0.5) * (y_north - y_south) / height
+    lats = np.degrees(2 * np.arctan(np.exp(ys)) - np.pi / 2)
+    return lons[None, :], lats[:, None]
+
+
+def azimuth_distance(lon0, lat0, lons, lats):
+    """Great-circle azimuth (degrees from north) and distance (m) from the radar."""
+    phi0 = np.radians(lat0)
+    phi = np.radians(lats)
+    dlam = np.radians(lons - lon0)
+    cos_phi = np.cos(phi)
+    sin_phi = np.sin(phi)
+    az = np.degrees(np.arctan2(np.sin(dlam) * cos_phi,
+                               np.cos(phi0) * sin_phi - np.sin(phi0) * cos_phi * np.cos(dlam))) % 360.0
+    a = np.sin((phi - phi0) / 2) ** 2 + np.cos(phi0) * cos_phi * np.sin(dlam / 2) ** 2
+    dist = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return az, dist
+
+
+def nearest_ray_table(azimuths, resolution=0.1):
+    """
+    Lookup table from azimuth bins (of `resolution` degrees) to the nearest ray
+    index, handling the 0/360 wrap.
+    """
+    azimuths = np.asarray(azimuths, dtype=np.float64) % 360.0
+    order = np.argsort(azimuths)
+    sorted_az = azimuths[order]
+    # Pad with wrapped copies so every bin has a neighbour on both sides
+    ext_az = np.concatenate([sorted_az[-1:] - 360.0, sorted_az, sorted_az[:1] + 360.0])
+    ext_idx = np.concatenate([order[-1:], order, order[:1]])
+
+    centers = (np.arange(int(round(360.0 / resolution))) + 0.5) * resolution
+    right = np.searchsorted(ext_az, centers)
+    left = right - 1
+    take_left = (centers - ext_az[left]) <= (ext_az[right] - centers)
+    return np.where(take_left, ext_idx[left], ext_idx[right])
+
+
+def gate_edges(ground_ranges):
+    """Bin edges halfway between gate centres, extended by half a gate at both ends."""
+    g = np.asarray(ground_ranges, dtype=np.float64)
+    mid = (g[1:] + g[:-1]) / 2
+    first = g[0] - (mid[0] - g[0]) if len(g) > 1 else g[0] - 125.0
+    last = g[-1] + (g[-1] - mid[-1]) if len(g) > 1 else g[0] + 125.0
+    return np.concatenate([[max(0.0, first)], mid, [last]])
+
+
+def grid_reflectivity(radar, width=RADAR_IMAGE_WIDTH, sweep=None, field='reflectivity', height_multiple=1):
+    """
+    Grids one sweep of reflectivity straight onto a Web Mercator pixel grid
+    (nearest gate).
+
+    Returns:
+        tuple: (LUT index array (H, W) uint8, bounds [West, South, East, North]).
+        The bounds are exactly the extent of the image, whose height is a
+        multiple of height_multiple.
+    """
+    if sweep is None:
+        sweep = lowest_sweep(radar)
+    rays = sweep_rays(radar, sweep)
+    lat0 = float(radar.latitude['data'][0])
+    lon0 = float(radar.longitude['data'][0])
+
+    azimuths = radar.azimuth['data'][rays]
+    elevation = float(np.mean(radar.elevation['data'][rays]))
+    gates = ground_range(radar.range['data'], elevation)
+    edges = gate_edges(gates)
+    quantized = quantize_reflectivity(radar.fields[field]['data'][rays])
+
+    bounds = range_circle_bounds(lon0, lat0, edges[-1])
+    if height_multiple > 1:
+        bounds = snap_bounds_height(bounds, width, height_multiple)
+    lons, lats = mercator_pixel_grid(bounds, width)
+    az, dist = azimuth_distance(lon0, lat0, lons, lats)
+
+    ray_table = nearest_ray_table(azimuths)
+    resolution = 360.0 / len(ray_table)
+    ray_idx = ray_table[np.minimum((az / resolution).astype(np.int64), len(ray_table) - 1)]
+    gate_idx = np.searchsorted(edges, dist) - 1
+    inside = (gate_idx >= 0) & (gate_idx < len(gates))
+
+    pixel_idx = np.zeros(dist.shape, dtype=np.uint8)
+    pixel_idx[inside] = quantized[ray_idx[inside], gate_idx[inside]]
+    return pixel_idx, bounds
+
+
+def render_reflectivity(radar, output_image_path=None, width=RADAR_IMAGE_WIDTH, sweep=None, field='reflectivity'):
+    """
+    Grids one sweep of reflectivity and colours it through the NWS lookup table.
+
+    Writes an RGBA PNG when output_image_path is given.
+
+    Returns:
+        tuple: (rgba array (H, W, 4), bounds [West, South, East, North]).
+        The bounds are exactly the extent of the image.
+    """
+    pixel_idx, bounds = grid_reflectivity(radar, width, sweep, field)
+    rgba = REFLECTIVITY_LUT[pixel_idx]
+
+    if output_image_path is not None:
+        Image.fromarray(rgba).save(output_image_path, format="PNG")
+    return rgba, bounds
+
+
+def halve_max(classes):
+    """Halves a colour class image (even height and width), keeping the strongest echo of each 2x2 block."""
+    h, w = classes.shape
+    return classes.reshape(h // 2, 2, w // 2, 2).max(axis=(1, 3))
+
+
+def encode_palette_png(classes):
+    """Encodes a colour class image as a 4-bit palette PNG with per-entry transparency."""
+    # putpalette turns the 8-bit greyscale image into a palette image
+    image = Image.fromarray(classes)
+    image.putpalette(CLASS_PALETTE[:, :3].ravel().tolist())
+    buffer = io.BytesIO()
+    # zlib's default level: optimize=True (level 9) is ~10x slower for ~5% smaller files
+    image.save(buffer, format="PNG", bits=4, transparency=CLASS_PALETTE[:, 3].tobytes())
+    return buffer.getvalue()
+
+
+def write_frame_variants(classes, output_dir, widths=RADAR_PYRAMID_WIDTHS):
+    """
+    Writes a colour class image at each of `widths` (halving from the first)
+    as content-addressed palette PNGs under output_dir/w<width>/. Identical
+    images, such as quiet-sky scans, share one file.
+
+    Returns:
+        list: {"width", "image_path", "bytes"} per width, largest first.
+    """
+    variants = []
+    for width in sorted(widths, reverse=True):
+        while classes.shape[1] > width:
+            classes = halve_max(classes)
+        digest = hashlib.sha1(np.asarray(classes.shape, dtype=np.int64).tobytes() + classes.tobytes()).hexdigest()
+        path = os.path.join(output_dir, f"w{width}", f"{digest}.png")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Unique temp name: several render workers may write the same image at once
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encode_palette_png(classes))
+            os.replace(tmp_path, path)
+        variants.append({"width": width, "image_path": path, "bytes": os.path.getsize(path)})
+    return variants
+
+
+def render_reflectivity_pyramid(radar, output_dir, widths=RADAR_PYRAMID_WIDTHS, sweep=None, field='reflectivity'):
+    """
+    Renders one sweep once at the largest width and writes every pyramid
+    level as a deduplicated palette PNG (see write_frame_variants). All
+    levels cover the same bounds.
+
+    Returns:
+        tuple: (bounds [West, South, East, North], variants largest first).
+    """
+    widths = sorted(widths, reverse=True)
+    levels = int(round(np.log2(widths[0] / widths[-1])))
+    pixel_idx, bounds = grid_reflectivity(radar, widths[0], sweep, field, height_multiple=2 ** levels)
+    return bounds, write_frame_variants(COLOUR_CLASS[pixel_idx], output_dir, widths)
@@ -1,104 +1,309 @@
 import os
+import random
+import shutil
+import time
 import boto3
 import numpy as np
-import matplotlib.pyplot as plt
 import pyart
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from botocore import UNSIGNED
 from botocore.config import Config
 import pandas as pd
-from geopy.distance import geodesic
+
+from radar_raster import render_reflectivity, render_reflectivity_pyramid
+from tracing import traced
 
 # --- CONFIG ---
 # We MUST specify the region (us-east-1) for public NOAA buckets.
 # We also disable signing to ensure we don't accidentally use local AWS credentials.
+MAX_DOWNLOAD_WORKERS = 8
 s3 = boto3.client(
     "s3", 
     region_name="us-east-1", 
-    config=Config(signature_version=UNSIGNED)
+    # Allow one pooled connection per concurrent download (plus s3transfer's own threads)
+    config=Config(signature_version=UNSIGNED, max_pool_connections=4 * MAX_DOWNLOAD_WORKERS)
 )
 BUCKET_NAME = "unidata-nexrad-level2"
 
-def get_closest_nexrad(lat, lon, station_csv="station_list/nexrad_sites.csv"):
-    """Finds the closest NEXRAD station identifier."""
+STATION_CSV = "station_list/nexrad_sites.csv"
+DEFAULT_STATION = "KDVN"  # Davenport, IA; used when the station list is missing
+EARTH_RADIUS_KM = 6371.0088
+
+
+class NexradStationIndex:
+    """
+    In-memory NEXRAD site table for vectorized nearest-station lookups.
+
+    Coordinates are held in radians so each query is a single haversine
+    broadcast of the reports against every site.
+    """
+
+    def __init__(self, site_ids, lats, lons):
+        self.site_ids = np.asarray(site_ids, dtype=object)
+        self._lat = np.radians(np.asarray(lats, dtype=float))
+        self._lon = np.radians(np.asarray(lons, dtype=float))
+
+    @classmethod
+    def from_csv(cls, station_csv):
+        df = pd.read_csv(station_csv)
+        # Note: CSV column names might vary based on your PDF parser
+        lat_col = 'LATITUDE_N' if 'LATITUDE_N' in df.columns else 'lat'
+        lon_col = 'LONGITUDE_W' if 'LONGITUDE_W' in df.columns else 'lon'
+        id_col = 'ID' if 'ID' in df.columns else 'SITE'
+
+        df = df.dropna(subset=[lat_col, lon_col, id_col])
+        # Ensure we get the 4-letter ID (e.g., KDVN)
+        site_ids = df[id_col].astype(str).str.strip()
+        site_ids = site_ids.where(site_ids.str.len() != 3, "K" + site_ids)
+        return cls(site_ids.to_numpy(), df[lat_col].to_numpy(), -np.abs(df[lon_col].to_numpy()))
+
+    def query(self, lats, lons, chunk_size=16384):
+        """
+        Finds the nearest site for every (lat, lon) pair.
+
+        Returns:
+            tuple: (site_ids, distances_km) arrays aligned with the input.
+            Rows with missing coordinates get site_id None and distance NaN.
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        site_ids = np.full(lats.shape, None, dtype=object)
+        distances = np.full(lats.shape, np.nan)
+
+        valid = np.isfinite(lats) & np.isfinite(lons)
+        valid_idx = np.flatnonzero(valid)
+        # Chunk the reports so the (reports x sites) matrix stays small.
+        for start in range(0, len(valid_idx), chunk_size):
+            rows = valid_idx[start:start + chunk_size]
+            lat = np.radians(lats[rows])[:, None]
+            lon = np.radians(lons[rows])[:, None]
+            a = (np.sin((self._lat - lat) / 2) ** 2
+                 + np.cos(lat) * np.cos(self._lat) * np.sin((self._lon - lon) / 2) ** 2)
+            nearest = np.argmin(a, axis=1)
+            a_min = np.clip(a[np.arange(len(rows)), nearest], 0.0, 1.0)
+            site_ids[rows] = self.site_ids[nearest]
+            distances[rows] = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a_min))
+        return site_ids, distances
+
+
+@lru_cache(maxsize=None)
+def get_station_index(station_csv=STATION_CSV):
+    """Loads the NEXRAD station index once per process (None if the CSV is missing)."""
     if not os.path.exists(station_csv):
+        return None
+    return NexradStationIndex.from_csv(station_csv)
+
+def get_closest_nexrad_batch(lats, lons, station_csv=STATION_CSV):
+    """
+    Finds the closest NEXRAD station for arrays of coordinates.
+
+    Returns:
+        tuple: (site_ids, distances_km) numpy arrays aligned with the input.
+    """
+    index = get_station_index(station_csv)
+    if index is None:
         # Fallback to a small default list if CSV missing (or add your PDF parsing logic here)
-        return "KDVN" # Default to Davenport, IA for testing
-    
-    df = pd.read_csv(station_csv)
-    # Simple distance calculation
-    def calc_dist(row):
-        # Note: CSV column names might vary based on your PDF parser
-        site_lat = row.get('LATITUDE_N', row.get('lat', 0))
-        site_lon = row.get('LONGITUDE_W', row.get('lon', 0))
-        return geodesic((lat, lon), (site_lat, -abs(site_lon))).km
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        return np.full(lats.shape, DEFAULT_STATION, dtype=object), np.full(lats.shape, np.nan)
+    return index.query(lats, lons)
+
+def get_closest_nexrad(lat, lon, station_csv=STATION_CSV):
+    """Finds the closest NEXRAD station identifier."""
+    site_ids, _ = get_closest_nexrad_batch([lat], [lon], station_csv)
+    return site_ids[0]
+
+class LocalS3Client:
+    """
+    Directory-backed stand-in for the S3 client, for offline mirrors and tests.
+    Keys map to paths under `root`; the bucket name is ignored.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=1000):
+        prefix_dir = os.path.join(self.root, os.path.dirname(Prefix))
+        keys = []
+        if os.path.isdir(prefix_dir):
+            for dirpath, _, filenames in os.walk(prefix_dir):
+                for name in filenames:
+                    key = os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/")
+                    if key.startswith(Prefix):
+                        keys.append(key)
+        keys.sort()
+        if ContinuationToken:
+            keys = [k for k in keys if k > ContinuationToken]
+        page = keys[:MaxKeys]
+        resp = {"KeyCount": len(page), "IsTruncated": len(keys) > MaxKeys}
+        if page:
+            resp["Contents"] = [{"Key": k} for k in page]
+        if resp["IsTruncated"]:
+            resp["NextContinuationToken"] = page[-1]
+        return resp
+
+    def download_file(self, Bucket, Key, Filename):
+        shutil.copyfile(os.path.join(self.root, Key), Filename)
+
 
-    df['dist'] = df.apply(calc_dist, axis=1)
-    closest = df.sort_values('dist').iloc[0]
-    # Ensure we get the 4-letter ID (e.g., KDVN)
-    site_id = closest.get('ID', closest.get('SITE', ''))
-    if len(site_id) == 3: 
-        site_id = "K" + site_id
-    return site_id
+_listing_cache = {}
 
-# In radar_utils.py
+def list_site_day_keys(site_id, day, client=None, bucket=BUCKET_NAME):
+    """
+    Lists every scan key for one site and UTC day, following pagination.
+
+    Completed days are cached per (client, bucket, site, day); the current
+    day is always re-listed since new scans keep arriving.
+    """
+    client = client or s3
+    cache_key = (client, bucket, site_id, day)
+    if cache_key in _listing_cache:
+        return _listing_cache[cache_key]
+
+    prefix = f"{day.strftime('%Y/%m/%d')}/{site_id}/"
+    keys = []
+    kwargs = {"Bucket": bucket, "Prefix": prefix}
+    while True:
+        resp = client.list_objects_v2(**kwargs)
+        keys.extend(obj['Key'] for obj in resp.get('Contents', []))
+        if not resp.get('IsTruncated'):
+            break
+        kwargs["ContinuationToken"] = resp["NextContinuationToken"]
+
+    if day < datetime.now(timezone.utc).date():
+        _listing_cache[cache_key] = keys
+    return keys
+
+def download_with_retry(key, local_path, client=None, bucket=BUCKET_NAME, retries=3, backoff=1.0):
+    """
+    Downloads one object, retrying with exponential backoff and jitter.
+    Writes to a temporary file first so a failed transfer never leaves a partial scan.
+
+    Returns:
+        str: local_path on success, None if every attempt failed.
+    """
+    client = client or s3
+    tmp_path = f"{local_path}.part"
+    for attempt in range(retries + 1):
+        try:
+            client.download_file(bucket, key, tmp_path)
+            os.replace(tmp_path, local_path)
+            return local_path
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if attempt == retries:
+                print(f"Giving up on {key} after {retries + 1} attempts: {e}")
+                return None
+            delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"Download of {key} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
 
-def download_scans_window(site_id, event_time, window_hours=2, output_dir="radar_cache"):
+@traced()
+def download_scans_window(site_id, event_time, window_hours=2, output_dir="radar_cache",
+                          client=None, max_workers=MAX_DOWNLOAD_WORKERS):
     """Downloads all scans +/- window_hours around the event."""
+    client = client or s3
     start_time = event_time - timedelta(hours=window_hours)
     end_time = event_time + timedelta(hours=window_hours)
     
     os.makedirs(output_dir, exist_ok=True)
+    to_fetch = []
     downloaded_files = []
 
     # Iterate through days (in case window crosses midnight)
     current_day = start_time.date()
     while current_day <= end_time.date():
-        prefix = f"{current_day.strftime('%Y/%m/%d')}/{site_id}/"
         try:
-            resp = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix)
-            if 'Contents' in resp:
-                for obj in resp['Contents']:
-                    key = obj['Key']
-                    filename = key.split('/')[-1]
-
-                    # --- ADD THIS CHECK ---
-                    if filename.endswith("_MDM"):
-                        continue
-                    # ----------------------
-
-                    # Parse filename time: KDVN20250712_224026_V06
-                    try:
-                        time_part = filename.split('_')[1] # 224026
-                        date_part = filename.split('_')[0][-8:] # 20250712
-                        file_dt = datetime.strptime(f"{date_part}{time_part}", "%Y%m%d%H%M%S")
-                        
-                        if start_time <= file_dt <= end_time:
-                            local_path = os.path.join(output_dir, filename)
-                            if not os.path.exists(local_path):
-                                print(f"Downloading {filename}...")
-                                s3.download_file(BUCKET_NAME, key, local_path)
-                            downloaded_files.append(local_path)
-                    except Exception:
-                        continue
+            keys = list_site_day_keys(site_id, current_day, client=client)
         except Exception as e:
             print(f"Error listing S3 objects: {e}")
+            keys = []
+
+        for key in keys:
+            filename = key.split('/')[-1]
+
+            if filename.endswith("_MDM"):
+                continue
+
+            # Parse filename time: KDVN20250712_224026_V06
+            try:
+                time_part = filename.split('_')[1] # 224026
+                date_part = filename.split('_')[0][-8:] # 20250712
+                file_dt = datetime.strptime(f"{date_part}{time_part}", "%Y%m%d%H%M%S")
+            except Exception:
+                continue
+
+            if start_time <= file_dt <= end_time:
+                local_path = os.path.join(output_dir, filename)
+                if os.path.exists(local_path):
+                    downloaded_files.append(local_path)
+                else:
+                    to_fetch.append((key, local_path))
             
         current_day += timedelta(days=1)
+
+    # Transfers are I/O-bound, so a bounded thread pool keeps the connection saturated
+    if to_fetch:
+        print(f"Downloading {len(to_fetch)} scans for {site_id}...")
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(lambda item: download_with_retry(item[0], item[1], client=client), to_fetch)
+            downloaded_files.extend(path for path in results if path)
         
     return sorted(downloaded_files)
 
-def generate_radar_image(file_path, output_image_path):
-    """
-    Reads a NEXRAD file, generates a transparent PNG of reflectivity,
-    and returns the bounding box [West, South, East, North].
-    """
+@traced()
+def read_radar(file_path):
+    """Decodes a NEXRAD Level II file with Py-ART (None if it cannot be read)."""
     try:
-        radar = pyart.io.read_nexrad_archive(file_path)
+        return pyart.io.read_nexrad_archive(file_path)
     except Exception as e:
         print(f"Failed to read {file_path}: {e}")
         return None
 
+@traced()
+def generate_radar_image(file_path, output_image_path, engine="raster", radar=None):
+    """
+    Reads a NEXRAD file, generates a transparent PNG of reflectivity,
+    and returns the bounding box [West, South, East, North].
+
+    engine="raster" grids the lowest sweep directly with NumPy and returns the
+    exact image extent; engine="pyart" uses the original RadarMapDisplay plot.
+    An already decoded `radar` can be passed to skip reading the file again.
+    """
+    if radar is None:
+        radar = read_radar(file_path)
+        if radar is None:
+            return None
+
+    if engine == "raster":
+        _, bounds = render_reflectivity(radar, output_image_path)
+        return bounds
+    return _plot_radar_image_pyart(radar, output_image_path)
+
+@traced()
+def generate_radar_frames(file_path, output_dir, radar=None):
+    """
+    Reads a NEXRAD file (unless an already decoded `radar` is given) and writes
+    its reflectivity image pyramid as deduplicated palette PNGs under output_dir.
+
+    Returns:
+        tuple: (bounds [West, South, East, North], variants widest first),
+        or None if the file could not be read.
+    """
+    if radar is None:
+        radar = read_radar(file_path)
+        if radar is None:
+            return None
+    return render_reflectivity_pyramid(radar, output_dir)
+
+def _plot_radar_image_pyart(radar, output_image_path):
+    """Original Matplotlib/Cartopy renderer, kept for side-by-side comparison."""
+    import matplotlib
+    matplotlib.use("Agg")  # Headless backend; rendering also runs in worker processes
+    import matplotlib.pyplot as plt
+
     # Create a display
     display = pyart.graph.RadarMapDisplay(radar)
     
@@ -0,0 +1,161 @@
+import glob
+import hashlib
+import json
+import os
+
+# Adjusting import paths for modular structure
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import STATES, INCOME_CSV_PATH, STAGE_CACHE_DIR, BASE_DIR, TRACT_INDEX_CELL_DEG
+from load_data import load_all_tracts, load_all_vehicle_ownership, load_income_data, load_state_tracts, load_vehicle_ownership
+from process_data import build_static_tracts
+from tract_index import TractIndex
+from tracing import traced
+from utils import setup_logging, ensure_dir_exists, file_sha256, load_geodata, save_geodata
+
+logger = setup_logging()
+
+# Modules whose code shapes the static stage; editing any of them invalidates the cache.
+STAGE_CODE_MODULES = ["config.py", "load_data.py", "process_data.py", "stage_cache.py", "tract_index.py"]
+STATIC_STAGE_PREFIX = "static_tracts_"
+# Per-state static stages of sharded runs: state_static_tracts_<STATE>_<key>.parquet
+STATE_STATIC_STAGE_PREFIX = "state_static_tracts_"
+TRACT_INDEX_PREFIX = "tract_index_"
+
+def shapefile_components(shapefile_path: str) -> list:
+    """
+    Returns the on-disk files that make up a shapefile (.shp plus its sidecars).
+    """
+    stem, _ = os.path.splitext(shapefile_path)
+    return sorted(
+        path for path in glob.glob(f"{stem}.*")
+        if os.path.splitext(path)[1].lower() in {".shp", ".shx", ".dbf", ".prj", ".cpg"}
+    )
+
+def static_stage_inputs(states=None) -> list:
+    """
+    Lists every input file read by the static (hail-independent) stage,
+    for all states or only the given ones (the income table is always read).
+    """
+    paths = []
+    for state_abbr, state_info in STATES.items():
+        if states is not None and state_abbr not in states:
+            continue
+        paths.extend(shapefile_components(state_info["shapefile"]))
+        paths.append(state_info["vehicle_csv"])
+    paths.append(INCOME_CSV_PATH)
+    return paths
+
+@traced()
+def static_stage_key(states=None) -> str:
+    """
+    Computes the cache key from input file hashes and the stage's source code.
+    """
+    manifest = {
+        "inputs": {os.path.relpath(p, BASE_DIR): file_sha256(p) for p in static_stage_inputs(states)},
+        "code": {m: file_sha256(os.path.join(BASE_DIR, m)) for m in STAGE_CODE_MODULES},
+    }
+    payload = json.dumps(manifest, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+@traced()
+def load_static_tracts(refresh: bool = False, key: str = None):
+    """
+    Returns the merged, filtered tract frame, rebuilding it only when its
+    inputs or code have changed since the cached copy was written. Pass the
+    run's static_stage_key() as `key` to avoid hashing the inputs again.
+    """
+    key = key or static_stage_key()
+    cache_path = os.path.join(STAGE_CACHE_DIR, f"{STATIC_STAGE_PREFIX}{key}.parquet")
+
+    if os.path.exists(cache_path) and not refresh:
+        logger.info(f"Using cached static tract stage: {cache_path}")
+        return load_geodata(cache_path)
+
+    logger.info(f"Static tract stage cache miss (key {key}); rebuilding...")
+    tracts_gdf = load_all_tracts()
+    vehicles_df = load_all_vehicle_ownership()
+    income_df = load_income_data()
+    static_gdf = build_static_tracts(tracts_gdf, vehicles_df, income_df)
+
+    ensure_dir_exists(STAGE_CACHE_DIR, logger)
+    tmp_path = f"{cache_path}.tmp"
+    save_geodata(static_gdf, tmp_path, fmt="parquet")
+    os.replace(tmp_path, cache_path)
+    logger.info(f"Cached static tract stage to: {cache_path}")
+
+    prune_stale_entries(STATIC_STAGE_PREFIX, cache_path)
+    return static_gdf
+
+@traced()
+def load_state_static_tracts(state_abbr: str, refresh: bool = False):
+    """
+    The static stage for a single state, for sharded runs. Cached like
+    load_static_tracts, under a key covering only that state's inputs, so
+    a shard never reads another state's tracts.
+    """
+    key = static_stage_key([state_abbr])
+    prefix = f"{STATE_STATIC_STAGE_PREFIX}{state_abbr}_"
+    cache_path = os.path.join(STAGE_CACHE_DIR, f"{prefix}{key}.parquet")
+
+    if os.path.exists(cache_path) and not refresh:
+        logger.info(f"Using cached static tract stage for {state_abbr}: {cache_path}")
+        return load_geodata(cache_path)
+
+    logger.info(f"Static tract stage cache miss for {state_abbr} (key {key}); rebuilding...")
+    state_info = STATES[state_abbr]
+    tracts_gdf = load_state_tracts(state_abbr, state_info["shapefile"])
+    vehicles_df = load_vehicle_ownership(state_abbr, state_info["vehicle_csv"])
+    static_gdf = build_static_tracts(tracts_gdf, vehicles_df, load_income_data())
+
+    ensure_dir_exists(STAGE_CACHE_DIR, logger)
+    tmp_path = f"{cache_path}.tmp"
+    save_geodata(static_gdf, tmp_path, fmt="parquet")
+    os.replace(tmp_path, cache_path)
+
+    prune_stale_entries(prefix, cache_path)
+    return static_gdf
+
+def prune_stale_entries(prefix: str, keep_path: str):
+    """
+    Drops older cache files for a stage so the cache only holds the current one.
+    """
+    for stale in glob.glob(os.path.join(STAGE_CACHE_DIR, f"{prefix}*")):
+        if stale != keep_path:
+            os.remove(stale)
+
+def latest_tract_index_path():
+    """Path of the most recently persisted tract index, or None before the pipeline has run."""
+    paths = glob.glob(os.path.join(STAGE_CACHE_DIR, f"{TRACT_INDEX_PREFIX}*.npz"))
+    return max(paths, key=os.path.getmtime) if paths else None
+
+def tract_index_path(key: str) -> str:
+    """Where the tract index for the static stage under `key` is persisted."""
+    return os.path.join(STAGE_CACHE_DIR, f"{TRACT_INDEX_PREFIX}{key}.npz")
+
+@traced()
+def load_tract_index(static_gdf, refresh: bool = False, key: str = None) -> TractIndex:
+    """
+    Returns the persisted point-in-tract index for the static tract stage,
+    building and saving it on first use or when the stage's inputs change.
+    `key` is the static_stage_key() static_gdf was built under.
+    """
+    key = key or static_stage_key()
+    index_path = tract_index_path(key)
+
+    if os.path.exists(index_path) and not refresh:
+        logger.info(f"Using cached tract index: {index_path}")
+        return TractIndex.load(index_path)
+
+    logger.info(f"Building tract index ({len(static_gdf)} tracts, {TRACT_INDEX_CELL_DEG} deg cells)...")
+    index = TractIndex.from_geodataframe(static_gdf, TRACT_INDEX_CELL_DEG)
+
+    ensure_dir_exists(STAGE_CACHE_DIR, logger)
+    tmp_path = f"{index_path}.tmp"
+    index.save(tmp_path, key=key)
+    os.replace(tmp_path, index_path)
+    logger.info(f"Saved tract index to: {index_path}")
+
+    prune_stale_entries(TRACT_INDEX_PREFIX, index_path)
+    return index
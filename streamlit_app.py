@@ -1,13 +1,16 @@
 import streamlit as st
-import pandas as pd
 import pydeck as pdk
+import streamlit.components.v1 as components
 import os
-import json
-import time
-from dateutil import parser
 from datetime import datetime, timedelta
-from config import STATES, LAYER_OPTIONS, PROCESSED_DATA_DIR, HAIL_REPORTS_DIR
-from utils import setup_logging, load_geojson
+from config import STATES, LAYER_OPTIONS, PROCESSED_DATA_DIR, PROCESSED_FILENAME_TEMPLATE, PROCESSED_LOD_FILENAME, HAIL_REPORTS_DIR, TILES_DIR, TILES_BASE_URL
+from config import ALL_STATES_OPTION, STATE_VIEW_ZOOM, REGION_VIEW_ZOOM, LOD_TOLERANCES_DEG, DASHBOARD_PAYLOAD_BUDGET_MB, RADAR_ANIMATION_INTERVAL_MS, RADAR_ANIMATION_WINDOW_HOURS
+from map_style import ramp_expression
+from radar_animation import animation_html, radar_frame_layers
+from radar_catalog import frame_image
+from tract_lod import pick_lod_level
+from utils import setup_logging
+import dashboard_data
 
 # Setup logger
 logger = setup_logging()
@@ -15,9 +18,11 @@ logger = setup_logging()
 # --- UI Controls ---
 st.title("Hail Risk Dashboard")
 
-# Use keys from the STATES dictionary for the dropdown
-state_options = list(STATES.keys())
+# Use keys from the STATES dictionary for the dropdown, plus a combined view
+state_options = list(STATES.keys()) + [ALL_STATES_OPTION]
 selected_state = st.selectbox("Choose a state:", state_options, index=0)
+selected_states = tuple(STATES.keys()) if selected_state == ALL_STATES_OPTION else (selected_state,)
+view_zoom = REGION_VIEW_ZOOM if len(selected_states) > 1 else STATE_VIEW_ZOOM
 
 # Use keys from LAYER_OPTIONS for the layer selection
 selected_layer = st.selectbox("Select layer to visualize:", list(LAYER_OPTIONS.keys()), index=0)
@@ -29,81 +34,20 @@ days_to_look_back = st.slider("Hail History (Days):", min_value=1, max_value=7,
 st.sidebar.markdown("### Radar Overlay")
 show_radar = st.sidebar.checkbox("Show Radar Layer", value=False)
 
-radar_layer = None
-radar_time_text = ""
-
-if show_radar:
-    index_path = "radar_images/radar_index.json"
-    if os.path.exists(index_path):
-        with open(index_path, "r") as f:
-            radar_meta = json.load(f)
-        
-        if radar_meta:
-            # 1. Create a Time Slider based on available images
-            radar_meta.sort(key=lambda x: x['timestamp'])
-            
-            # Get min/max times for slider
-            min_time = parser.parse(radar_meta[0]['timestamp'])
-            max_time = parser.parse(radar_meta[-1]['timestamp'])
-            
-            # Slider
-            selected_time = st.slider(
-                "Radar Time",
-                min_value=min_time,
-                max_value=max_time,
-                value=min_time,
-                format="HH:mm"
-            )
-            
-            # 2. Find the image closest to selected time
-            closest_img = min(radar_meta, key=lambda x: abs(parser.parse(x['timestamp']) - selected_time))
-            
-            radar_time_text = f"Radar: {closest_img['radar']} @ {parser.parse(closest_img['timestamp']).strftime('%H:%M')}"
-            st.caption(radar_time_text)
-
-            # 3. Create BitmapLayer
-            radar_layer = pdk.Layer(
-                "BitmapLayer",
-                data=None, # BitmapLayer doesn't use 'data' list like GeoJsonLayer
-                image=closest_img['image_path'],
-                bounds=closest_img['bounds'], # [West, South, East, North]
-                opacity=0.6,
-                desaturate=0,
-                transparent_color=[0, 0, 0, 0] 
-            )
-        else:
-            st.warning("Radar index is empty.")
-    else:
-        st.warning("No generated radar images found. Run 'generate_radar.py' first.")
-
 
 # ==========================================
 # 1. LOAD DATA (Moved UP before Map Rendering)
 # ==========================================
 
 # --- Load Hail Data (Multi-Day) ---
-hail_dfs = []
 today = datetime.today()
+hail_dates = tuple((today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days_to_look_back))
+hail_paths = tuple(os.path.join(HAIL_REPORTS_DIR, f"{date_str}.csv") for date_str in hail_dates)
+hail_df = dashboard_data.load_hail_reports(hail_paths, hail_dates)
 
-for i in range(days_to_look_back):
-    target_date = today - timedelta(days=i)
-    date_str = target_date.strftime("%Y-%m-%d")
-    file_path = os.path.join(HAIL_REPORTS_DIR, f"{date_str}.csv")
-    
-    if os.path.exists(file_path):
-        try:
-            daily_df = pd.read_csv(file_path)
-            daily_df["Date"] = date_str
-            hail_dfs.append(daily_df)
-        except Exception as e:
-            logger.error(f"Error reading hail data for {date_str}: {e}")
-
-if hail_dfs:
-    hail_df = pd.concat(hail_dfs, ignore_index=True)
-    hail_df["Size_Inch"] = hail_df["Size"] / 100
+if not hail_df.empty:
     logger.info(f"Loaded {len(hail_df)} hail reports from the last {days_to_look_back} days.")
 else:
-    hail_df = pd.DataFrame()
     logger.warning(f"No hail reports found for the last {days_to_look_back} days.")
 
 # --- Hail Data Table ---
@@ -111,24 +55,55 @@ if not hail_df.empty:
     with st.expander(f"View Raw Hail Reports ({len(hail_df)} records)", expanded=False):
         display_cols = ["Date", "Time", "Location", "State", "Size_Inch", "Comments"]
         cols_to_show = [c for c in display_cols if c in hail_df.columns]
-        hail_df = hail_df.sort_values(by=["Date", "Time"], ascending=[False, False])
         st.dataframe(hail_df[cols_to_show], hide_index=True, width="stretch")
 else:
     st.info("No hail reports available for the selected date range.")
 
-# --- Load GeoJSON Data ---
-geojson_filename = f"gdf_{selected_state}_with_hail_risk.geojson"
-geojson_path = os.path.join(PROCESSED_DATA_DIR, geojson_filename)
+# --- Load Processed Tract Data ---
+# A vector tile pyramid is preferred: the browser then only fetches the visible
+# tiles at the current zoom instead of the whole state's GeoJSON. Tiles are
+# fetched by the viewer's browser, so they are only used when TILES_BASE_URL
+# names a host every viewer can reach.
+tiles_meta_paths = {state: os.path.join(TILES_DIR, state, "metadata.json") for state in selected_states}
+use_tiles = bool(TILES_BASE_URL) and all(os.path.exists(p) for p in tiles_meta_paths.values())
+
+# Without tiles, the all-states level-of-detail file serves every view from one
+# cached frame; per-state GeoParquet (or GeoJSON exports) are the fallback.
+lod_path = os.path.join(PROCESSED_DATA_DIR, PROCESSED_LOD_FILENAME)
+use_lod = not use_tiles and os.path.exists(lod_path)
+candidate_paths = [
+    os.path.join(PROCESSED_DATA_DIR, PROCESSED_FILENAME_TEMPLATE.format(state=selected_state, ext=ext))
+    for ext in (".parquet", ".geojson")
+]
+tracts_path = next((p for p in candidate_paths if os.path.exists(p)), candidate_paths[0])
 
 data = None # Initialize variable
-if not os.path.exists(geojson_path):
-    st.warning(f"Processed data for {selected_state} not found at {geojson_path}.")
+if not use_tiles and not use_lod and (len(selected_states) > 1 or not os.path.exists(tracts_path)):
+    missing_path = lod_path if len(selected_states) > 1 else tracts_path
+    st.warning(f"Processed data for {selected_state} not found at {missing_path}.")
     st.warning("Please run the data pipeline first by executing 'python pipeline/main.py' in your terminal.")
     st.stop()
 
 try:
-    gdf = load_geojson(geojson_path, logger)
-    data = json.loads(gdf.to_json())
+    if use_tiles:
+        tiles_meta = {state: dashboard_data.load_tile_metadata(p) for state, p in tiles_meta_paths.items()}
+        # The version query changes whenever the pipeline rewrites a pyramid
+        data = {
+            state: f"{TILES_BASE_URL.rstrip('/')}/{state}/{{z}}/{{x}}/{{y}}.pbf?v={dashboard_data.file_signature(p)[0]}"
+            for state, p in tiles_meta_paths.items()
+        }
+    elif use_lod:
+        lod_gdf = dashboard_data.load_lod_tracts(lod_path)
+        lod_level, payload_bytes = pick_lod_level(
+            lod_gdf[lod_gdf["state_abbr"].isin(selected_states)], LOD_TOLERANCES_DEG,
+            view_zoom, DASHBOARD_PAYLOAD_BUDGET_MB * 1024 * 1024,
+        )
+        st.caption(f"Tract geometry: level {lod_level} ({LOD_TOLERANCES_DEG[lod_level]:g}°), ~{payload_bytes / 1024 / 1024:.1f} MB")
+        data = lod_path
+    else:
+        # Parsed once per file version; reruns reuse the cached FeatureCollection
+        gdf, tracts_geojson = dashboard_data.load_tracts(tracts_path)
+        data = tracts_geojson
 except Exception as e:
     st.error(f"An error occurred while loading the data for {selected_state}: {e}")
     st.stop()
@@ -140,45 +115,34 @@ except Exception as e:
 layers_to_render = []
 
 # --- A. Census Tracts Layer (Polygon) ---
-if data:
-    # Transform Data (Colors)
-    field_to_visualize = LAYER_OPTIONS[selected_layer]
-
-    def get_color(value, layer):
-        color = [200, 200, 200, 100]
-        if pd.isna(value): return color
-
-        if layer == "car_ownership_density":
-            intensity = min(1, value / 150)
-            red = int(255 * intensity)
-            green = int(255 * (1 - intensity))
-            color = [red, green, 0, 150]
-        elif layer == "population_density":
-            intensity = min(1, value / 1000)
-            blue = int(100 + 155 * intensity)
-            color = [0, 0, blue, 150]
-        elif layer in ["median_income", "per_capita_income"]:
-            cap = 100000 if layer == "median_income" else 75000
-            intensity = min(1, value / cap)
-            purple = int(100 + 155 * intensity)
-            color = [purple, 0, purple, 150]
-        elif layer == "hail_risk_score":
-            intensity = min(1, value / 500)
-            red = 255
-            green = int(255 * (1 - intensity))
-            color = [red, green, 0, 160]
-        return color
-
-    for feature in data["features"]:
-        props = feature["properties"]
-        value = props.get(field_to_visualize)
-        props["fill_color"] = get_color(value, field_to_visualize)
-        
-        if value is None:
-            formatted_value = "N/A"
-        else:
-            formatted_value = f"{value:,.2f}"
-        props["tooltip_text"] = f"{selected_layer}: {formatted_value}"
+field_to_visualize = LAYER_OPTIONS[selected_layer]
+if data and use_tiles:
+    # Tiles carry the raw layer values; the colour ramp is evaluated in the browser.
+    # The combined view stacks one layer per state pyramid.
+    for state, tiles_url in data.items():
+        polygon_layer = pdk.Layer(
+            "MVTLayer",
+            id=f"tracts-{state}",
+            data=tiles_url,
+            min_zoom=tiles_meta[state]["minzoom"],
+            max_zoom=tiles_meta[state]["maxzoom"],
+            binary=False,
+            unique_id_property="'GEOID'",  # quoted: pydeck treats bare strings as expressions
+            get_fill_color=ramp_expression(field_to_visualize),
+            pickable=True,
+            auto_highlight=True,
+            stroked=True,
+            get_line_color=[0, 0, 0, 50],
+            line_width_min_pixels=1,
+        )
+        layers_to_render.append(polygon_layer)
+    tract_tooltip = f"{selected_layer}: {{{field_to_visualize}}}<br>Tract {{GEOID}}"
+elif data:
+    # Colour ramps are applied to the whole column at once and cached per (view, layer)
+    if use_lod:
+        data = dashboard_data.load_styled_region(lod_path, selected_states, lod_level, field_to_visualize, selected_layer)
+    else:
+        data = dashboard_data.load_styled_tracts(tracts_path, field_to_visualize, selected_layer)
 
     polygon_layer = pdk.Layer(
         "GeoJsonLayer",
@@ -191,6 +155,7 @@ if data:
         line_width_min_pixels=1,
     )
     layers_to_render.append(polygon_layer)
+    tract_tooltip = "{tooltip_text}"
 
 # --- B. Hail Layer (Scatterplot) ---
 if not hail_df.empty:
@@ -210,32 +175,26 @@ if not hail_df.empty:
     )
     layers_to_render.append(hail_layer)
 
-# --- C. Radar Layer (Bitmap) ---
-if radar_layer:
-    layers_to_render.append(radar_layer)
-
-# ... (Keep all your data loading and Polygon/Hail layer definitions exactly as they are) ...
-
 # ==========================================
 # 3. RADAR & ANIMATION LOGIC
 # ==========================================
-radar_layer = None
+radar_catalog = None
 radar_meta = []
 
-# Load Radar Metadata if checked
+# Load the radar frame catalog if checked. The SQLite index is preferred; the
+# JSON export is still accepted for deployments that only ship that file.
 if show_radar:
-    index_path = "radar_images/radar_index.json"
-    if os.path.exists(index_path):
-        with open(index_path, "r") as f:
-            radar_meta = json.load(f)
-            # Ensure sorted by time
-            radar_meta.sort(key=lambda x: x['timestamp'])
+    radar_db_path = "radar_images/radar_index.sqlite"
+    radar_json_path = "radar_images/radar_index.json"
+    if os.path.exists(radar_db_path):
+        radar_catalog = dashboard_data.load_radar_catalog((radar_db_path, f"{radar_db_path}-wal"))
+    elif os.path.exists(radar_json_path):
+        radar_catalog = dashboard_data.load_radar_catalog((radar_json_path,))
 
 # --- Sidebar Controls ---
-if show_radar and radar_meta:
+if show_radar and radar_catalog:
     # 1. Slider for Static View
-    min_time = parser.parse(radar_meta[0]['timestamp'])
-    max_time = parser.parse(radar_meta[-1]['timestamp'])
+    min_time, max_time = radar_catalog.time_range()
     
     selected_time = st.sidebar.slider(
         "Radar Time",
@@ -245,97 +204,89 @@ if show_radar and radar_meta:
         format="MM/DD HH:mm"
     )
 
-    # 2. Play Button
-    start_animation = st.sidebar.button("▶️ Play Animation")
+    # 2. Browser-side loop: every frame is sent once and played without reruns
+    start_animation = st.sidebar.checkbox("▶️ Animate Radar Loop", value=False)
     
     # Logic for Static Layer (linked to slider)
     if not start_animation:
-        # Find closest image to slider
-        closest_img = min(radar_meta, key=lambda x: abs(parser.parse(x['timestamp']) - selected_time))
-        st.sidebar.caption(f"Showing: {closest_img['radar']} @ {parser.parse(closest_img['timestamp']).strftime('%H:%M')}")
+        # Binary search for the frame closest to the slider
+        closest_img = radar_catalog.nearest(selected_time)
+        st.sidebar.caption(f"Showing: {closest_img['radar']} @ {closest_img['time'].strftime('%H:%M')}")
         
         radar_layer = pdk.Layer(
             "BitmapLayer",
-            image=closest_img['image_path'],
+            image=frame_image(closest_img, view_zoom),  # smallest variant sharp at this zoom
             bounds=closest_img['bounds'],
             opacity=0.6,
             desaturate=0,
             transparent_color=[0, 0, 0, 0]
         )
         layers_to_render.append(radar_layer)
+    else:
+        # The loop covers a window starting at the slider's time
+        animation_hours = st.sidebar.slider("Loop Length (Hours)", min_value=1, max_value=24, value=RADAR_ANIMATION_WINDOW_HOURS)
+        radar_meta = radar_catalog.between(selected_time, selected_time + timedelta(hours=animation_hours))
 elif show_radar:
     st.sidebar.warning("No radar index found. Run 'generate_radar.py'.")
 
+# --- Data Cache Stats ---
+with st.sidebar.expander("Data cache", expanded=False):
+    cache_stats = dashboard_data.cache.stats()
+    st.caption(
+        f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%} hit rate), "
+        f"{cache_stats['entries']}/{cache_stats['max_entries']} entries, "
+        f"{cache_stats['evictions']} evictions"
+    )
+    image_stats = dashboard_data.image_cache.stats()
+    st.caption(f"Radar frames: {image_stats['entries']} loops, {image_stats['bytes'] / 1e6:.1f} MB")
+
 # ==========================================
 # 4. RENDER MAP
 # ==========================================
-lat, lon = STATES[selected_state]["center"]
-view_state = pdk.ViewState(latitude=lat, longitude=lon, zoom=6, pitch=30)
+lat = sum(STATES[s]["center"][0] for s in selected_states) / len(selected_states)
+lon = sum(STATES[s]["center"][1] for s in selected_states) / len(selected_states)
+view_state = pdk.ViewState(latitude=lat, longitude=lon, zoom=view_zoom, pitch=30)
 
 # Create a placeholder. This allows us to overwrite the map during animation.
 map_placeholder = st.empty()
 
-# --- Animation Loop ---
-if show_radar and 'start_animation' in locals() and start_animation:
-    # We loop through EVERY frame in the metadata
-    progress_bar = st.sidebar.progress(0)
-    status_text = st.sidebar.empty()
-    
-    for i, frame in enumerate(radar_meta):
-        # Update Status
-        frame_time = parser.parse(frame['timestamp'])
-        status_text.text(f"Playing: {frame_time.strftime('%H:%M')}")
-        progress_bar.progress((i + 1) / len(radar_meta))
-        
-        # 1. Create Dynamic Radar Layer for this frame
-        anim_radar_layer = pdk.Layer(
-            "BitmapLayer",
-            image=frame['image_path'],
-            bounds=frame['bounds'],
-            opacity=0.6,
-            desaturate=0,
-            transparent_color=[0, 0, 0, 0]
-        )
-        
-        # 2. Combine with Base Layers (Polygon/Hail)
-        # Note: We must exclude any static radar layer if it exists
-        current_layers = [l for l in layers_to_render if not isinstance(l, pdk.Layer) or l.type != "BitmapLayer"]
-        current_layers.append(anim_radar_layer)
-        
-        # 3. Build Deck
-        r = pdk.Deck(
-            layers=current_layers,
-            initial_view_state=view_state,
-            tooltip={"html": "{tooltip_text}"} # Simplified tooltip during animation for performance
-        )
-        
-        # 4. Update the Placeholder
-        map_placeholder.pydeck_chart(r, width='stretch')
-        
-        # 5. Control Speed (0.2s = 5 frames per second)
-        time.sleep(0.2)
-    
-    status_text.text("Finished!")
-    # Optional: Rerun to snap back to slider state
-    # st.rerun() 
+map_tooltip = {
+    "html": """
+        <div style="font-family: sans-serif; font-size: 12px; color: white;">
+            <b>{Location}</b><br>
+            Date: {Date}<br>  Time: {Time}<br>
+            Size: {Size_Inch} in.<br>
+            <i>{Comments}</i>
+            
+            """ + tract_tooltip + """
+        </div>
+    """,
+    "style": {"backgroundColor": "#333", "color": "white"}
+}
+
+# --- Animation (Client-Side) ---
+if radar_meta:
+    # Base layers and all radar frames go to the browser in one page; the
+    # page steps through the frames itself, so playback needs no reruns.
+    frame_images = dashboard_data.load_radar_frame_images(tuple(frame_image(frame, view_zoom) for frame in radar_meta))
+    frames = [(frame, image) for frame, image in zip(radar_meta, frame_images) if image is not None]
+    frame_labels = [f"{frame['radar']} @ {frame['time'].strftime('%m/%d %H:%M')}" for frame, _ in frames]
+    st.sidebar.caption(f"{len(frames)} frames loaded")
+
+    r = pdk.Deck(
+        layers=layers_to_render + radar_frame_layers([f for f, _ in frames], [image for _, image in frames]),
+        initial_view_state=view_state,
+        tooltip=map_tooltip
+    )
+    with map_placeholder:
+        components.html(animation_html(r, frame_labels, RADAR_ANIMATION_INTERVAL_MS), height=500)
 
 # --- Static Render (Default) ---
 else:
     r = pdk.Deck(
         layers=layers_to_render,
         initial_view_state=view_state,
-        tooltip={
-            "html": """
-                <div style="font-family: sans-serif; font-size: 12px; color: white;">
-                    <b>{Location}</b><br>
-                    Date: {Date}<br>  Time: {Time}<br>
-                    Size: {Size_Inch} in.<br>
-                    <i>{Comments}</i>
-                    
-                    {tooltip_text}
-                </div>
-            """,
-            "style": {"backgroundColor": "#333", "color": "white"}
-        }
+        tooltip=map_tooltip
     )
     map_placeholder.pydeck_chart(r, width='stretch')
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live at the repository root rather than in a package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
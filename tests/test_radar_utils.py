@@ -0,0 +1,91 @@
+import os
+from datetime import date, datetime, timezone
+
+import radar_utils
+from radar_utils import LocalS3Client, download_with_retry, list_site_day_keys
+
+
+class CountingClient(LocalS3Client):
+    """LocalS3Client that records each listing request."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.list_calls = 0
+
+    def list_objects_v2(self, **kwargs):
+        self.list_calls += 1
+        return super().list_objects_v2(**kwargs)
+
+
+class FlakyClient(LocalS3Client):
+    """LocalS3Client whose first `failures` downloads write a partial file and then fail."""
+
+    def __init__(self, root, failures):
+        super().__init__(root)
+        self.failures = failures
+        self.attempts = 0
+
+    def download_file(self, Bucket, Key, Filename):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            with open(Filename, "wb") as f:
+                f.write(b"partial")
+            raise ConnectionError("connection reset")
+        super().download_file(Bucket, Key, Filename)
+
+
+def write_scans(root, day, site, count):
+    site_dir = os.path.join(root, day.strftime("%Y/%m/%d"), site)
+    os.makedirs(site_dir, exist_ok=True)
+    keys = []
+    for i in range(count):
+        name = f"{site}{day:%Y%m%d}_{i // 60:02d}{i % 60:02d}00_V06"
+        open(os.path.join(site_dir, name), "w").close()
+        keys.append(f"{day:%Y/%m/%d}/{site}/{name}")
+    return keys
+
+
+def test_list_site_day_keys_follows_pagination(tmp_path):
+    day = date(2024, 5, 1)
+    keys = write_scans(tmp_path, day, "KDVN", 2500)
+    write_scans(tmp_path, day, "KOAX", 3)
+    client = CountingClient(str(tmp_path))
+
+    assert list_site_day_keys("KDVN", day, client=client) == keys
+    assert client.list_calls == 3  # MaxKeys is 1000 per page
+
+
+def test_completed_days_are_cached_and_today_is_relisted(tmp_path):
+    past = date(2024, 5, 1)
+    today = datetime.now(timezone.utc).date()
+    write_scans(tmp_path, past, "KDVN", 5)
+    write_scans(tmp_path, today, "KDVN", 2)
+    client = CountingClient(str(tmp_path))
+
+    assert len(list_site_day_keys("KDVN", past, client=client)) == 5
+    assert len(list_site_day_keys("KDVN", past, client=client)) == 5
+    assert client.list_calls == 1
+
+    assert len(list_site_day_keys("KDVN", today, client=client)) == 2
+    write_scans(tmp_path, today, "KDVN", 3)
+    assert len(list_site_day_keys("KDVN", today, client=client)) == 3
+    assert client.list_calls == 3
+
+
+def test_download_with_retry_retries_and_leaves_no_partial_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(radar_utils.time, "sleep", lambda seconds: None)
+    key = write_scans(tmp_path / "bucket", date(2024, 5, 1), "KDVN", 1)[0]
+    local_path = str(tmp_path / "scan")
+
+    client = FlakyClient(str(tmp_path / "bucket"), failures=2)
+    assert download_with_retry(key, local_path, client=client, retries=3) == local_path
+    assert client.attempts == 3
+    assert os.path.exists(local_path)
+    assert not os.path.exists(f"{local_path}.part")
+
+    os.remove(local_path)
+    client = FlakyClient(str(tmp_path / "bucket"), failures=10)
+    assert download_with_retry(key, local_path, client=client, retries=2) is None
+    assert client.attempts == 3
+    assert not os.path.exists(local_path)
+    assert not os.path.exists(f"{local_path}.part")
@@ -0,0 +1,61 @@
+import functools
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from config import TILES_DIR, TILE_SERVER_PORT
+from utils import setup_logging
+
+logger = setup_logging()
+
+class TileRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Static file handler for a tile directory. Adds CORS (the map runs on the
+    dashboard's origin) and answers missing tiles with 204, since tiles with no
+    tracts in them are never written.
+    """
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, ".pbf": "application/x-protobuf"}
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if path.endswith(".pbf") and not os.path.exists(path):
+            self.send_response(204)
+            self.end_headers()
+            return
+        super().do_GET()
+
+    def end_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        # Tile URLs carry a version query that changes whenever the pyramid is rebuilt
+        self.send_header("Cache-Control", "public, max-age=86400")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_lock = threading.Lock()
+
+def ensure_tile_server(directory=TILES_DIR, port=TILE_SERVER_PORT) -> str:
+    """
+    Starts a background tile server for `directory` once per process and
+    returns its base URL. If the port is already taken (e.g. by a second
+    dashboard process), that server is assumed to serve the same tiles.
+    """
+    global _server
+    with _lock:
+        if _server is None:
+            handler = functools.partial(TileRequestHandler, directory=directory)
+            try:
+                _server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+            except OSError as e:
+                logger.warning(f"Tile server port {port} unavailable ({e}); reusing the existing server.")
+                return f"http://localhost:{port}"
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            logger.info(f"Serving vector tiles from {directory} on port {port}")
+    return f"http://localhost:{port}"
+
+if __name__ == "__main__":
+    ensure_tile_server()
+    print(f"Serving {TILES_DIR} at http://localhost:{TILE_SERVER_PORT} (Ctrl+C to stop)")
+    threading.Event().wait()
@@ -0,0 +1,224 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from config import TRACE_DIR
+
+# Set to the events file while tracing is on; worker processes inherit it through the environment
+TRACE_ENV_VAR = "HAIL_MAP_TRACE_EVENTS"
+
+_events_path = os.environ.get(TRACE_ENV_VAR) or None
+_local = threading.local()
+_write_lock = threading.Lock()
+
+def _status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def _rss_mb():
+    return _status_mb("VmRSS:") if os.path.exists("/proc/self/status") else _peak_rss_mb()
+
+def _peak_rss_mb():
+    if os.path.exists("/proc/self/status"):
+        return _status_mb("VmHWM:")
+    # Unix-only, so imported here: the pipeline imports this module on every platform
+    try:
+        import resource
+    except ImportError:
+        return 0.0  # e.g. Windows: memory columns read 0
+    # ru_maxrss is reported in KiB on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 ** 2)
+
+def _reset_peak_rss():
+    """Resets the kernel's RSS high-water mark (Linux); elsewhere peaks are process-lifetime."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _row_count(obj):
+    shape = getattr(obj, "shape", None)
+    return int(shape[0]) if shape else None
+
+def enable(events_path):
+    """Starts appending finished spans to a JSON-lines file, in this process and its workers."""
+    global _events_path
+    os.makedirs(os.path.dirname(os.path.abspath(events_path)), exist_ok=True)
+    _events_path = events_path
+    os.environ[TRACE_ENV_VAR] = events_path
+
+def disable():
+    global _events_path
+    _events_path = None
+    os.environ.pop(TRACE_ENV_VAR, None)
+
+def is_enabled() -> bool:
+    return _events_path is not None
+
+class Span:
+    """
+    One timed stage. Records wall and CPU time, RSS at entry and the peak
+    RSS reached inside it, plus any attributes set on it (e.g. row counts).
+
+    The kernel's high-water mark is reset on entry so the peak belongs to
+    this stage; an enclosing span folds the peak it had reached so far and
+    its children's peaks into its own, so nesting stays correct. Spans
+    running concurrently in threads of one process share the mark.
+    """
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault("stack", [])
+        hwm = _peak_rss_mb()
+        for open_span in stack:
+            open_span.peak_mb = max(open_span.peak_mb, hwm)
+        self.parent = stack[-1].name if stack else None
+        self.rss_start_mb = _rss_mb()
+        self.peak_mb = self.rss_start_mb if _reset_peak_rss() else hwm
+        stack.append(self)
+        self.ts_us = time.time_ns() // 1000
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_s = time.perf_counter() - self.wall_start
+        cpu_s = time.process_time() - self.cpu_start
+        self.peak_mb = max(self.peak_mb, _peak_rss_mb())
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].peak_mb = max(stack[-1].peak_mb, self.peak_mb)
+
+        event = {
+            "name": self.name,
+            "parent": self.parent,
+            "ts_us": self.ts_us,
+            "wall_s": round(wall_s, 6),
+            "cpu_s": round(cpu_s, 6),
+            "rss_start_mb": round(self.rss_start_mb, 1),
+            "peak_rss_mb": round(self.peak_mb, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+            **self.attrs,
+        }
+        if exc_type is not None:
+            event["error"] = exc_type.__name__
+        path = _events_path
+        if path is not None:
+            # One short append per event, so lines from worker processes do not interleave
+            with _write_lock, open(path, "a") as f:
+                f.write(json.dumps(event, default=str) + "\n")
+        return False
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+def span(name, **attrs):
+    """Context manager timing a block as a named stage; a shared no-op while tracing is off."""
+    if _events_path is None:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+def traced(name=None):
+    """
+    Decorator recording each call as a span named module.function. Row
+    counts of the first argument and of the result are added when they are
+    frames or arrays. While tracing is off the only cost is one check.
+    """
+    def decorate(func):
+        label = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _events_path is None:
+                return func(*args, **kwargs)
+            with Span(label, {}) as s:
+                rows_in = _row_count(args[0]) if args else None
+                if rows_in is not None:
+                    s.set(rows_in=rows_in)
+                result = func(*args, **kwargs)
+                rows = _row_count(result)
+                if rows is not None:
+                    s.set(rows=rows)
+                return result
+        return wrapper
+    return decorate
+
+def read_events(events_path):
+    with open(events_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def write_chrome_trace(events_path, trace_path):
+    """
+    Converts a span events file to Chrome trace format (open it in
+    chrome://tracing or https://ui.perfetto.dev). Returns the span count.
+    """
+    trace_events = []
+    for event in read_events(events_path):
+        args = {k: v for k, v in event.items() if k not in ("name", "ts_us", "wall_s", "pid", "tid")}
+        trace_events.append({
+            "name": event["name"],
+            "cat": event["name"].split(".")[0],
+            "ph": "X",
+            "ts": event["ts_us"],
+            "dur": int(event["wall_s"] * 1e6),
+            "pid": event["pid"],
+            "tid": event["tid"],
+            "args": args,
+        })
+    with open(trace_path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+    return len(trace_events)
+
+def start_profile(run_name, trace_dir=TRACE_DIR):
+    """Enables tracing into a new timestamped events file under trace_dir and returns its path."""
+    events_path = os.path.join(trace_dir, f"{run_name}-{datetime.now():%Y%m%d-%H%M%S}.jsonl")
+    enable(events_path)
+    return events_path
+
+def finish_profile(events_path):
+    """
+    Disables tracing and writes the Chrome trace next to the events file.
+
+    Returns:
+        tuple: (Chrome trace path, list of span events)
+    """
+    disable()
+    if not os.path.exists(events_path):
+        return None, []
+    trace_path = os.path.splitext(events_path)[0] + ".trace.json"
+    write_chrome_trace(events_path, trace_path)
+    return trace_path, read_events(events_path)
+
+def summarize(events, limit=15):
+    """Table lines of the slowest spans: wall time, CPU time, peak RSS and rows."""
+    lines = [f"{'stage':<50}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{'rows':>11}"]
+    for e in sorted(events, key=lambda e: e["wall_s"], reverse=True)[:limit]:
+        rows = e.get("rows", "")
+        lines.append(f"{e['name']:<50}{e['wall_s']:>9.3f}{e['cpu_s']:>9.3f}{e['peak_rss_mb']:>9.1f}{rows:>11}")
+    return lines
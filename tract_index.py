@@ -0,0 +1,133 @@
+import hashlib
+import json
+
+import numpy as np
+import shapely
+
+# Cell value meanings in the lookup grid (values >= 0 are tract positions)
+EMPTY_CELL = -1     # no tract touches the cell
+BOUNDARY_CELL = -2  # several tracts (or a tract edge) cross the cell; test exactly
+
+class TractIndex:
+    """
+    Point-in-tract lookup built once from tract polygons.
+
+    A regular lon/lat grid records, for every cell, either the single tract
+    whose interior contains the whole cell, "no tract", or "boundary". Points
+    in interior cells are assigned by array indexing alone; only points in
+    boundary cells are tested against prepared polygons. Like a
+    `predicate="within"` spatial join, points exactly on a tract edge are not
+    assigned.
+    """
+
+    def __init__(self, geoids, geometries, cells, origin, cell_size):
+        self.geoids = np.asarray(geoids, dtype=object)
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.cells = np.asarray(cells, dtype=np.int32)
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.cell_size = float(cell_size)
+        self._fingerprint = None
+        shapely.prepare(self.geometries)
+        self._tree = shapely.STRtree(self.geometries)
+
+    @classmethod
+    def build(cls, geoids, geometries, cell_size):
+        """Classifies every grid cell over the tracts' extent."""
+        geometries = np.asarray(geometries, dtype=object)
+        xmin, ymin, xmax, ymax = shapely.total_bounds(geometries)
+        nx = max(1, int(np.ceil((xmax - xmin) / cell_size)))
+        ny = max(1, int(np.ceil((ymax - ymin) / cell_size)))
+
+        iy, ix = np.divmod(np.arange(nx * ny), nx)
+        boxes = shapely.box(xmin + ix * cell_size, ymin + iy * cell_size,
+                            xmin + (ix + 1) * cell_size, ymin + (iy + 1) * cell_size)
+        box_tree = shapely.STRtree(boxes)
+
+        cells = np.full(nx * ny, EMPTY_CELL, dtype=np.int32)
+        _, touched = box_tree.query(geometries, predicate="intersects")
+        cells[touched] = BOUNDARY_CELL
+        # Tracts are the (prepared) query geometries, so this is tract.contains_properly(box)
+        tract_pos, inside = box_tree.query(geometries, predicate="contains_properly")
+        cells[inside] = tract_pos
+        return cls(geoids, geometries, cells.reshape(ny, nx), (xmin, ymin), cell_size)
+
+    @classmethod
+    def from_geodataframe(cls, gdf, cell_size, geoid_col="GEOID"):
+        return cls.build(gdf[geoid_col].to_numpy(), gdf.geometry.values, cell_size)
+
+    def locate(self, lons, lats):
+        """
+        Returns the tract position for every point (-1 when outside all tracts).
+        """
+        x = np.asarray(lons, dtype=np.float64)
+        y = np.asarray(lats, dtype=np.float64)
+        ny, nx = self.cells.shape
+        col = np.floor((x - self.origin[0]) / self.cell_size)
+        row = np.floor((y - self.origin[1]) / self.cell_size)
+        in_grid = (col >= 0) & (col < nx) & (row >= 0) & (row < ny)  # also drops NaN
+
+        result = np.full(x.shape, EMPTY_CELL, dtype=np.int64)
+        result[in_grid] = self.cells[row[in_grid].astype(np.int64), col[in_grid].astype(np.int64)]
+
+        boundary = np.flatnonzero(result == BOUNDARY_CELL)
+        result[boundary] = EMPTY_CELL
+        if len(boundary):
+            # Bounding-box candidates, then one vectorized exact test per pair
+            pts = shapely.points(x[boundary], y[boundary])
+            pt_idx, tract_idx = self._tree.query(pts)
+            hit = shapely.contains_xy(self.geometries[tract_idx], x[boundary][pt_idx], y[boundary][pt_idx])
+            result[boundary[pt_idx[hit]]] = tract_idx[hit]
+        return result
+
+    def assign_points_to_tracts(self, lons, lats):
+        """
+        Returns the GEOID of the tract containing each point (None when outside).
+        """
+        pos = self.locate(lons, lats)
+        geoids = np.full(pos.shape, None, dtype=object)
+        found = pos >= 0
+        geoids[found] = self.geoids[pos[found]]
+        return geoids
+
+    def fingerprint(self):
+        """
+        Short hash of the tract GEOIDs (in index order) and their polygons, so
+        caches derived from tract positions can tell when the tracts change.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            digest.update("\n".join(map(str, self.geoids)).encode("utf-8"))
+            for wkb in shapely.to_wkb(self.geometries):
+                digest.update(wkb)
+            self._fingerprint = digest.hexdigest()[:16]
+        return self._fingerprint
+
+    def save(self, path, key=""):
+        """Persists the index (grid, GEOIDs and WKB polygons) to a .npz file."""
+        wkb = shapely.to_wkb(self.geometries)
+        lengths = np.fromiter((len(b) for b in wkb), dtype=np.int64, count=len(wkb))
+        meta = {"origin": self.origin, "cell_size": self.cell_size, "key": key}
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                cells=self.cells,
+                geoids=np.asarray(self.geoids, dtype=str),
+                wkb=np.frombuffer(b"".join(wkb), dtype=np.uint8),
+                wkb_offsets=np.concatenate([[0], np.cumsum(lengths)]),
+                meta=np.array(json.dumps(meta)),
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            buf = data["wkb"].tobytes()
+            offsets = data["wkb_offsets"]
+            wkb = [buf[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+            return cls(
+                data["geoids"].astype(object),
+                shapely.from_wkb(wkb),
+                data["cells"],
+                meta["origin"],
+                meta["cell_size"],
+            )
@@ -0,0 +1,63 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+# Map tiles are 512 px wide in deck.gl
+TILE_SIZE_PX = 512
+# Feature wrapper plus the colour/tooltip properties the dashboard adds
+FEATURE_OVERHEAD_BYTES = 100
+
+def lod_geometry_column(level: int) -> str:
+    """Geometry column of a detail level; level 0 is the full-resolution geometry."""
+    return "geometry" if level == 0 else f"geometry_lod{level}"
+
+def lod_bytes_column(level: int) -> str:
+    return f"geojson_bytes_lod{level}"
+
+def build_lod_frame(gdf, tolerances, property_columns):
+    """
+    Adds a simplified copy of the geometry for every tolerance (degrees) after
+    the first, plus each feature's GeoJSON size at every level, so a viewer
+    can pick a level for any subset of tracts without serializing anything.
+
+    Simplification preserves topology, so small tracts never disappear at
+    the coarse levels.
+    """
+    lod = gdf[[c for c in property_columns if c in gdf.columns] + [gdf.geometry.name]].copy()
+    if gdf.geometry.name != "geometry":
+        lod = lod.rename_geometry("geometry")
+
+    # Property JSON is the same at every level
+    props = lod.drop(columns="geometry").to_json(orient="records", lines=True).splitlines()
+    props_bytes = np.fromiter((len(p) for p in props), dtype=np.int64, count=len(props)) + FEATURE_OVERHEAD_BYTES
+
+    geoms = np.asarray(lod.geometry.array, dtype=object)
+    for level, tolerance in enumerate(tolerances):
+        if level > 0:
+            geoms = shapely.simplify(geoms, tolerance, preserve_topology=True)
+            lod[lod_geometry_column(level)] = gpd.GeoSeries(geoms, index=lod.index, crs=lod.crs)
+        geojson_bytes = pd.Series(shapely.to_geojson(geoms)).str.len().fillna(0).to_numpy(dtype=np.int64)
+        lod[lod_bytes_column(level)] = props_bytes + geojson_bytes
+    return lod
+
+def zoom_tolerance(zoom: float, fraction: float = 0.25) -> float:
+    """Simplification (degrees) that stays below `fraction` of a pixel at a zoom level."""
+    return 360.0 / (TILE_SIZE_PX * 2 ** zoom) * fraction
+
+def pick_lod_level(lod_gdf, tolerances, zoom, budget_bytes):
+    """
+    Chooses the detail level for a set of tracts: the coarsest level that is
+    still invisible at `zoom`, made coarser until the GeoJSON payload fits
+    `budget_bytes` (the coarsest level is used if nothing fits).
+
+    Returns:
+        tuple: (level, payload bytes at that level)
+    """
+    visible = zoom_tolerance(zoom)
+    start = max([0] + [lvl for lvl, tol in enumerate(tolerances) if tol <= visible])
+    for level in range(start, len(tolerances)):
+        payload = int(lod_gdf[lod_bytes_column(level)].sum())
+        if payload <= budget_bytes:
+            return level, payload
+    return level, payload
@@ -1,7 +1,10 @@
+import hashlib
+import json
 import logging
 import pandas as pd
 import geopandas as gpd
 import os
+import pyarrow.parquet as pq
 
 def setup_logging():
     """
@@ -14,14 +17,15 @@ def setup_logging():
     )
     return logging.getLogger(__name__)
 
-def load_csv(filepath: str, dtype=None, logger=None):
+def load_csv(filepath: str, dtype=None, logger=None, usecols=None, engine=None):
     """
     Loads a CSV file into a pandas DataFrame with error handling.
+    usecols/engine are passed to pandas (e.g. engine="pyarrow" to read only declared columns).
     """
     if logger:
         logger.info(f"Loading CSV file from: {filepath}")
     try:
-        return pd.read_csv(filepath, dtype=dtype)
+        return pd.read_csv(filepath, dtype=dtype, usecols=usecols, engine=engine)
     except FileNotFoundError:
         if logger:
             logger.error(f"File not found: {filepath}")
@@ -31,36 +35,99 @@ def load_csv(filepath: str, dtype=None, logger=None):
             logger.error(f"Error loading CSV file {filepath}: {e}")
         raise
 
-def save_geojson(gdf, filepath: str, logger=None):
+# File extension -> storage format for GeoDataFrames
+GEO_FORMATS = {
+    ".parquet": "parquet",
+    ".geoparquet": "parquet",
+    ".geojson": "geojson",
+    ".json": "geojson",
+}
+PARQUET_COMPRESSION = "zstd"
+
+def geo_format(filepath: str, fmt=None) -> str:
     """
-    Saves a GeoDataFrame to a GeoJSON file.
+    Resolves the storage format for a path, from `fmt` or the file extension.
     """
+    if fmt is None:
+        fmt = GEO_FORMATS.get(os.path.splitext(filepath)[1].lower())
+    if fmt not in ("parquet", "geojson"):
+        raise ValueError(f"Unsupported geodata format for {filepath}: {fmt}")
+    return fmt
+
+def save_geodata(gdf, filepath: str, fmt=None, logger=None):
+    """
+    Saves a GeoDataFrame as GeoParquet (WKB geometry, compressed columns) or GeoJSON.
+    """
+    fmt = geo_format(filepath, fmt)
     if logger:
-        logger.info(f"Saving GeoJSON file to: {filepath}")
+        logger.info(f"Saving {fmt} file to: {filepath}")
     try:
-        gdf.to_file(filepath, driver="GeoJSON")
+        if fmt == "parquet":
+            gdf.to_parquet(filepath, index=False, compression=PARQUET_COMPRESSION, geometry_encoding="WKB")
+        else:
+            gdf.to_file(filepath, driver="GeoJSON")
     except Exception as e:
         if logger:
-            logger.error(f"Error saving GeoJSON file {filepath}: {e}")
+            logger.error(f"Error saving {fmt} file {filepath}: {e}")
         raise
 
-def load_geojson(filepath: str, logger=None):
+def concat_geoparquet(paths, filepath: str, logger=None):
     """
-    Loads a GeoJSON file into a GeoDataFrame with error handling.
+    Concatenates GeoParquet files with identical columns into one file, one
+    input at a time, so only the largest input is ever in memory. Their
+    'geo' metadata is merged (bounding boxes and geometry types per column).
+    """
+    if logger:
+        logger.info(f"Combining {len(paths)} GeoParquet files into: {filepath}")
+    schema = pq.read_schema(paths[0])
+    geo = json.loads(schema.metadata[b"geo"])
+    for path in paths[1:]:
+        part_geo = json.loads(pq.read_schema(path).metadata[b"geo"])
+        for name, column in part_geo["columns"].items():
+            merged = geo["columns"][name]
+            if "bbox" in merged and "bbox" in column:
+                merged["bbox"] = ([min(a, b) for a, b in zip(merged["bbox"][:2], column["bbox"][:2])]
+                                  + [max(a, b) for a, b in zip(merged["bbox"][2:], column["bbox"][2:])])
+            merged["geometry_types"] = sorted(set(merged["geometry_types"]) | set(column["geometry_types"]))
+    schema = schema.with_metadata({**schema.metadata, b"geo": json.dumps(geo).encode("utf-8")})
+
+    with pq.ParquetWriter(filepath, schema, compression=PARQUET_COMPRESSION) as writer:
+        for path in paths:
+            writer.write_table(pq.read_table(path).cast(schema))
+
+def load_geodata(filepath: str, columns=None, fmt=None, logger=None):
+    """
+    Loads a GeoParquet or GeoJSON file into a GeoDataFrame with error handling.
+    GeoParquet is memory-mapped and read through Arrow, optionally projecting `columns`.
     """
+    fmt = geo_format(filepath, fmt)
     if logger:
-        logger.info(f"Loading GeoJSON file from: {filepath}")
+        logger.info(f"Loading {fmt} file from: {filepath}")
     try:
-        return gpd.read_file(filepath)
+        if fmt == "parquet":
+            return gpd.read_parquet(filepath, columns=columns, memory_map=True)
+        return gpd.read_file(filepath, columns=columns)
     except FileNotFoundError:
         if logger:
             logger.error(f"File not found: {filepath}")
         raise
     except Exception as e:
         if logger:
-            logger.error(f"Error loading GeoJSON file {filepath}: {e}")
+            logger.error(f"Error loading {fmt} file {filepath}: {e}")
         raise
 
+def save_geojson(gdf, filepath: str, logger=None):
+    """
+    Saves a GeoDataFrame to a GeoJSON file.
+    """
+    save_geodata(gdf, filepath, fmt="geojson", logger=logger)
+
+def load_geojson(filepath: str, logger=None):
+    """
+    Loads a GeoJSON file into a GeoDataFrame with error handling.
+    """
+    return load_geodata(filepath, fmt="geojson", logger=logger)
+
 def ensure_dir_exists(directory_path: str, logger=None):
     """
     Ensures that a directory exists, creating it if necessary.
@@ -69,3 +136,13 @@ def ensure_dir_exists(directory_path: str, logger=None):
         if logger:
             logger.info(f"Creating directory: {directory_path}")
         os.makedirs(directory_path)
+
+def file_sha256(filepath: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Returns the hex SHA-256 digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
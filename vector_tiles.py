@@ -0,0 +1,283 @@
+import json
+import math
+import os
+import shutil
+import struct
+from functools import lru_cache
+
+import numpy as np
+import shapely
+
+# --- Tile pyramid settings ---
+TILE_EXTENT = 4096       # MVT integer grid per tile
+TILE_BUFFER = 64         # Grid units of geometry kept past each tile edge (hides seams)
+SIMPLIFY_UNITS = 8       # Simplification tolerance in grid units (~1 screen pixel at 512 px tiles)
+WEB_MERCATOR_HALF = 20037508.342789244  # Half the world width in EPSG:3857 metres
+TILE_LAYER_NAME = "tracts"
+
+
+# --- Minimal protobuf writer for the MVT schema (vector_tile.proto v2) ---
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+def _bytes_field(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+def _uint_field(field, value):
+    return _key(field, 0) + _varint(value)
+
+def _varint_chunks(arrays):
+    """
+    Varint-encodes several arrays of non-negative integers in one vectorized
+    pass and returns the encoded bytes of each array separately.
+    """
+    lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+    rest = np.concatenate(arrays).astype(np.uint64) if len(arrays) else np.empty(0, dtype=np.uint64)
+    columns, present = [], []
+    exists = np.ones(rest.shape, dtype=bool)
+    while exists.any():
+        low = (rest & np.uint64(0x7F)).astype(np.uint8)
+        rest = rest >> np.uint64(7)
+        columns.append(np.where(rest > 0, low | 0x80, low))
+        present.append(exists)
+        exists = rest > 0
+    if not columns:
+        return [b"" for _ in arrays]
+    mask = np.stack(present, axis=1)
+    data = np.stack(columns, axis=1)[mask].tobytes()
+    byte_offsets = np.concatenate([[0], np.cumsum(mask.sum(axis=1))])
+    value_offsets = np.concatenate([[0], np.cumsum(lengths)])
+    bounds = byte_offsets[value_offsets]
+    return [data[bounds[i]:bounds[i + 1]] for i in range(len(arrays))]
+
+@lru_cache(maxsize=65536)
+def _encode_value(value):
+    """Encodes a layer's Value entry: strings as string_value, numbers as double_value."""
+    if isinstance(value, str):
+        return _bytes_field(4, _bytes_field(1, value.encode("utf-8")))
+    return _bytes_field(4, _key(3, 1) + struct.pack("<d", float(value)))
+
+
+# --- Geometry ---
+
+def _zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return (values << 1) ^ (values >> 63)
+
+def _ring_commands(ring, cursor):
+    """
+    MoveTo/LineTo/ClosePath commands for one closed ring of integer tile
+    coordinates. Returns (commands, new cursor), or (None, cursor) for a
+    ring that has collapsed below three distinct points.
+    """
+    coords = np.asarray(ring, dtype=np.int64)[:-1]  # drop the closing point
+    if len(coords) > 1:
+        # Consecutive duplicates arise from snapping to the grid
+        keep = np.concatenate([[True], np.any(np.diff(coords, axis=0) != 0, axis=1)])
+        coords = coords[keep]
+    if len(coords) < 3:
+        return None, cursor
+    params = _zigzag(np.diff(np.vstack([cursor, coords]), axis=0)).ravel()
+    commands = np.concatenate([
+        [1 | (1 << 3)], params[:2],                   # MoveTo(1)
+        [2 | ((len(coords) - 1) << 3)], params[2:],   # LineTo(n - 1)
+        [7 | (1 << 3)],                               # ClosePath
+    ])
+    return commands, coords[-1]
+
+def polygon_commands(geometry):
+    """
+    Encodes the polygons of a geometry already in tile coordinates (y down).
+    MVT wants exterior rings clockwise on screen, i.e. positive shoelace area
+    in tile coordinates, which is what shapely calls counter-clockwise; the
+    caller orients rings accordingly. Non-polygon parts are ignored.
+    """
+    commands = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for polygon in shapely.get_parts(geometry):
+        if polygon.geom_type != "Polygon" or polygon.is_empty:
+            continue
+        exterior, cursor_after = _ring_commands(polygon.exterior.coords, cursor)
+        if exterior is None:
+            continue
+        commands.append(exterior)
+        cursor = cursor_after
+        for interior in polygon.interiors:
+            ring, cursor = _ring_commands(interior.coords, cursor)
+            if ring is not None:
+                commands.append(ring)
+    return np.concatenate(commands) if commands else None
+
+
+# --- Tile math ---
+
+def lonlat_to_tile_range(bounds, zoom):
+    """Inclusive (x0, y0, x1, y1) range of tiles at `zoom` covering lon/lat bounds."""
+    west, south, east, north = bounds
+    n = 2 ** zoom
+
+    def tile_x(lon):
+        return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+    def tile_y(lat):
+        lat = max(-85.0511, min(85.0511, lat))
+        y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+        return min(n - 1, max(0, int(y)))
+
+    return tile_x(west), tile_y(north), tile_x(east), tile_y(south)
+
+# --- Pyramid writer ---
+
+def _feature_properties(gdf, fields, id_field, decimals=2):
+    """
+    Per-row property lists [(key, value), ...]. Numbers are rounded to
+    `decimals` (smaller tiles, readable tooltips); missing values are omitted.
+    """
+    columns = [id_field] + [f for f in fields if f in gdf.columns and f != id_field]
+    rows = [[] for _ in range(len(gdf))]
+    for col in columns:
+        values = gdf[col].to_numpy()
+        is_text = col == id_field or values.dtype == object
+        for i, value in enumerate(values):
+            if value is None or (not is_text and not np.isfinite(value)):
+                continue
+            rows[i].append((col, str(value) if is_text else round(float(value), decimals)))
+    return rows
+
+def encode_tile(features):
+    """
+    Encodes one tile. `features` is a list of (id, properties, commands) with
+    properties as [(key, value), ...] and commands as an integer array.
+    """
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    tag_arrays = []
+    for _, properties, _ in features:
+        tags = []
+        for key, value in properties:
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value).__name__, value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags.extend((key_index[key], value_index[value_key]))
+        tag_arrays.append(np.asarray(tags, dtype=np.int64))
+
+    packed = _varint_chunks(tag_arrays + [commands for _, _, commands in features])
+    n = len(features)
+    encoded = [
+        _bytes_field(2, (
+            _uint_field(1, feature_id)
+            + _bytes_field(2, packed[i])
+            + _uint_field(3, 3)  # POLYGON
+            + _bytes_field(4, packed[n + i])
+        ))
+        for i, (feature_id, _, _) in enumerate(features)
+    ]
+
+    layer = (
+        _uint_field(15, 2)
+        + _bytes_field(1, TILE_LAYER_NAME.encode("utf-8"))
+        + b"".join(encoded)
+        + b"".join(_bytes_field(3, k.encode("utf-8")) for k in keys)
+        + b"".join(_encode_value(v) for v in values)
+        + _uint_field(5, TILE_EXTENT)
+    )
+    return _bytes_field(3, layer)
+
+def write_tile_pyramid(gdf, output_dir, fields, min_zoom=4, max_zoom=12, id_field="GEOID"):
+    """
+    Writes a {z}/{x}/{y}.pbf Mapbox Vector Tile pyramid of the tract polygons
+    with `fields` as feature properties, plus a metadata.json.
+
+    Each zoom level simplifies the polygons to its own resolution, so low
+    zooms stay small. Tract/tile pairs come from one STRtree query per zoom,
+    and clipping and snapping to the tile grid are done with vectorized
+    shapely calls. The pyramid is built in a temporary directory and swapped
+    in at the end, so readers never see a half-written pyramid.
+
+    Returns:
+        int: number of tiles written.
+    """
+    lonlat = gdf.to_crs("EPSG:4326")
+    bounds = [float(b) for b in lonlat.total_bounds]
+    merc = np.asarray(gdf.to_crs("EPSG:3857").geometry.array, dtype=object)
+    properties = _feature_properties(gdf, fields, id_field)
+
+    tmp_dir = f"{output_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tile_count = 0
+
+    for zoom in range(min_zoom, max_zoom + 1):
+        span = 2 * WEB_MERCATOR_HALF / 2 ** zoom
+        scale = TILE_EXTENT / span
+        geoms = shapely.make_valid(shapely.simplify(merc, SIMPLIFY_UNITS / scale, preserve_topology=False))
+
+        x0, y0, x1, y1 = lonlat_to_tile_range(bounds, zoom)
+        xs, ys = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+        xs, ys = xs.ravel(), ys.ravel()
+        pad = TILE_BUFFER / scale
+        minx = -WEB_MERCATOR_HALF + xs * span
+        maxy = WEB_MERCATOR_HALF - ys * span
+        boxes = shapely.box(minx - pad, maxy - span - pad, minx + span + pad, maxy + pad)
+
+        tile_pos, feat_pos = shapely.STRtree(geoms).query(boxes, predicate="intersects")
+        if len(tile_pos) == 0:
+            continue
+        clipped = shapely.intersection(geoms[feat_pos], boxes[tile_pos])
+
+        # Into tile grid units (y down), snapped to integers
+        coords, owner = shapely.get_coordinates(clipped, return_index=True)
+        coords[:, 0] = (coords[:, 0] - minx[tile_pos][owner]) * scale
+        coords[:, 1] = (maxy[tile_pos][owner] - coords[:, 1]) * scale
+        clipped = shapely.set_precision(shapely.set_coordinates(clipped.copy(), coords), 1.0)
+        clipped = shapely.orient_polygons(clipped, exterior_cw=False)
+
+        order = np.lexsort((feat_pos, tile_pos))
+        tiles = {}
+        for i in order:
+            commands = polygon_commands(clipped[i])
+            if commands is not None:
+                tiles.setdefault(int(tile_pos[i]), []).append(
+                    (int(feat_pos[i]) + 1, properties[feat_pos[i]], commands)
+                )
+
+        for t, features in tiles.items():
+            tile_dir = os.path.join(tmp_dir, str(zoom), str(int(xs[t])))
+            os.makedirs(tile_dir, exist_ok=True)
+            with open(os.path.join(tile_dir, f"{int(ys[t])}.pbf"), "wb") as f:
+                f.write(encode_tile(features))
+            tile_count += 1
+
+    os.makedirs(tmp_dir, exist_ok=True)
+    with open(os.path.join(tmp_dir, "metadata.json"), "w") as f:
+        json.dump({
+            "format": "pbf",
+            "layer": TILE_LAYER_NAME,
+            "minzoom": min_zoom,
+            "maxzoom": max_zoom,
+            "bounds": bounds,
+            "fields": [id_field] + [c for c in fields if c in gdf.columns and c != id_field],
+            "tiles": tile_count,
+        }, f, indent=2)
+
+    old_dir = f"{output_dir}.old-{os.getpid()}"
+    if os.path.exists(output_dir):
+        os.replace(output_dir, old_dir)
+    os.replace(tmp_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return tile_count